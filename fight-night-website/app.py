@@ -1,70 +1,281 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, request, jsonify
 from flask_cors import CORS
-from pymongo import MongoClient
-from bson.objectid import ObjectId
 import os
-from dotenv import load_dotenv
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import re
 import datetime
+import atexit
+import threading
+import time
 
-# Load environment variables
-load_dotenv()
+# Load environment variables (Vercel injects them directly, so skip the file lookup there).
+# This must run before the imports below: those modules read their settings at import time.
+if not os.getenv("VERCEL"):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+import database
+from database import LazyCollection, add_listener, get_client, on_connect
+from email_outbox import EmailOutbox, new_job
+from pagination import PaginationError, fetch_page, parse_fields, parse_page_args
+from exports import ExportError, export_rows, parse_since
+from write_buffer import WriteBuffer
+from journal import WriteJournal, is_unavailable
+import email_templates
+from validation import (normalize_email, validate_email_signup, validate_fighter_application,
+                        validate_fighter_nomination)
+from schemas import SUBMISSION_MAX_BYTES, shape_submission
+from db_indexes import bootstrap, index_ready
+from bulk_import import BulkImportError, import_emails, parse_upload, schedule_welcome_emails
+from idempotency import IdempotencyStore, idempotent
+from response_cache import ResponseCache, cached_response
+import timing
+from timing import stage
+import metrics
+import profiling
+import json_provider
+import stats
+import search
+import http_cache
+from http_cache import conditional
+from readiness import ReadinessProbe
+from live_feed import FeedFull, LiveFeed
+from campaigns import CampaignError, CampaignSender, CAMPAIGN_CONCURRENCY, DELIVERY_STATES, startable
+
+# Form submissions are small; bigger bodies are refused before any JSON is parsed
+SUBMISSION_ENDPOINTS = {"submit_fighter_application", "submit_fighter_nomination", "submit_email_signup"}
+
+class LimitedRequest(Request):
+    """Request with a tighter body limit for the form submission routes"""
+
+    @property
+    def max_content_length(self):
+        if self.endpoint in SUBMISSION_ENDPOINTS:
+            return SUBMISSION_MAX_BYTES
+        return super().max_content_length
 
 app = Flask(__name__)
+app.request_class = LimitedRequest
+# Largest body any route accepts (bulk email-list uploads)
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_CONTENT_LENGTH", str(10 * 1024 * 1024)))
 # Allow all origins for now to debug
-CORS(app, origins="*", supports_credentials=True, allow_headers=["Content-Type", "Authorization", "Accept"])
+CORS(app, origins="*", supports_credentials=True,
+     allow_headers=["Content-Type", "Authorization", "Accept", "Idempotency-Key", "Last-Event-ID",
+                    "X-Profile"],
+     expose_headers=["Idempotent-Replayed", "X-Profile-Id"])
+# Opt-in cProfile/sampling profiles at /api/admin/profiles (see profiling.py);
+# registered before the other hooks so their work is inside the profile
+profiling.init_app(app)
+# orjson-backed jsonify that encodes ObjectId and datetime values directly
+json_provider.init_app(app)
+# Compress large /api/admin/* responses (brotli or gzip, per Accept-Encoding)
+http_cache.init_app(app)
+# Per-stage durations; sent as a Server-Timing header when SERVER_TIMING_ENABLED=true
+timing.init_app(app)
+# Request, stage, MongoDB and SMTP metrics at /metrics (METRICS_ENABLED=false to disable)
+metrics.init_app(app)
+
+# MongoDB connection: the client is created on first use (see database.py)
+fighter_applications = LazyCollection("fighter_applications")
+fighter_nominations = LazyCollection("fighter_nominations")
+email_list = LazyCollection("email_list")
+email_outbox = LazyCollection("email_outbox")
+idempotency_keys = LazyCollection("idempotency_keys")
+stats_counters = LazyCollection("stats_counters")
+campaigns = LazyCollection("campaigns")
+campaign_deliveries = LazyCollection("campaign_deliveries")
+
+# Collections exposed through the admin routes, keyed by URL segment
+ADMIN_COLLECTIONS = {
+    "fighter-applications": fighter_applications,
+    "fighter-nominations": fighter_nominations,
+    "email-list": email_list,
+}
+
+# Optional group commit: coalesce concurrent inserts into insert_many batches
+WRITE_BUFFER_ENABLED = os.getenv("WRITE_BUFFER_ENABLED", "false").lower() == "true"
+WRITE_BUFFER_COLLECTIONS = os.getenv("WRITE_BUFFER_COLLECTIONS", "email_list").split(",")
+write_buffers = {}
+if WRITE_BUFFER_ENABLED:
+    for name in WRITE_BUFFER_COLLECTIONS:
+        if name.strip():
+            write_buffers[name.strip()] = WriteBuffer(LazyCollection(name.strip()))
+
+# Admin list responses are cached until the collection is written to
+response_cache = ResponseCache()
+
+def record_inserts(collection_name, doc, count=1):
+    """Drop cached admin pages and bump dashboard counters after document(s) were inserted"""
+    response_cache.invalidate(collection_name)
+    # $inc per day and weight class, see stats.py
+    stats.record_insert(stats_counters, collection_name, doc, count=count)
 
-# MongoDB connection
-MONGO_URI = os.getenv("MONGO_URI")
-client = MongoClient(MONGO_URI)
-db = client["white_collar_fight_night"]
-fighter_applications = db["fighter_applications"]
-fighter_nominations = db["fighter_nominations"]
-email_list = db["email_list"]
+def journal_replayed(collection_name, doc):
+    """Finish what insert_document skipped for a document written by a journal replay"""
+    if collection_name == email_outbox.name:
+        outbox.start()
+        return
+    record_inserts(collection_name, doc)
+
+# Submissions and their emails are journaled to a local file while MongoDB is unreachable;
+# replay waits until the indexes (and the unique email index in particular) exist
+journal = WriteJournal(database.get_db, on_replayed=journal_replayed, prepare=database.run_startup_hooks)
+
+def insert_document(collection, doc):
+    """Insert a document, through the write buffer when one is configured
+
+    If MongoDB is unreachable the document is journaled and the result is
+    unacknowledged; it is inserted, and counted, once the journal is replayed.
+    """
+    search.add_search_terms(collection.name, doc)
+    buffer = write_buffers.get(collection.name)
+    result = journal.insert_one(collection, doc, insert=buffer.insert_one if buffer is not None else None)
+    if result.acknowledged:
+        record_inserts(collection.name, doc)
+    return result
+
+@atexit.register
+def flush_write_buffers(timeout=10.0):
+    """Flush and close every write buffer; timeout bounds the total wait"""
+    deadline = time.monotonic() + timeout
+    for buffer in write_buffers.values():
+        buffer.close(max(deadline - time.monotonic(), 0))
+
+# Create indexes once per process, in the background after the client is first
+# created, retrying until they all exist; existing indexes are left untouched
+on_connect(bootstrap)
 
 # Email configuration
 EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
 EMAIL_USER = os.getenv("EMAIL_USER", "your-email@gmail.com")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "your-app-password")
+EMAIL_STARTTLS = os.getenv("EMAIL_STARTTLS", "true").lower() == "true"
 FROM_EMAIL = os.getenv("FROM_EMAIL", "info@texasfightcollective.com")
 
-# Validation functions
-def validate_email(email):
-    """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+# Authenticated SMTP sessions are reused across messages; smtplib is only
+# imported once the first email is sent
+_smtp_pool = None
+_smtp_pool_lock = threading.Lock()
+# Campaigns send on their own sessions so they never hold up confirmation emails
+_campaign_smtp_pool = None
+
+def new_smtp_pool(readiness=True, **options):
+    from smtp_pool import SMTPPool
+    # Campaign sends (and their bounces) say nothing about whether confirmations go out
+    listeners = [readiness_probe.record_smtp] if readiness else []
+    if metrics.METRICS_ENABLED:
+        listeners.append(metrics.record_smtp)
+    return SMTPPool(EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASSWORD,
+                    use_tls=EMAIL_STARTTLS, listeners=listeners, **options)
+
+def get_smtp_pool():
+    global _smtp_pool
+    if _smtp_pool is None:
+        with _smtp_pool_lock:
+            if _smtp_pool is None:
+                _smtp_pool = new_smtp_pool()
+    return _smtp_pool
+
+def get_campaign_smtp_pool():
+    global _campaign_smtp_pool
+    if _campaign_smtp_pool is None:
+        with _smtp_pool_lock:
+            if _campaign_smtp_pool is None:
+                _campaign_smtp_pool = new_smtp_pool(readiness=False, max_size=CAMPAIGN_CONCURRENCY)
+    return _campaign_smtp_pool
 
-def validate_phone(phone):
-    """Validate phone number (10 digits)"""
-    # Remove any non-digit characters
-    digits_only = re.sub(r'\D', '', phone)
-    return len(digits_only) == 10
+def deliver_email(to_email, subject, html_content, text_content=None, pool=None):
+    """Send an email using SMTP, raising on failure"""
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
 
-def send_email(to_email, subject, html_content):
+    msg = MIMEMultipart('alternative')
+    msg['From'] = FROM_EMAIL
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    
+    # Clients show the last part they support, so HTML goes after plain text
+    if text_content:
+        msg.attach(MIMEText(text_content, 'plain'))
+    msg.attach(MIMEText(html_content, 'html'))
+    
+    (pool or get_smtp_pool()).send_message(msg)
+
+def deliver_campaign_email(to_email, subject, html_content, text_content=None):
+    deliver_email(to_email, subject, html_content, text_content, pool=get_campaign_smtp_pool())
+
+def send_email(to_email, subject, html_content, text_content=None):
     """Send an email using SMTP"""
     try:
-        msg = MIMEMultipart()
-        msg['From'] = FROM_EMAIL
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(html_content, 'html'))
-        
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.send_message(msg)
-        
+        deliver_email(to_email, subject, html_content, text_content)
         return True
     except Exception as e:
         print(f"Error sending email: {e}")
         return False
 
-# Health check endpoint
+# Dependency checks for /api/ready run in the background; the route only reads the results
+readiness_probe = ReadinessProbe(get_client, get_smtp_pool)
+add_listener(readiness_probe.connection_pool_listener)
+
+# Outgoing emails are queued and delivered by background workers
+outbox = EmailOutbox(email_outbox, deliver_email)
+
+def queue_email(to_email, template_name, values):
+    """Render a registered email template and queue it for background delivery"""
+    subject, html_content, text_content = email_templates.render(template_name, values)
+    # A journaled email is dropped on replay if the submission it confirms is rejected
+    journal.insert_one(email_outbox, new_job(to_email, subject, html_content, text_content),
+                       insert=outbox.enqueue_job, requires=values.get("_id"))
+    return "queued"
+
+# New submissions pushed to admin clients over Server-Sent Events (one watcher per process)
+live_feed = LiveFeed(database.get_db)
+
+# Newsletter campaigns: throttled, checkpointed sends to the email list
+campaign_sender = CampaignSender(campaigns, campaign_deliveries, email_list, deliver_campaign_email)
+
+def resume_campaigns(db):
+    """on_connect hook for long-running servers: continue campaigns a recycled or crashed worker left"""
+    started = campaign_sender.resume_abandoned()
+    if started:
+        print(f"Resumed campaign(s) {', '.join(str(campaign_id) for campaign_id in started)}")
+
+def reset_after_fork():
+    """Drop per-process state inherited across fork() (called by gunicorn.conf.py)"""
+    global _smtp_pool, _campaign_smtp_pool, _smtp_pool_lock
+    database.reset_after_fork()
+    _smtp_pool = None
+    _campaign_smtp_pool = None
+    _smtp_pool_lock = threading.Lock()
+
+def shutdown(timeout=30.0):
+    """Let in-flight work finish before the process exits; timeout bounds the whole shutdown"""
+    deadline = time.monotonic() + timeout
+
+    def remaining():
+        return max(deadline - time.monotonic(), 0)
+
+    # Workers finish the email they are sending; queued ones stay in the outbox
+    outbox.stop(remaining())
+    # Campaigns stop after their current batch and resume from the checkpoint
+    campaign_sender.stop(remaining())
+    live_feed.stop(remaining())
+    journal.stop(remaining())
+    flush_write_buffers(remaining())
+    readiness_probe.stop(remaining())
+    for pool in (_smtp_pool, _campaign_smtp_pool):
+        if pool is not None:
+            pool.close_all()
+    database.close_client()
+
+# Repeated submissions with the same Idempotency-Key (or payload) replay the first response
+# (skipped while MongoDB is unreachable, so that submissions can be journaled)
+idempotency_store = IdempotencyStore(idempotency_keys, journal=journal)
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"success": False, "message": "Request body is too large"}), 413
+
+# Health check endpoint (never touches the database)
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint to verify API is running"""
@@ -74,7 +285,14 @@ def health_check():
         "timestamp": datetime.datetime.utcnow().isoformat()
     })
 
-# Root endpoint for Vercel
+# Readiness check for load balancers (reports cached probe results, never blocks on MongoDB or SMTP)
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Report whether MongoDB and SMTP were reachable at the last probe"""
+    ready, report = readiness_probe.snapshot()
+    return jsonify(report), 200 if ready else 503
+
+# Root endpoint for Vercel (never touches the database)
 @app.route('/', methods=['GET'])
 def root():
     """Root endpoint for Vercel deployment"""
@@ -83,6 +301,7 @@ def root():
         "message": "White Collar Fight Night API is running",
         "endpoints": [
             "/api/health",
+            "/api/ready",
             "/api/fighter-application",
             "/api/fighter-nomination",
             "/api/email-signup"
@@ -100,231 +319,391 @@ def test():
 
 # API Routes
 @app.route('/api/fighter-application', methods=['POST'])
+@idempotent(idempotency_store)
 def submit_fighter_application():
     data = request.json
     
-    # Validate required fields
-    required_fields = ['firstName', 'lastName', 'email', 'phone', 'jobCompany', 
-                      'weight', 'height', 'experience', 'why']
-    
-    for field in required_fields:
-        if field not in data or not data[field]:
-            return jsonify({"success": False, "message": f"Missing required field: {field}"}), 400
-    
-    # Validate email and phone
-    if not validate_email(data['email']):
-        return jsonify({"success": False, "message": "Invalid email format"}), 400
-    
-    if not validate_phone(data['phone']):
-        return jsonify({"success": False, "message": "Phone number must be 10 digits"}), 400
+    # Validate required fields, email and phone, and keep only the declared fields
+    with stage("validation"):
+        data, error = shape_submission(fighter_applications.name, data, validate_fighter_application)
+    if error:
+        return jsonify({"success": False, "message": error}), 400
     
     # Add timestamp
     data['created_at'] = datetime.datetime.utcnow()
     
     # Insert into database
-    result = fighter_applications.insert_one(data)
+    with stage("db_write"):
+        result = insert_document(fighter_applications, data)
     
     # Send confirmation email
-    html_content = f"""
-    <html>
-    <body>
-        <h2>Thank You for Your Fighter Application!</h2>
-        <p>Dear {data['firstName']} {data['lastName']},</p>
-        <p>We've received your application to participate in the White Collar Fight Night. 
-        Our team will review your information and get back to you soon with next steps.</p>
-        
-        <h3>Your Application Details:</h3>
-        <ul>
-            <li><strong>Name:</strong> {data['firstName']} {data['lastName']}</li>
-            <li><strong>Email:</strong> {data['email']}</li>
-            <li><strong>Phone:</strong> {data['phone']}</li>
-            <li><strong>Job/Company:</strong> {data['jobCompany']}</li>
-            <li><strong>Weight:</strong> {data['weight']} lbs</li>
-            <li><strong>Height:</strong> {data['height']} inches</li>
-        </ul>
-        
-        <p>If you have any questions, please don't hesitate to contact us at info@texasfightcollective.com.</p>
-        
-        <p>Best regards,<br>
-        The Texas Fight Collective Team</p>
-    </body>
-    </html>
-    """
-    
-    email_sent = send_email(data['email'], "Your White Collar Fight Night Application", html_content)
+    with stage("email"):
+        email_status = queue_email(data['email'], "fighter_application", data)
     
     return jsonify({
         "success": True, 
         "message": "Fighter application submitted successfully",
         "id": str(result.inserted_id),
-        "email_sent": email_sent
+        "email_status": email_status
     })
 
 @app.route('/api/fighter-nomination', methods=['POST'])
+@idempotent(idempotency_store)
 def submit_fighter_nomination():
     data = request.json
     
-    # Validate required fields
-    required_fields = ['yourName', 'yourEmail', 'nomineeName', 'nomineeEmail', 'reason']
-    
-    for field in required_fields:
-        if field not in data or not data[field]:
-            return jsonify({"success": False, "message": f"Missing required field: {field}"}), 400
-    
-    # Validate emails
-    if not validate_email(data['yourEmail']):
-        return jsonify({"success": False, "message": "Invalid nominator email format"}), 400
-    
-    if not validate_email(data['nomineeEmail']):
-        return jsonify({"success": False, "message": "Invalid nominee email format"}), 400
+    # Validate required fields and emails, and keep only the declared fields
+    with stage("validation"):
+        data, error = shape_submission(fighter_nominations.name, data, validate_fighter_nomination)
+    if error:
+        return jsonify({"success": False, "message": error}), 400
     
     # Add timestamp
     data['created_at'] = datetime.datetime.utcnow()
     
     # Insert into database
-    result = fighter_nominations.insert_one(data)
-    
-    # Send confirmation email to nominator
-    nominator_html = f"""
-    <html>
-    <body>
-        <h2>Thank You for Your Fighter Nomination!</h2>
-        <p>Dear {data['yourName']},</p>
-        <p>We've received your nomination of {data['nomineeName']} for the White Collar Fight Night. 
-        Our team will review the nomination and reach out to them soon.</p>
-        
-        <p>Thank you for helping us find great participants for our event!</p>
-        
-        <p>Best regards,<br>
-        The Texas Fight Collective Team</p>
-    </body>
-    </html>
-    """
+    with stage("db_write"):
+        result = insert_document(fighter_nominations, data)
     
-    nominator_email_sent = send_email(data['yourEmail'], "Your White Collar Fight Night Nomination", nominator_html)
-    
-    # Send notification email to nominee
-    nominee_html = f"""
-    <html>
-    <body>
-        <h2>You've Been Nominated for White Collar Fight Night!</h2>
-        <p>Dear {data['nomineeName']},</p>
-        <p>Good news! {data['yourName']} has nominated you to participate in Austin's White Collar Fight Night boxing event.</p>
-        
-        <p>White Collar Fight Night brings together professionals from various industries to step into the ring
-        for charity. Our events showcase the determination and courage of everyday people who train for months
-        to compete in a safe, regulated boxing environment.</p>
-        
-        <p>If you're interested in participating, please visit our website at texasfightcollective.com to learn more and submit an application.</p>
+    with stage("email"):
+        # Send confirmation email to nominator
+        nominator_email_status = queue_email(data['yourEmail'], "nomination_nominator", data)
         
-        <p>Best regards,<br>
-        The Texas Fight Collective Team</p>
-    </body>
-    </html>
-    """
-    
-    nominee_email_sent = send_email(data['nomineeEmail'], "You've Been Nominated for White Collar Fight Night", nominee_html)
+        # Send notification email to nominee
+        nominee_email_status = queue_email(data['nomineeEmail'], "nomination_nominee", data)
     
     return jsonify({
         "success": True, 
         "message": "Fighter nomination submitted successfully",
         "id": str(result.inserted_id),
-        "nominator_email_sent": nominator_email_sent,
-        "nominee_email_sent": nominee_email_sent
+        "nominator_email_status": nominator_email_status,
+        "nominee_email_status": nominee_email_status
     })
 
 @app.route('/api/email-signup', methods=['POST'])
+@idempotent(idempotency_store)
 def submit_email_signup():
     data = request.json
     
-    # Validate email
-    if 'email' not in data or not data['email']:
-        return jsonify({"success": False, "message": "Email is required"}), 400
+    # Validate email, and keep only the declared fields
+    with stage("validation"):
+        data, error = shape_submission(email_list.name, data, validate_email_signup)
+    if error:
+        return jsonify({"success": False, "message": error}), 400
     
-    if not validate_email(data['email']):
-        return jsonify({"success": False, "message": "Invalid email format"}), 400
-    
-    # Check if email already exists
-    existing_email = email_list.find_one({"email": data['email']})
-    if existing_email:
-        return jsonify({"success": False, "message": "Email already registered"}), 400
-    
-    # Add timestamp
+    # Add timestamp and the key enforced unique by the email_list index
+    data['email_normalized'] = normalize_email(data['email'])
     data['created_at'] = datetime.datetime.utcnow()
     
-    # Insert into database
-    result = email_list.insert_one(data)
+    # Insert into database; the unique index rejects duplicates atomically
+    from pymongo.errors import DuplicateKeyError
+    if email_registered(data['email_normalized']):
+        return jsonify({"success": False, "message": "Email already registered"}), 400
+    try:
+        with stage("db_write"):
+            result = insert_document(email_list, data)
+    except DuplicateKeyError:
+        return jsonify({"success": False, "message": "Email already registered"}), 400
     
     # Send confirmation email
-    html_content = f"""
-    <html>
-    <body>
-        <h2>Welcome to the White Collar Fight Night Mailing List!</h2>
-        <p>Thank you for signing up to receive updates about White Collar Fight Night events in Austin, Texas.</p>
-        
-        <p>We'll keep you informed about:</p>
-        <ul>
-            <li>Upcoming event dates and venues</li>
-            <li>Ticket availability</li>
-            <li>Fighter announcements</li>
-            <li>Special promotions</li>
-        </ul>
-        
-        <p>Stay tuned for exciting news coming your way soon!</p>
-        
-        <p>Best regards,<br>
-        The Texas Fight Collective Team</p>
-        
-        <p style="font-size: 12px; color: #666;">
-            If you didn't sign up for this mailing list, please disregard this email.<br>
-            To unsubscribe, please reply with "UNSUBSCRIBE" in the subject line.
-        </p>
-    </body>
-    </html>
-    """
-    
-    email_sent = send_email(data['email'], "Welcome to the White Collar Fight Night Mailing List", html_content)
+    with stage("email"):
+        email_status = queue_email(data['email'], "email_signup_welcome", data)
     
     return jsonify({
         "success": True, 
         "message": "Email signup successful",
         "id": str(result.inserted_id),
-        "email_sent": email_sent
+        "email_status": email_status
     })
 
+def email_registered(email_normalized):
+    """Fallback duplicate check, only made until the unique index is confirmed
+
+    The index is built in the background at startup and may be missing for a
+    while (or for good, if building it failed). While MongoDB is unreachable
+    the check is skipped; journal replay drops duplicates instead.
+    """
+    if index_ready("email_list", "email_normalized_unique") or not journal.available():
+        return False
+    try:
+        with journal.deadline():
+            return email_list.find_one({"email_normalized": email_normalized}, {"_id": 1}) is not None
+    except Exception as e:
+        if not is_unavailable(e):
+            raise
+        journal.mark_unavailable(e)
+        return False
+
 # Admin routes (protected in production)
+def list_collection(collection):
+    """Return one cursor-paginated page of a collection, newest first"""
+    try:
+        limit, after, fields = parse_page_args(request.args)
+    except PaginationError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    with stage("db_read"):
+        docs, next_cursor = fetch_page(collection, limit=limit, after=after, fields=fields)
+    
+    # ObjectId and datetime values are encoded by the app's JSON provider
+    return jsonify({
+        "items": docs,
+        "count": len(docs),
+        "next_cursor": next_cursor
+    })
+
 @app.route('/api/admin/fighter-applications', methods=['GET'])
+@conditional(fighter_applications, cache=response_cache)
+@cached_response(response_cache, "fighter_applications")
 def get_fighter_applications():
     # In production, add authentication here
-    applications = list(fighter_applications.find().sort("created_at", -1))
-    
-    # Convert ObjectId to string for JSON serialization
-    for app in applications:
-        app['_id'] = str(app['_id'])
-    
-    return jsonify(applications)
+    return list_collection(fighter_applications)
 
 @app.route('/api/admin/fighter-nominations', methods=['GET'])
+@conditional(fighter_nominations, cache=response_cache)
+@cached_response(response_cache, "fighter_nominations")
 def get_fighter_nominations():
     # In production, add authentication here
-    nominations = list(fighter_nominations.find().sort("created_at", -1))
-    
-    # Convert ObjectId to string for JSON serialization
-    for nom in nominations:
-        nom['_id'] = str(nom['_id'])
-    
-    return jsonify(nominations)
+    return list_collection(fighter_nominations)
 
 @app.route('/api/admin/email-list', methods=['GET'])
+@conditional(email_list, cache=response_cache)
+@cached_response(response_cache, "email_list")
 def get_email_list():
     # In production, add authentication here
-    emails = list(email_list.find().sort("created_at", -1))
+    return list_collection(email_list)
+
+# Collections covered by /api/admin/search, keyed by URL segment
+SEARCH_COLLECTIONS = {
+    "fighter-applications": fighter_applications,
+    "fighter-nominations": fighter_nominations,
+}
+
+@app.route('/api/admin/search', methods=['GET'])
+@conditional(fighter_applications, fighter_nominations, cache=response_cache)
+def search_submissions():
+    # In production, add authentication here
+    names = request.args.get("collection")
+    names = names.split(",") if names else list(SEARCH_COLLECTIONS)
+    unknown = [name for name in names if name not in SEARCH_COLLECTIONS]
+    if unknown:
+        return jsonify({"success": False, "message": f"Unknown collection: {', '.join(unknown)}"}), 400
+    
+    try:
+        query, terms, mode, limit, after = search.parse_search_args(request.args)
+    except (search.SearchError, PaginationError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    if after is not None and len(names) != 1:
+        return jsonify({"success": False, "message": "after requires a single collection"}), 400
+    
+    results = {}
+    with stage("db_read"):
+        for name in names:
+            docs, next_cursor = search.search_collection(
+                SEARCH_COLLECTIONS[name], query, terms, mode=mode, limit=limit, after=after)
+            results[name] = {"items": docs, "count": len(docs), "next_cursor": next_cursor}
+    
+    return jsonify({"query": query, "mode": mode, "results": results})
+
+@app.route('/api/admin/feed', methods=['GET'])
+def submission_feed():
+    # In production, add authentication here
+    names = request.args.get("collection")
+    names = names.split(",") if names else list(ADMIN_COLLECTIONS)
+    unknown = [name for name in names if name not in ADMIN_COLLECTIONS]
+    if unknown:
+        return jsonify({"success": False, "message": f"Unknown collection: {', '.join(unknown)}"}), 400
+    
+    # EventSource resends the last id it saw when it reconnects
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        events = live_feed.stream(app.json.dumps, last_event_id,
+                                  [ADMIN_COLLECTIONS[name].name for name in names])
+    except FeedFull as e:
+        return jsonify({"success": False, "message": str(e)}), 503
+    
+    return Response(events, mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.route('/api/admin/feed/stats', methods=['GET'])
+def get_feed_stats():
+    # In production, add authentication here
+    return jsonify(live_feed.stats())
+
+@app.route('/api/admin/journal', methods=['GET'])
+def get_journal_status():
+    # In production, add authentication here
+    return jsonify(journal.status())
+
+@app.route('/api/admin/<collection_name>/export', methods=['GET'])
+@conditional(collections_for=lambda collection_name: (
+    [ADMIN_COLLECTIONS[collection_name]] if collection_name in ADMIN_COLLECTIONS else None),
+    cache=response_cache)
+def export_collection(collection_name):
+    # In production, add authentication here
+    collection = ADMIN_COLLECTIONS.get(collection_name)
+    if collection is None:
+        return jsonify({"success": False, "message": f"Unknown collection: {collection_name}"}), 404
     
-    # Convert ObjectId to string for JSON serialization
-    for email in emails:
-        email['_id'] = str(email['_id'])
+    export_format = request.args.get("format", "ndjson")
+    try:
+        since = parse_since(request.args.get("since"))
+        fields = parse_fields(request.args.get("fields"))
+        rows, mimetype = export_rows(collection, export_format, since=since, fields=fields)
+    except (ExportError, PaginationError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    filename = f"{collection_name}.{export_format}"
+    return Response(rows, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename={filename}",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.route('/api/admin/email-list/bulk', methods=['POST'])
+def bulk_import_email_list():
+    # In production, add authentication here
+    upload = request.files.get("file")
+    try:
+        if upload is not None:
+            emails = parse_upload(upload.read(), upload.mimetype, upload.filename)
+        else:
+            emails = parse_upload(request.get_data(), request.content_type)
+    except BulkImportError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    source = request.args.get("source", "bulk_import")
+    summary, results, inserted = import_emails(email_list, emails, source=source)
+    if summary["inserted"]:
+        record_inserts(email_list.name, {}, count=summary["inserted"])
+    
+    # Welcome emails are optional and trickle out through the outbox
+    if request.args.get("welcome") == "deferred":
+        summary["welcome_queued"] = schedule_welcome_emails(outbox, inserted)
+        outbox.start()
+    
+    return jsonify({
+        "success": True,
+        "summary": summary,
+        "results": results
+    })
+
+@app.route('/api/admin/stats', methods=['GET'])
+@conditional(fighter_applications, fighter_nominations, email_list, daily=True,
+             cache=response_cache)
+def get_stats():
+    # In production, add authentication here
+    try:
+        days = stats.parse_days(request.args.get("days"))
+    except stats.StatsError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    with stage("db_read"):
+        report = stats.read_stats(stats_counters, days=days)
+    return jsonify(report)
+
+def find_campaign_id(campaign_id):
+    """ObjectId for a campaign id from the URL, or None if it is malformed"""
+    from bson.objectid import ObjectId
+    from bson.errors import InvalidId
+    try:
+        return ObjectId(campaign_id)
+    except InvalidId:
+        return None
+
+def campaign_not_found(campaign_id):
+    return jsonify({"success": False, "message": f"Unknown campaign: {campaign_id}"}), 404
+
+@app.route('/api/admin/campaigns', methods=['POST'])
+def create_campaign():
+    # In production, add authentication here
+    data = request.get_json(silent=True) or {}
+    try:
+        campaign_id = campaign_sender.create(data.get("subject"), data.get("html"),
+                                             data.get("text"), data.get("name"))
+    except CampaignError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    # Sending starts right away unless the campaign is only being drafted
+    if data.get("start", True):
+        campaign_sender.start(campaign_id)
+    return jsonify({"success": True, "id": str(campaign_id),
+                    "campaign": campaign_sender.status(campaign_id)}), 201
+
+@app.route('/api/admin/campaigns/<campaign_id>', methods=['GET'])
+def get_campaign(campaign_id):
+    # In production, add authentication here
+    object_id = find_campaign_id(campaign_id)
+    campaign = campaign_sender.status(object_id) if object_id else None
+    if campaign is None:
+        return campaign_not_found(campaign_id)
+    return jsonify(campaign)
+
+@app.route('/api/admin/campaigns/<campaign_id>/start', methods=['POST'])
+def start_campaign(campaign_id):
+    # In production, add authentication here
+    object_id = find_campaign_id(campaign_id)
+    campaign = campaign_sender.status(object_id) if object_id else None
+    if campaign is None:
+        return campaign_not_found(campaign_id)
+    
+    # Also resumes an interrupted campaign from its checkpoint
+    if not startable(campaign):
+        return jsonify({"success": False, "message": f"Campaign is {campaign['status']}"}), 409
+    try:
+        campaign_sender.start(object_id)
+    except CampaignError as e:
+        return jsonify({"success": False, "message": str(e)}), 409
+    return jsonify({"success": True, "campaign": campaign}), 202
+
+@app.route('/api/admin/campaigns/<campaign_id>/cancel', methods=['POST'])
+def cancel_campaign(campaign_id):
+    # In production, add authentication here
+    object_id = find_campaign_id(campaign_id)
+    if object_id is None or campaign_sender.status(object_id) is None:
+        return campaign_not_found(campaign_id)
+    if not campaign_sender.cancel(object_id):
+        return jsonify({"success": False, "message": "Campaign has already finished"}), 409
+    return jsonify({"success": True, "campaign": campaign_sender.status(object_id)})
+
+@app.route('/api/admin/campaigns/<campaign_id>/deliveries', methods=['GET'])
+def get_campaign_deliveries(campaign_id):
+    # In production, add authentication here
+    object_id = find_campaign_id(campaign_id)
+    if object_id is None:
+        return campaign_not_found(campaign_id)
+    
+    query = {"campaign_id": object_id}
+    status = request.args.get("status")
+    if status:
+        if status not in DELIVERY_STATES:
+            return jsonify({"success": False,
+                            "message": f"status must be one of: {', '.join(DELIVERY_STATES)}"}), 400
+        query["status"] = status
+    try:
+        limit, after, fields = parse_page_args(request.args)
+    except PaginationError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     
-    return jsonify(emails)
+    with stage("db_read"):
+        docs, next_cursor = fetch_page(campaign_deliveries, limit=limit, after=after,
+                                       fields=fields, query=query)
+    return jsonify({
+        "items": docs,
+        "count": len(docs),
+        "next_cursor": next_cursor
+    })
+
+@app.route('/api/admin/cache-stats', methods=['GET'])
+def get_cache_stats():
+    # In production, add authentication here
+    return jsonify(response_cache.stats())
+
+@app.route('/api/admin/smtp-pool', methods=['GET'])
+def get_smtp_pool_stats():
+    # In production, add authentication here
+    return jsonify(get_smtp_pool().stats())
 
 # For Vercel serverless deployment
 if __name__ == '__main__':
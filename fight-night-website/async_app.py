@@ -0,0 +1,512 @@
+"""
+Asyncio entry point for the White Collar Fight Night API
+
+Serves the same routes and JSON responses as app.py, but on Starlette with
+Motor for MongoDB and aiosmtplib for email, so a single process can keep
+hundreds of submissions in flight instead of pinning a worker per request.
+Confirmation emails go through the same email_outbox collection and are sent
+by asyncio worker tasks, several at a time. Idempotency-Key replay and the
+startup index backfills behave as in app.py. Unlike app.py there is no write
+journal (see journal.py): while MongoDB is unreachable, submissions fail
+instead of being stored locally for replay.
+
+Run with:
+
+    pip install -r requirements-async.txt
+    uvicorn async_app:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import contextlib
+import datetime
+import email.utils
+import functools
+import json
+import os
+
+# Before the local imports below, which read their settings at import time
+if not os.getenv("VERCEL"):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+from bson.objectid import ObjectId
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import email_templates
+import database
+from database import DB_NAME
+from db_indexes import bootstrap, index_ready
+from email_outbox import (CLAIM_SORT, OUTBOX_INDEX, OUTBOX_LEASE_SECONDS, OUTBOX_MAX_ATTEMPTS,
+                          OUTBOX_POLL_SECONDS, claim_query, claim_update, failure_update, lease_filter,
+                          new_job, success_update, utcnow)
+from idempotency import (HEADER, IDEMPOTENCY_DERIVED_TTL_SECONDS, IDEMPOTENCY_LEASE_SECONDS,
+                         IDEMPOTENCY_TTL_SECONDS, IN_PROGRESS, complete_update, conflict, derive_key,
+                         lease_expired, lease_update, new_reservation, takeover_query)
+from pagination import (SORT_ORDER, PaginationError, finish_page, page_projection, page_query,
+                        parse_page_args)
+from schemas import SUBMISSION_MAX_BYTES, shape_submission
+from search import add_search_terms
+from stats import record_insert_async
+from validation import (normalize_email, validate_email_signup, validate_fighter_application,
+                        validate_fighter_nomination)
+
+# Email configuration (same variables as app.py)
+EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
+EMAIL_USER = os.getenv("EMAIL_USER", "your-email@gmail.com")
+EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "your-app-password")
+EMAIL_STARTTLS = os.getenv("EMAIL_STARTTLS", "true").lower() == "true"
+FROM_EMAIL = os.getenv("FROM_EMAIL", "info@texasfightcollective.com")
+
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "3"))
+SMTP_POOL_TIMEOUT = float(os.getenv("SMTP_POOL_TIMEOUT", "30"))
+# Emails being sent at once by this process; bounded by the SMTP pool size too
+ASYNC_OUTBOX_CONCURRENCY = int(os.getenv("ASYNC_OUTBOX_CONCURRENCY", "10"))
+
+
+def json_default(value):
+    """Match Flask's jsonify output for BSON types"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return email.utils.format_datetime(value, usegmt=True)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class APIResponse(JSONResponse):
+    def render(self, content):
+        return json.dumps(content, default=json_default, separators=(",", ":")).encode("utf-8")
+
+
+def error(message, status_code=400):
+    return APIResponse({"success": False, "message": message}, status_code=status_code)
+
+
+# MongoDB connection, created inside the running event loop on first use
+_client = None
+
+
+def get_db():
+    global _client
+    if _client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _client = AsyncIOMotorClient(os.getenv("MONGO_URI"))
+    return _client[DB_NAME]
+
+
+# Indexes and backfills run through the same on_connect hooks as app.py: on database.py's
+# pymongo client, in its background thread, retried until they succeed
+database.on_connect(bootstrap)
+
+
+@database.on_connect
+def ensure_outbox_index(db):
+    db["email_outbox"].create_index(OUTBOX_INDEX, name="status_next_attempt")
+
+
+class AsyncSMTPPool:
+    """Reuses logged-in aiosmtplib sessions, at most max_size at a time"""
+
+    def __init__(self, max_size=SMTP_POOL_SIZE, timeout=SMTP_POOL_TIMEOUT):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_size)
+        self._idle = []
+
+    async def _connect(self):
+        import aiosmtplib
+
+        server = aiosmtplib.SMTP(hostname=EMAIL_HOST, port=EMAIL_PORT, timeout=self.timeout,
+                                 start_tls=EMAIL_STARTTLS)
+        await server.connect()
+        if EMAIL_USER:
+            await server.login(EMAIL_USER, EMAIL_PASSWORD)
+        return server
+
+    async def send_message(self, msg):
+        import aiosmtplib
+
+        async with self._slots:
+            server = self._idle.pop() if self._idle else None
+            try:
+                if server is None or not server.is_connected:
+                    server = await self._connect()
+                try:
+                    await server.send_message(msg)
+                except aiosmtplib.SMTPServerDisconnected:
+                    server = await self._connect()
+                    await server.send_message(msg)
+            except Exception:
+                if server is not None:
+                    server.close()
+                raise
+            self._idle.append(server)
+
+    async def close(self):
+        while self._idle:
+            server = self._idle.pop()
+            with contextlib.suppress(Exception):
+                await server.quit()
+
+
+smtp_pool = AsyncSMTPPool()
+
+
+async def deliver_email(to_email, subject, html_content, text_content=None):
+    """Send an email, raising on failure"""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    msg = MIMEMultipart('alternative')
+    msg['From'] = FROM_EMAIL
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    if text_content:
+        msg.attach(MIMEText(text_content, 'plain'))
+    msg.attach(MIMEText(html_content, 'html'))
+    await smtp_pool.send_message(msg)
+
+
+class AsyncEmailOutbox:
+    """Drains the shared email_outbox collection with concurrent asyncio tasks"""
+
+    def __init__(self, concurrency=ASYNC_OUTBOX_CONCURRENCY, max_attempts=OUTBOX_MAX_ATTEMPTS,
+                 poll_seconds=OUTBOX_POLL_SECONDS, lease_seconds=OUTBOX_LEASE_SECONDS):
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self._wakeup = None
+        self._runner = None
+        self._tasks = set()
+
+    @property
+    def collection(self):
+        return get_db()["email_outbox"]
+
+    async def enqueue(self, to_email, template_name, values):
+        subject, html_content, text_content = email_templates.render(template_name, values)
+        await self.collection.insert_one(new_job(to_email, subject, html_content, text_content))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return "queued"
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self, timeout=10.0):
+        """Stop claiming new jobs and let in-flight sends finish"""
+        if self._runner is not None:
+            self._runner.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._runner
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=timeout)
+
+    async def _claim(self):
+        from pymongo import ReturnDocument
+
+        now = utcnow()
+        return await self.collection.find_one_and_update(
+            claim_query(now), claim_update(now, self.lease_seconds),
+            sort=CLAIM_SORT, return_document=ReturnDocument.AFTER,
+        )
+
+    async def _process(self, job):
+        try:
+            await deliver_email(job["to"], job["subject"], job["html"], job.get("text"))
+        except Exception as e:
+            await self.collection.update_one(lease_filter(job), failure_update(job, e, self.max_attempts))
+        else:
+            await self.collection.update_one(lease_filter(job), success_update())
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            await slots.acquire()
+            try:
+                job = await self._claim()
+            except Exception as e:
+                print(f"Error polling email outbox: {e}")
+                job = None
+            if job is None:
+                slots.release()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                self._wakeup.clear()
+                continue
+            task = asyncio.create_task(self._process(job))
+            self._tasks.add(task)
+            task.add_done_callback(lambda t: (self._tasks.discard(t), slots.release()))
+
+
+outbox = AsyncEmailOutbox()
+
+
+async def read_json(request, max_bytes=SUBMISSION_MAX_BYTES):
+    """Parse a JSON object body of at most max_bytes; returns (data, error response)"""
+    too_large = error("Request body is too large", 413)
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        return None, too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            return None, too_large
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return None, error("Request body must be a JSON object")
+    return data, None
+
+
+class AsyncIdempotencyStore:
+    """Motor version of idempotency.IdempotencyStore, on the same idempotency_keys collection"""
+
+    def __init__(self, ttl_seconds=IDEMPOTENCY_TTL_SECONDS, derived_ttl_seconds=IDEMPOTENCY_DERIVED_TTL_SECONDS,
+                 lease_seconds=IDEMPOTENCY_LEASE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.derived_ttl_seconds = derived_ttl_seconds
+        self.lease_seconds = lease_seconds
+
+    @property
+    def collection(self):
+        return get_db()["idempotency_keys"]
+
+    async def begin(self, key, fingerprint, derived):
+        """Reserve a key; returns None if reserved, otherwise the existing record"""
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.datetime.utcnow()
+        ttl = self.derived_ttl_seconds if derived else self.ttl_seconds
+        try:
+            await self.collection.insert_one(new_reservation(key, fingerprint, ttl, self.lease_seconds, now))
+            return None
+        except DuplicateKeyError:
+            record = await self.collection.find_one({"_id": key})
+            if record is None:
+                return await self.begin(key, fingerprint, derived)
+            if record.get("expires_at") and record["expires_at"] <= now:
+                await self.collection.delete_one({"_id": key, "expires_at": record["expires_at"]})
+                return await self.begin(key, fingerprint, derived)
+            if (record["status"] == IN_PROGRESS and record.get("fingerprint") == fingerprint
+                    and lease_expired(record, now, self.lease_seconds)):
+                taken = await self.collection.update_one(takeover_query(record),
+                                                         lease_update(now, self.lease_seconds))
+                if taken.modified_count == 1:
+                    return None
+                return await self.begin(key, fingerprint, derived)
+            return record
+
+    async def complete(self, key, status_code, body):
+        await self.collection.update_one({"_id": key}, complete_update(status_code, body))
+
+    async def release(self, key):
+        await self.collection.delete_one({"_id": key, "status": IN_PROGRESS})
+
+
+idempotency_store = AsyncIdempotencyStore()
+
+
+def idempotent(view):
+    """Read the JSON body and call view(request, data), replaying successful responses for repeated keys"""
+    @functools.wraps(view)
+    async def endpoint(request):
+        data, response = await read_json(request)
+        if response is not None:
+            return response
+
+        key, fingerprint, derived = derive_key(view.__name__, request.headers.get(HEADER), data)
+        existing = await idempotency_store.begin(key, fingerprint, derived)
+        if existing is not None:
+            refused = conflict(existing, fingerprint)
+            if refused is not None:
+                return error(*refused)
+            return APIResponse(existing.get("body"), status_code=existing.get("status_code", 200),
+                               headers={"Idempotent-Replayed": "true"})
+
+        try:
+            response = await view(request, data)
+        except Exception:
+            await idempotency_store.release(key)
+            raise
+        if 200 <= response.status_code < 300:
+            await idempotency_store.complete(key, response.status_code, json.loads(response.body))
+        else:
+            # Failed attempts are not remembered, so a corrected retry goes through
+            await idempotency_store.release(key)
+        return response
+    return endpoint
+
+
+async def insert_submission(collection_name, data):
+    """Insert a shaped submission and bump its dashboard counters (see stats.py)
+
+    This server keeps no admin response cache, so there is nothing to invalidate.
+    """
+    result = await get_db()[collection_name].insert_one(data)
+    await record_insert_async(get_db()["stats_counters"], collection_name, data)
+    return result
+
+
+# Health check endpoint (never touches the database)
+async def health_check(request):
+    return APIResponse({
+        "status": "ok",
+        "message": "API is running",
+        "timestamp": datetime.datetime.utcnow().isoformat()
+    })
+
+
+async def root(request):
+    return APIResponse({
+        "status": "ok",
+        "message": "White Collar Fight Night API is running",
+        "endpoints": [
+            "/api/health",
+            "/api/fighter-application",
+            "/api/fighter-nomination",
+            "/api/email-signup"
+        ]
+    })
+
+
+@idempotent
+async def submit_fighter_application(request, data):
+    data, message = shape_submission("fighter_applications", data, validate_fighter_application)
+    if message:
+        return error(message)
+
+    data['created_at'] = datetime.datetime.utcnow()
+    add_search_terms("fighter_applications", data)
+    result = await insert_submission("fighter_applications", data)
+    email_status = await outbox.enqueue(data['email'], "fighter_application", data)
+
+    return APIResponse({
+        "success": True,
+        "message": "Fighter application submitted successfully",
+        "id": str(result.inserted_id),
+        "email_status": email_status
+    })
+
+
+@idempotent
+async def submit_fighter_nomination(request, data):
+    data, message = shape_submission("fighter_nominations", data, validate_fighter_nomination)
+    if message:
+        return error(message)
+
+    data['created_at'] = datetime.datetime.utcnow()
+    add_search_terms("fighter_nominations", data)
+    result = await insert_submission("fighter_nominations", data)
+
+    # Both emails are queued together and picked up by separate sender tasks
+    nominator_email_status, nominee_email_status = await asyncio.gather(
+        outbox.enqueue(data['yourEmail'], "nomination_nominator", data),
+        outbox.enqueue(data['nomineeEmail'], "nomination_nominee", data),
+    )
+
+    return APIResponse({
+        "success": True,
+        "message": "Fighter nomination submitted successfully",
+        "id": str(result.inserted_id),
+        "nominator_email_status": nominator_email_status,
+        "nominee_email_status": nominee_email_status
+    })
+
+
+@idempotent
+async def submit_email_signup(request, data):
+    from pymongo.errors import DuplicateKeyError
+
+    data, message = shape_submission("email_list", data, validate_email_signup)
+    if message:
+        return error(message)
+
+    data['email_normalized'] = normalize_email(data['email'])
+    data['created_at'] = datetime.datetime.utcnow()
+    # Until the unique index is confirmed, check for the address first
+    if (not index_ready("email_list", "email_normalized_unique")
+            and await get_db()["email_list"].find_one({"email_normalized": data['email_normalized']}, {"_id": 1})):
+        return error("Email already registered")
+    try:
+        result = await insert_submission("email_list", data)
+    except DuplicateKeyError:
+        return error("Email already registered")
+
+    email_status = await outbox.enqueue(data['email'], "email_signup_welcome", data)
+
+    return APIResponse({
+        "success": True,
+        "message": "Email signup successful",
+        "id": str(result.inserted_id),
+        "email_status": email_status
+    })
+
+
+def admin_list(collection_name):
+    async def endpoint(request):
+        # In production, add authentication here
+        try:
+            limit, after, fields = parse_page_args(request.query_params)
+        except PaginationError as e:
+            return error(str(e))
+
+        cursor = get_db()[collection_name].find(page_query(after), page_projection(fields))
+        docs = await cursor.sort(SORT_ORDER).limit(limit + 1).to_list(length=limit + 1)
+        docs, next_cursor = finish_page(docs, limit)
+
+        return APIResponse({
+            "items": docs,
+            "count": len(docs),
+            "next_cursor": next_cursor
+        })
+    return endpoint
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Starts the hooks without waiting for them; signups check for duplicates until the index is ready
+    database.get_client()
+    outbox.start()
+    yield
+    await outbox.stop()
+    await smtp_pool.close()
+    if _client is not None:
+        _client.close()
+    database.close_client()
+
+
+routes = [
+    Route('/api/health', health_check, methods=['GET']),
+    Route('/', root, methods=['GET']),
+    Route('/api/fighter-application', submit_fighter_application, methods=['POST']),
+    Route('/api/fighter-nomination', submit_fighter_nomination, methods=['POST']),
+    Route('/api/email-signup', submit_email_signup, methods=['POST']),
+    Route('/api/admin/fighter-applications', admin_list("fighter_applications"), methods=['GET']),
+    Route('/api/admin/fighter-nominations', admin_list("fighter_nominations"), methods=['GET']),
+    Route('/api/admin/email-list', admin_list("email_list"), methods=['GET']),
+]
+
+middleware = [
+    Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"],
+               allow_headers=["Content-Type", "Authorization", "Accept", "Idempotency-Key"]),
+]
+
+app = Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("async_app:app", host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: precompiled email templates vs. the old inline f-strings
+
+Usage: python bench_email_templates.py [iterations]
+"""
+
+import sys
+import timeit
+
+import email_templates
+
+APPLICATION = {
+    "firstName": "Jordan",
+    "lastName": "Smith",
+    "email": "jordan.smith@example.com",
+    "phone": "5125550123",
+    "jobCompany": "Acme <Holdings> & Co",
+    "weight": "180",
+    "height": "72",
+}
+
+
+def fstring_application(data):
+    """The confirmation email as it used to be built inside the route"""
+    return f"""
+    <html>
+    <body>
+        <h2>Thank You for Your Fighter Application!</h2>
+        <p>Dear {data['firstName']} {data['lastName']},</p>
+        <p>We've received your application to participate in the White Collar Fight Night.
+        Our team will review your information and get back to you soon with next steps.</p>
+
+        <h3>Your Application Details:</h3>
+        <ul>
+            <li><strong>Name:</strong> {data['firstName']} {data['lastName']}</li>
+            <li><strong>Email:</strong> {data['email']}</li>
+            <li><strong>Phone:</strong> {data['phone']}</li>
+            <li><strong>Job/Company:</strong> {data['jobCompany']}</li>
+            <li><strong>Weight:</strong> {data['weight']} lbs</li>
+            <li><strong>Height:</strong> {data['height']} inches</li>
+        </ul>
+
+        <p>If you have any questions, please don't hesitate to contact us at info@texasfightcollective.com.</p>
+
+        <p>Best regards,<br>
+        The Texas Fight Collective Team</p>
+    </body>
+    </html>
+    """
+
+
+def registry_application(data):
+    return email_templates.render("fighter_application", data)
+
+
+def registry_html_only(data):
+    template = email_templates.TEMPLATES["fighter_application"]
+    return email_templates.render_compiled(template._html, data, email_templates.escape_html)
+
+
+def bench(label, func, iterations):
+    # Best of five runs to reduce scheduler noise
+    best = min(timeit.repeat(lambda: func(APPLICATION), number=iterations, repeat=5))
+    per_call = best / iterations * 1e6
+    print(f"{label:<40} {per_call:8.2f} us/render")
+    return per_call
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"Rendering the fighter application email {iterations} times (best of 5)\n")
+    baseline = bench("f-string (HTML, unescaped)", fstring_application, iterations)
+    html_only = bench("registry (HTML, escaped)", registry_html_only, iterations)
+    full = bench("registry (subject + HTML + text)", registry_application, iterations)
+    print()
+    print(f"HTML only:  {html_only / baseline:.2f}x the f-string cost")
+    print(f"Full render: {full / baseline:.2f}x the f-string cost")
+
+
+if __name__ == "__main__":
+    main()
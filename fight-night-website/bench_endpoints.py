@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Load-testing and benchmark harness for the API
+
+Boots app.py in-process against a local MongoDB stand-in (mongomock by
+default, or a real local mongod via --mongo-uri) and a local sink SMTP server,
+drives concurrent load at each endpoint and reports throughput and
+p50/p95/p99 latency per endpoint and per stage (validation, db_write, email,
+read from the Server-Timing header), plus how long queued emails took to reach
+the sink. Results are saved as JSON so runs can be compared.
+
+Usage:
+    python bench_endpoints.py
+    python bench_endpoints.py --requests 2000 --concurrency 32 --endpoints email-signup
+    python bench_endpoints.py --mongo-uri mongodb://localhost:27017
+    python bench_endpoints.py --target http://localhost:5000
+    python bench_endpoints.py --compare bench_results/bench-20240101120000.json
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import logging
+import os
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DB_NAME = "fight_night_bench"
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept and discard messages"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 bench-sink ESMTP")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-bench-sink")
+                self.reply("250-AUTH PLAIN LOGIN")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 bench-sink")
+            elif verb == "AUTH":
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip().strip("<>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                received = time.time()
+                for recipient in recipients:
+                    self.server.deliveries.append((recipient, received))
+                self.reply("250 OK")
+            elif verb in ("NOOP", "RSET"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPSinkHandler)
+        self.deliveries = []
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address[1]
+
+
+def boot_app(mongo_uri, smtp_port):
+    """Import app.py wired to the bench database and sink, and serve it on a free port"""
+    os.environ["MONGO_DB_NAME"] = BENCH_DB_NAME
+    os.environ["EMAIL_HOST"] = "127.0.0.1"
+    os.environ["EMAIL_PORT"] = str(smtp_port)
+    os.environ["EMAIL_STARTTLS"] = "false"
+    os.environ["EMAIL_USER"] = "bench"
+    os.environ["EMAIL_PASSWORD"] = "bench"
+    os.environ["SERVER_TIMING_ENABLED"] = "true"
+    os.environ.setdefault("OUTBOX_POLL_SECONDS", "0.2")
+
+    if mongo_uri:
+        os.environ["MONGO_URI"] = mongo_uri
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed: pip install mongomock, or pass --mongo-uri")
+        import pymongo
+        # database.py imports MongoClient from pymongo when the first client is built
+        pymongo.MongoClient = mongomock.MongoClient
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as api
+    import database
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    database.get_client().drop_database(BENCH_DB_NAME)
+    database.close_client()
+
+    server = make_server("127.0.0.1", 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+# Request builders: each returns (method, path, body, email recipients)
+def scenarios(run_id):
+    counter = itertools.count()
+
+    def unique(prefix):
+        return f"{prefix}-{run_id}-{next(counter)}@bench.example.com"
+
+    def email_signup():
+        email = unique("signup")
+        return "POST", "/api/email-signup", {"email": email}, [email]
+
+    def fighter_application():
+        email = unique("fighter")
+        return "POST", "/api/fighter-application", {
+            "firstName": "Bench", "lastName": "Fighter", "email": email, "phone": "5125550123",
+            "jobCompany": "Bench Co", "weight": "180", "height": "72", "experience": "1",
+            "why": "Load testing", "charity": "Bench Charity",
+        }, [email]
+
+    def fighter_nomination():
+        nominator, nominee = unique("nominator"), unique("nominee")
+        return "POST", "/api/fighter-nomination", {
+            "yourName": "Bench Nominator", "yourEmail": nominator, "nomineeName": "Bench Nominee",
+            "nomineeEmail": nominee, "nomineePhone": "5125550123", "reason": "Load testing",
+        }, [nominator, nominee]
+
+    return {
+        "health": lambda: ("GET", "/api/health", None, []),
+        "email-signup": email_signup,
+        "fighter-application": fighter_application,
+        "fighter-nomination": fighter_nomination,
+        "admin-email-list": lambda: ("GET", "/api/admin/email-list?limit=50", None, []),
+        "admin-fighter-applications": lambda: ("GET", "/api/admin/fighter-applications?limit=50", None, []),
+    }
+
+
+def parse_server_timing(header):
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                stages[name] = float(value)
+    return stages
+
+
+def send(base_url, build):
+    method, path, body, recipients = build()
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    started_wall = time.time()
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            status, header = response.status, response.headers.get("Server-Timing")
+    except urllib.error.HTTPError as e:
+        status, header = e.code, e.headers.get("Server-Timing")
+    except Exception:
+        status, header = 0, None
+    latency_ms = (time.perf_counter() - started) * 1000
+    return {
+        "status": status,
+        "latency_ms": latency_ms,
+        "stages": parse_server_timing(header),
+        "recipients": recipients,
+        "sent_at": started_wall,
+    }
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return round(ordered[rank], 3)
+
+
+def summarize(values):
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": round(sum(values) / len(values), 3) if values else None,
+        "max": round(max(values), 3) if values else None,
+    }
+
+
+def run_endpoint(base_url, build, requests, concurrency, warmup):
+    for _ in range(warmup):
+        send(base_url, build)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: send(base_url, build), range(requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if 200 <= r["status"] < 300]
+    stage_names = sorted({name for r in ok for name in r["stages"]})
+    return results, {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "statuses": {str(s): sum(1 for r in results if r["status"] == s) for s in sorted({r["status"] for r in results})},
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "latency_ms": summarize([r["latency_ms"] for r in ok]),
+        "stages_ms": {name: summarize([r["stages"][name] for r in ok if name in r["stages"]])
+                      for name in stage_names},
+    }
+
+
+def email_delivery(sink, sent, wait_seconds):
+    """Wait for queued emails to reach the sink and report request-to-delivery lag"""
+    expected = {recipient: sent_at for recipient, sent_at in sent}
+    first_received = {}
+    deadline = time.time() + wait_seconds
+    while True:
+        for recipient, received in list(sink.deliveries):
+            if recipient in expected:
+                first_received.setdefault(recipient, received)
+        if len(first_received) >= len(expected) or time.time() >= deadline:
+            break
+        time.sleep(0.1)
+    lags = [(received - expected[recipient]) * 1000 for recipient, received in first_received.items()]
+    return {"queued": len(expected), "delivered": len(lags), "lag_ms": summarize(lags)}
+
+
+def compare(current, baseline, threshold):
+    """Print deltas against a previous run; returns the number of regressions"""
+    regressions = 0
+    print(f"\nComparison with {baseline['run'].get('timestamp')} (threshold {threshold:.0f}%)")
+    for name, stats in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before:
+            continue
+        rows = [
+            ("throughput_rps", stats["throughput_rps"], before["throughput_rps"], True),
+            ("p50_ms", stats["latency_ms"]["p50"], before["latency_ms"]["p50"], False),
+            ("p95_ms", stats["latency_ms"]["p95"], before["latency_ms"]["p95"], False),
+            ("p99_ms", stats["latency_ms"]["p99"], before["latency_ms"]["p99"], False),
+        ]
+        for metric, now, then, higher_is_better in rows:
+            if not now or not then:
+                continue
+            change = (now - then) / then * 100
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > threshold else ""
+            regressions += bool(flag)
+            print(f"  {name:<28} {metric:<15} {then:>10.2f} -> {now:>10.2f} ({change:+6.1f}%){flag}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API endpoint")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--warmup", type=int, default=10, help="Warm-up requests per endpoint")
+    parser.add_argument("--endpoints", help="Comma-separated subset of endpoints to run")
+    parser.add_argument("--mongo-uri", help="Local MongoDB to use instead of mongomock")
+    parser.add_argument("--target", help="Benchmark an already-running server instead of booting one")
+    parser.add_argument("--email-wait", type=float, default=30, help="Seconds to wait for queued emails")
+    parser.add_argument("--output", help="Results file (default bench_results/bench-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=10, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    sink = None
+    if args.target:
+        base_url = args.target.rstrip("/")
+    else:
+        sink = SMTPSink()
+        base_url = boot_app(args.mongo_uri, sink.start())
+
+    run_id = datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    available = scenarios(run_id)
+    names = args.endpoints.split(",") if args.endpoints else list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        sys.exit(f"Unknown endpoints: {', '.join(unknown)} (choose from {', '.join(available)})")
+
+    report = {
+        "run": {
+            "timestamp": datetime.datetime.utcnow().isoformat(),
+            "commit": git_commit(),
+            "target": args.target or ("mongodb" if args.mongo_uri else "mongomock"),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": sys.version.split()[0],
+        },
+        "endpoints": {},
+    }
+
+    sent = []
+    for name in names:
+        results, stats = run_endpoint(base_url, available[name], args.requests, args.concurrency, args.warmup)
+        report["endpoints"][name] = stats
+        sent.extend((recipient, r["sent_at"]) for r in results for recipient in r["recipients"])
+        latency = stats["latency_ms"]
+        print(f"{name:<28} {stats['throughput_rps']:>9.1f} req/s  "
+              f"p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms  "
+              f"errors {stats['errors']}")
+        for stage_name, stage_stats in stats["stages_ms"].items():
+            print(f"  {stage_name:<26} p50 {stage_stats['p50']} ms  p95 {stage_stats['p95']} ms  "
+                  f"p99 {stage_stats['p99']} ms")
+
+    if sink is not None and sent:
+        report["email"] = email_delivery(sink, sent, args.email_wait)
+        lag = report["email"]["lag_ms"]
+        print(f"{'email delivery':<28} {report['email']['delivered']}/{report['email']['queued']} delivered  "
+              f"lag p50 {lag['p50']} ms  p95 {lag['p95']} ms  p99 {lag['p99']} ms")
+
+    output = args.output or os.path.join("bench_results", f"bench-{run_id}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark admin-list JSON serialization
+
+Builds a dump of fighter_applications-shaped documents (ObjectId _id,
+datetime created_at) and compares the previous path, which converted each _id
+in a Python loop and then used Flask's default provider, with the orjson
+provider in json_provider.py. It reports the best wall time and the peak
+traced memory for each path.
+
+Usage:
+    python bench_json.py
+    python bench_json.py --documents 50000 --repeat 5
+"""
+
+import argparse
+import datetime
+import time
+import tracemalloc
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+
+
+def make_documents(count):
+    base = datetime.datetime(2024, 1, 1)
+    return [{
+        "_id": ObjectId(),
+        "firstName": "Fighter",
+        "lastName": f"Number {i}",
+        "email": f"fighter{i}@example.com",
+        "phone": "5125550123",
+        "jobCompany": "Example Co",
+        "weight": "180",
+        "height": "72",
+        "experience": "Some boxing classes",
+        "why": "For the charity and the challenge " * 3,
+        "charity": "Example Charity",
+        "created_at": base + datetime.timedelta(seconds=i),
+    } for i in range(count)]
+
+
+def legacy_response(app, docs):
+    with app.app_context():
+        for doc in docs:
+            doc["_id"] = str(doc["_id"])
+        return app.json.response({"items": docs, "count": len(docs), "next_cursor": None}).get_data()
+
+
+def provider_response(app, docs):
+    with app.app_context():
+        return app.json.response({"items": docs, "count": len(docs), "next_cursor": None}).get_data()
+
+
+def measure(label, app, build, docs, repeat):
+    times = []
+    for _ in range(repeat):
+        # The legacy path mutates its input, so every run gets fresh dicts
+        batch = [dict(doc) for doc in docs]
+        started = time.perf_counter()
+        body = build(app, batch)
+        times.append(time.perf_counter() - started)
+
+    batch = [dict(doc) for doc in docs]
+    tracemalloc.start()
+    build(app, batch)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{label:<28} best {min(times) * 1000:8.1f} ms   peak {peak / 1e6:7.1f} MB   body {len(body) / 1e6:.1f} MB")
+    return min(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON serialization of admin list pages")
+    parser.add_argument("--documents", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = make_documents(args.documents)
+    print(f"{args.documents} documents, best of {args.repeat}\n")
+
+    legacy = Flask("legacy")
+    legacy.json = DefaultJSONProvider(legacy)
+    baseline = measure("str(_id) loop + json", legacy, legacy_response, docs, args.repeat)
+
+    for datetime_format in ("http", "iso"):
+        app = Flask(f"provider-{datetime_format}")
+        json_provider.init_app(app).datetime_format = datetime_format
+        name = type(app.json).__name__
+        elapsed, peak = measure(f"{name} ({datetime_format} dates)", app, provider_response, docs, args.repeat)
+        print(f"{'':<28} {baseline[0] / elapsed:5.1f}x faster, {baseline[1] / peak:4.1f}x less peak memory")
+
+
+if __name__ == "__main__":
+    main()
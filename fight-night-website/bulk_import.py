@@ -0,0 +1,206 @@
+"""
+Bulk email-list import
+
+Validates an uploaded list in a single pass, drops duplicates in memory and
+against the email_normalized index, and writes the rest with chunked
+insert_many(ordered=False) calls. Every input row gets an outcome.
+"""
+
+import csv
+import datetime
+import io
+import json
+import os
+
+import email_templates
+from validation import normalize_email, validate_email
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+# Deferred welcome emails are spread out at this rate to respect SMTP limits
+BULK_WELCOME_PER_MINUTE = float(os.getenv("BULK_WELCOME_PER_MINUTE", "60"))
+
+DUPLICATE_KEY_CODES = (11000, 11001)
+
+# Row outcomes
+INSERTED = "inserted"
+INVALID = "invalid"
+DUPLICATE_IN_UPLOAD = "duplicate_in_upload"
+ALREADY_REGISTERED = "already_registered"
+ERROR = "error"
+
+
+class BulkImportError(ValueError):
+    """Raised when an upload cannot be parsed or is too large"""
+
+
+def rows_from_json(payload):
+    """Accept a list of addresses, a list of {"email": ...} objects, or {"emails": [...]}"""
+    if isinstance(payload, dict):
+        payload = payload.get("emails")
+    if not isinstance(payload, list):
+        raise BulkImportError('JSON body must be a list or an object with an "emails" list')
+    rows = []
+    for item in payload:
+        if isinstance(item, dict):
+            item = item.get("email")
+        rows.append(item if isinstance(item, str) else "")
+    return rows
+
+
+def rows_from_csv(text):
+    """Use the "email" column when there is a header, otherwise the first column"""
+    reader = csv.reader(io.StringIO(text))
+    rows = [row for row in reader if row and any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    if "email" in header:
+        column = header.index("email")
+        rows = rows[1:]
+    else:
+        column = 0
+    return [row[column] if len(row) > column else "" for row in rows]
+
+
+def parse_upload(raw, content_type, filename=None):
+    """Turn an uploaded body into a list of raw email values"""
+    if isinstance(raw, bytes):
+        try:
+            raw = raw.decode("utf-8-sig")
+        except UnicodeDecodeError as e:
+            # e.g. a cp1252 CSV exported by older Excel versions
+            raise BulkImportError(
+                f"Upload must be UTF-8 encoded (invalid byte 0x{raw[e.start]:02x} at offset {e.start}); "
+                "save CSV files as \"CSV UTF-8\""
+            )
+    is_csv = "csv" in (content_type or "") or (filename or "").lower().endswith(".csv")
+    if is_csv:
+        rows = rows_from_csv(raw)
+    else:
+        try:
+            rows = rows_from_json(json.loads(raw))
+        except json.JSONDecodeError:
+            raise BulkImportError("Body is neither valid JSON nor CSV")
+    if len(rows) > BULK_MAX_ROWS:
+        raise BulkImportError(f"Uploads are limited to {BULK_MAX_ROWS} rows")
+    return rows
+
+
+def import_emails(collection, emails, source="bulk_import", chunk_size=BULK_CHUNK_SIZE):
+    """Insert new addresses; returns (summary, per-row results, inserted addresses)"""
+    from pymongo.errors import BulkWriteError
+
+    results = [None] * len(emails)
+    candidates = {}
+
+    # Single validation and in-upload dedupe pass
+    for row, raw in enumerate(emails):
+        email = (raw or "").strip()
+        if not email or not validate_email(email):
+            results[row] = {"row": row, "email": raw, "status": INVALID}
+            continue
+        normalized = normalize_email(email)
+        if normalized in candidates:
+            results[row] = {"row": row, "email": email, "status": DUPLICATE_IN_UPLOAD}
+            continue
+        candidates[normalized] = (row, email)
+
+    inserted = []
+    now = datetime.datetime.utcnow()
+    pending = list(candidates.items())
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+
+        # One indexed $in lookup per chunk instead of a find_one per address
+        existing = set(
+            doc["email_normalized"] for doc in collection.find(
+                {"email_normalized": {"$in": [normalized for normalized, _ in chunk]}},
+                {"email_normalized": 1, "_id": 0},
+            )
+        )
+        docs = []
+        rows = []
+        for normalized, (row, email) in chunk:
+            if normalized in existing:
+                results[row] = {"row": row, "email": email, "status": ALREADY_REGISTERED}
+                continue
+            docs.append({
+                "email": email,
+                "email_normalized": normalized,
+                "source": source,
+                "created_at": now,
+            })
+            rows.append(row)
+        if not docs:
+            continue
+
+        failed = {}
+        try:
+            collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = error
+
+        for index, (row, doc) in enumerate(zip(rows, docs)):
+            error = failed.get(index)
+            if error is None:
+                results[row] = {"row": row, "email": doc["email"], "status": INSERTED,
+                                "id": str(doc["_id"])}
+                inserted.append(doc["email"])
+            elif error.get("code") in DUPLICATE_KEY_CODES:
+                # Registered concurrently between the lookup and the insert
+                results[row] = {"row": row, "email": doc["email"], "status": ALREADY_REGISTERED}
+            else:
+                results[row] = {"row": row, "email": doc["email"], "status": ERROR,
+                                "message": error.get("errmsg")}
+
+    summary = {"total": len(emails)}
+    for status in (INSERTED, INVALID, DUPLICATE_IN_UPLOAD, ALREADY_REGISTERED, ERROR):
+        summary[status] = sum(1 for result in results if result["status"] == status)
+    return summary, results, inserted
+
+
+def schedule_welcome_emails(outbox, emails, per_minute=BULK_WELCOME_PER_MINUTE, chunk_size=BULK_CHUNK_SIZE):
+    """Queue welcome emails spaced out to at most per_minute sends"""
+    if not emails:
+        return 0
+    values = {}
+    subject, html_content, text_content = email_templates.render("email_signup_welcome", values)
+    interval = 60.0 / per_minute if per_minute > 0 else 0.0
+    start = datetime.datetime.utcnow()
+    for offset in range(0, len(emails), chunk_size):
+        outbox.enqueue_many([
+            (email, subject, html_content, text_content,
+             start + datetime.timedelta(seconds=(offset + i) * interval))
+            for i, email in enumerate(emails[offset:offset + chunk_size])
+        ])
+    return len(emails)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import a CSV or JSON list of emails into email_list")
+    parser.add_argument("path", help="CSV (email column or first column) or JSON file")
+    parser.add_argument("--source", default="bulk_import", help="Value stored in each document's source field")
+    parser.add_argument("--welcome", action="store_true", help="Queue throttled welcome emails for new addresses")
+    parser.add_argument("--rows", action="store_true", help="Print the outcome of every row")
+    args = parser.parse_args()
+
+    from app import email_list, outbox, record_inserts
+
+    with open(args.path, "rb") as f:
+        try:
+            rows = parse_upload(f.read(), None, filename=args.path)
+        except BulkImportError as e:
+            parser.error(str(e))
+    summary, results, inserted = import_emails(email_list, rows, source=args.source)
+    if summary["inserted"]:
+        record_inserts(email_list.name, {}, count=summary["inserted"])
+    if args.welcome:
+        summary["welcome_queued"] = schedule_welcome_emails(outbox, inserted)
+    if args.rows:
+        for result in results:
+            print(json.dumps(result))
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,473 @@
+"""
+Newsletter campaigns to the email list
+
+A campaign is a subject, HTML body and optional plain-text body stored in the
+campaigns collection and compiled with email_templates, so {email}, {source}
+and any other email_list field are filled in per recipient. The sender streams
+email_list in _id order (skipping documents with unsubscribed: true) and sends
+on its own SMTP pool of CAMPAIGN_CONCURRENCY sessions, paced by a rate limit
+shared by all sending threads. Confirmation emails keep their own pool.
+
+Progress survives crashes and restarts:
+
+- Right before its first SMTP attempt, every recipient gets a
+  campaign_deliveries document ("sending") that is updated to "sent" or
+  "failed" afterwards. A unique (campaign_id, email_normalized) index makes
+  that insert the claim, so an address is never sent the same campaign twice.
+- After each batch the campaign stores its checkpoint, the last email_list _id
+  handled, and the next run starts the cursor after it. A batch cut short by
+  stop() is not checkpointed; its unclaimed recipients are sent on resume.
+- A process that dies mid-send leaves "sending" deliveries behind. Those
+  emails may have gone out, so they are marked "unknown" and not retried.
+
+Only one process sends a campaign at a time: the sender holds a lease on the
+campaign document and renews it with every checkpoint. Cancelling a campaign
+stops its sender at the next checkpoint.
+
+A campaign stopped by stop() (a gunicorn worker being recycled or shut down)
+is marked for resumption, and so is one whose sender died without releasing
+its lease. resume_abandoned() starts those in the calling process; gunicorn
+workers call it once they connect (see gunicorn.conf.py), and
+`python campaigns.py resume` does the same from cron. Campaigns interrupted by
+an error are only resumed by hand.
+
+    python campaigns.py create --subject "Fight card announced" --html card.html --text card.txt
+    python campaigns.py run <campaign id>
+    python campaigns.py status <campaign id>
+    python campaigns.py resume
+"""
+
+import datetime
+import itertools
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from email_outbox import backoff_delay
+from email_templates import EmailTemplate
+from validation import normalize_email
+
+CAMPAIGN_CONCURRENCY = int(os.getenv("CAMPAIGN_CONCURRENCY", "3"))
+CAMPAIGN_RATE_PER_SECOND = float(os.getenv("CAMPAIGN_RATE_PER_SECOND", "5"))
+CAMPAIGN_BATCH_SIZE = int(os.getenv("CAMPAIGN_BATCH_SIZE", "100"))
+CAMPAIGN_MAX_ATTEMPTS = int(os.getenv("CAMPAIGN_MAX_ATTEMPTS", "3"))
+CAMPAIGN_LEASE_SECONDS = float(os.getenv("CAMPAIGN_LEASE_SECONDS", "300"))
+
+MAX_SUBJECT_LENGTH = 200
+MAX_BODY_LENGTH = 200000
+
+# Campaign states
+PENDING = "pending"
+RUNNING = "running"
+INTERRUPTED = "interrupted"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+
+# Delivery states
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+UNKNOWN = "unknown"
+DELIVERY_STATES = (SENDING, SENT, FAILED, UNKNOWN)
+
+# Recipients who asked not to be mailed are skipped
+RECIPIENT_QUERY = {"unsubscribed": {"$ne": True}}
+
+
+class CampaignError(ValueError):
+    """Raised for an invalid campaign definition or a campaign that cannot be started"""
+
+
+def utcnow():
+    return datetime.datetime.utcnow()
+
+
+class RateLimiter:
+    """Spaces calls at least 1 / per_second apart across all threads"""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def new_campaign(subject, html, text=None, name=None):
+    """Validate a campaign definition and build its document"""
+    if not isinstance(subject, str) or not subject.strip():
+        raise CampaignError("subject is required")
+    if not isinstance(html, str) or not html.strip():
+        raise CampaignError("html is required")
+    if text is not None and not isinstance(text, str):
+        raise CampaignError("text must be a string")
+    if len(subject) > MAX_SUBJECT_LENGTH:
+        raise CampaignError(f"subject is limited to {MAX_SUBJECT_LENGTH} characters")
+    if len(html) + len(text or "") > MAX_BODY_LENGTH:
+        raise CampaignError(f"html and text are limited to {MAX_BODY_LENGTH} characters")
+    return {
+        "name": name or subject.strip(),
+        "subject": subject.strip(),
+        "html": html,
+        "text": text or "",
+        "status": PENDING,
+        "checkpoint": None,
+        "created_at": utcnow(),
+    }
+
+
+def claim_query(campaign_id, now):
+    """A campaign nobody is sending: not started, interrupted, or whose sender's lease expired"""
+    return {"_id": campaign_id, "$or": [
+        {"status": {"$in": [PENDING, INTERRUPTED]}},
+        {"status": RUNNING, "lease_expires_at": {"$lte": now}},
+    ]}
+
+
+def resumable_query(now):
+    """Campaigns stopped by a shutdown, or whose sender died without releasing its lease"""
+    return {"$or": [
+        {"status": INTERRUPTED, "resume": True},
+        {"status": RUNNING, "lease_expires_at": {"$lte": now}},
+    ]}
+
+
+def startable(campaign, now=None):
+    """Whether claim() could take the campaign right now"""
+    now = now or utcnow()
+    if campaign["status"] in (PENDING, INTERRUPTED):
+        return True
+    lease_expires_at = campaign.get("lease_expires_at")
+    return campaign["status"] == RUNNING and lease_expires_at is not None and lease_expires_at <= now
+
+
+def is_permanent(error):
+    """SMTP 5xx replies (e.g. unknown mailbox) will not succeed on retry"""
+    import smtplib
+
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+class CampaignSender:
+    """Sends campaigns to the email list with bounded concurrency and checkpoints"""
+
+    def __init__(self, campaigns, deliveries, recipients, deliver,
+                 concurrency=CAMPAIGN_CONCURRENCY, rate_per_second=CAMPAIGN_RATE_PER_SECOND,
+                 batch_size=CAMPAIGN_BATCH_SIZE, max_attempts=CAMPAIGN_MAX_ATTEMPTS,
+                 lease_seconds=CAMPAIGN_LEASE_SECONDS):
+        # deliver(to_email, subject, html_content, text_content) must raise on failure
+        self.campaigns = campaigns
+        self.deliveries = deliveries
+        self.recipients = recipients
+        self.deliver = deliver
+        self.concurrency = max(concurrency, 1)
+        self.rate_per_second = rate_per_second
+        self.batch_size = max(batch_size, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        # campaign id -> (thread, stop event) for runs started by start()
+        self._threads = {}
+        self._closed = False
+
+    def create(self, subject, html, text=None, name=None):
+        """Store a new pending campaign and return its id"""
+        doc = new_campaign(subject, html, text, name)
+        return self.campaigns.insert_one(doc).inserted_id
+
+    def claim(self, campaign_id, owner):
+        """Take the lease on a campaign; returns its document or None if it cannot run now"""
+        from pymongo import ReturnDocument
+
+        now = utcnow()
+        campaign = self.campaigns.find_one_and_update(
+            claim_query(campaign_id, now),
+            {"$set": {"status": RUNNING, "owner": owner, "last_error": None,
+                      "lease_expires_at": now + datetime.timedelta(seconds=self.lease_seconds)},
+             "$min": {"started_at": now},
+             "$unset": {"resume": ""}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if campaign is not None:
+            # Left by a sender that died between claiming and recording the outcome
+            self.deliveries.update_many({"campaign_id": campaign_id, "status": SENDING},
+                                        {"$set": {"status": UNKNOWN, "updated_at": now}})
+        return campaign
+
+    def run(self, campaign_id, stopping=None):
+        """Send a campaign in the calling thread until it completes, is cancelled or stopping is set"""
+        stopping = stopping or threading.Event()
+        owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        campaign = self.claim(campaign_id, owner)
+        if campaign is None:
+            raise CampaignError("Campaign is not startable: it is already running, finished or missing")
+
+        template = EmailTemplate(campaign["name"], campaign["subject"], campaign["html"], campaign["text"])
+        limiter = RateLimiter(self.rate_per_second)
+        checkpoint = campaign.get("checkpoint")
+        status = COMPLETED
+        resume = False
+        try:
+            with ThreadPoolExecutor(self.concurrency, thread_name_prefix="campaign") as pool:
+                for batch in self._batches(checkpoint):
+                    self._send_batch(campaign_id, template, batch, pool, limiter, stopping)
+                    if stopping.is_set():
+                        # Recipients skipped in this batch are picked up on resume
+                        status = INTERRUPTED
+                        resume = True
+                        break
+                    checkpoint = batch[-1]["_id"]
+                    if not self._checkpoint(campaign_id, owner, checkpoint):
+                        # Cancelled, or the lease was lost to another sender
+                        return self.status(campaign_id)
+        except Exception as e:
+            print(f"Error sending campaign {campaign_id}: {e}")
+            self._finish(campaign_id, owner, INTERRUPTED, str(e)[:500])
+            raise
+        self._finish(campaign_id, owner, status, resume=resume)
+        return self.status(campaign_id)
+
+    def _batches(self, checkpoint):
+        """Recipients after the checkpoint in _id order, batch_size at a time"""
+        from pymongo.errors import CursorNotFound
+
+        while True:
+            query = dict(RECIPIENT_QUERY)
+            if checkpoint is not None:
+                query["_id"] = {"$gt": checkpoint}
+            cursor = self.recipients.find(query).sort("_id", 1).batch_size(self.batch_size)
+            try:
+                while True:
+                    batch = list(itertools.islice(cursor, self.batch_size))
+                    if not batch:
+                        return
+                    checkpoint = batch[-1]["_id"]
+                    yield batch
+            except CursorNotFound:
+                # The server dropped an idle cursor; pick up after the last batch
+                continue
+            finally:
+                cursor.close()
+
+    def _send_batch(self, campaign_id, template, batch, pool, limiter, stopping):
+        outcomes = [outcome for outcome in pool.map(
+            lambda recipient: self._send_one(campaign_id, template, limiter, stopping, *recipient),
+            self._recipients(batch)) if outcome is not None]
+        if outcomes:
+            from pymongo import UpdateOne
+
+            now = utcnow()
+            self.deliveries.bulk_write([
+                UpdateOne({"_id": delivery_id}, {"$set": dict(outcome, updated_at=now)})
+                for delivery_id, outcome in outcomes
+            ], ordered=False)
+
+    @staticmethod
+    def _recipients(batch):
+        """(email, email_normalized, recipient) per distinct, usable address in a batch"""
+        recipients = []
+        seen = set()
+        for recipient in batch:
+            email = recipient.get("email")
+            if not isinstance(email, str) or not email.strip():
+                continue
+            normalized = recipient.get("email_normalized") or normalize_email(email)
+            if normalized in seen:
+                continue
+            seen.add(normalized)
+            recipients.append((email.strip(), normalized, recipient))
+        return recipients
+
+    def _claim(self, campaign_id, email, normalized, recipient):
+        """Insert the "sending" delivery; returns its id, or None if an earlier run has it"""
+        from pymongo.errors import DuplicateKeyError
+
+        try:
+            return self.deliveries.insert_one({
+                "campaign_id": campaign_id, "email": email, "email_normalized": normalized,
+                "recipient_id": recipient["_id"], "status": SENDING, "attempts": 0,
+                "created_at": utcnow(),
+            }).inserted_id
+        except DuplicateKeyError:
+            return None
+
+    def _send_one(self, campaign_id, template, limiter, stopping, email, normalized, recipient):
+        """Claim and send to one recipient; returns (delivery_id, outcome) or None if skipped"""
+        if stopping.is_set():
+            return None
+        values = {key: value for key, value in recipient.items() if key != "_id"}
+        values["email"] = email
+        subject, html_content, text_content = template.render(values)
+        # Claimed only now, so a crash leaves "unknown" just the sends that were in flight
+        delivery_id = self._claim(campaign_id, email, normalized, recipient)
+        if delivery_id is None:
+            return None
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            limiter.wait()
+            try:
+                self.deliver(email, subject, html_content, text_content or None)
+                return delivery_id, {"status": SENT, "attempts": attempt, "sent_at": utcnow(),
+                                     "last_error": None}
+            except Exception as e:
+                error = e
+                if is_permanent(e) or attempt == self.max_attempts:
+                    break
+                time.sleep(backoff_delay(attempt, base=1.0, cap=30.0))
+        return delivery_id, {"status": FAILED, "attempts": attempt, "last_error": str(error)[:500]}
+
+    def _checkpoint(self, campaign_id, owner, checkpoint):
+        """Record progress and renew the lease; False if this sender no longer owns the campaign"""
+        result = self.campaigns.update_one(
+            {"_id": campaign_id, "owner": owner, "status": RUNNING},
+            {"$set": {"checkpoint": checkpoint, "lease_expires_at":
+                      utcnow() + datetime.timedelta(seconds=self.lease_seconds)}},
+        )
+        return result.matched_count == 1
+
+    def _finish(self, campaign_id, owner, status, error=None, resume=False):
+        update = {"status": status, "last_error": error}
+        if resume:
+            # Picked up by resume_abandoned() in another worker or process
+            update["resume"] = True
+        if status == COMPLETED:
+            update["completed_at"] = utcnow()
+        self.campaigns.update_one({"_id": campaign_id, "owner": owner, "status": RUNNING},
+                                  {"$set": update, "$unset": {"lease_expires_at": "", "owner": ""}})
+
+    def start(self, campaign_id):
+        """Run a campaign in a background thread of this process"""
+        stopping = threading.Event()
+
+        def target():
+            try:
+                self.run(campaign_id, stopping)
+            except Exception as e:
+                print(f"Campaign {campaign_id} stopped: {e}")
+            finally:
+                with self._lock:
+                    self._threads.pop(campaign_id, None)
+
+        with self._lock:
+            if self._closed:
+                raise CampaignError("Campaign sender is shutting down")
+            if campaign_id in self._threads:
+                raise CampaignError("Campaign is already running in this process")
+            thread = threading.Thread(target=target, name=f"campaign-{campaign_id}", daemon=True)
+            self._threads[campaign_id] = (thread, stopping)
+        thread.start()
+        return thread
+
+    def resumable(self):
+        """Ids of campaigns that resume_abandoned() would start"""
+        return [doc["_id"] for doc in self.campaigns.find(resumable_query(utcnow()), {"_id": 1})]
+
+    def resume_abandoned(self):
+        """Start campaigns left behind by a stopped or dead sender; returns the ids started here"""
+        started = []
+        for campaign_id in self.resumable():
+            try:
+                self.start(campaign_id)
+            except CampaignError:
+                continue
+            started.append(campaign_id)
+        return started
+
+    def cancel(self, campaign_id):
+        """Stop a campaign for good; a running sender stops at its next checkpoint"""
+        result = self.campaigns.update_one(
+            {"_id": campaign_id, "status": {"$in": [PENDING, RUNNING, INTERRUPTED]}},
+            {"$set": {"status": CANCELLED, "cancelled_at": utcnow()},
+             "$unset": {"lease_expires_at": "", "owner": ""}},
+        )
+        return result.modified_count == 1
+
+    def stop(self, timeout=10.0):
+        """Stop background senders after their in-flight sends; they resume from the checkpoint
+
+        No new runs start afterwards. timeout bounds the total wait.
+        """
+        with self._lock:
+            self._closed = True
+            runs = list(self._threads.values())
+        for _, stopping in runs:
+            stopping.set()
+        deadline = time.monotonic() + timeout
+        for thread, _ in runs:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+    def delivery_counts(self, campaign_id):
+        counts = dict.fromkeys(DELIVERY_STATES, 0)
+        for row in self.deliveries.aggregate([
+            {"$match": {"campaign_id": campaign_id}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+    def status(self, campaign_id):
+        """Campaign document (without its bodies) plus delivery counts, or None"""
+        campaign = self.campaigns.find_one({"_id": campaign_id}, {"html": 0, "text": 0})
+        if campaign is not None:
+            campaign["deliveries"] = self.delivery_counts(campaign_id)
+        return campaign
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from bson.objectid import ObjectId
+
+    parser = argparse.ArgumentParser(description="Create and send newsletter campaigns to email_list")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="Store a new campaign and print its id")
+    create.add_argument("--subject", required=True)
+    create.add_argument("--html", required=True, help="File with the HTML body")
+    create.add_argument("--text", help="File with the plain-text body")
+    create.add_argument("--name")
+    for command in ("run", "status", "cancel"):
+        commands.add_parser(command).add_argument("campaign_id")
+    commands.add_parser("resume", help="Run every campaign left behind by a stopped or dead sender")
+    args = parser.parse_args()
+
+    from app import campaign_sender
+
+    if args.command == "create":
+        with open(args.html) as f:
+            html_body = f.read()
+        text_body = None
+        if args.text:
+            with open(args.text) as f:
+                text_body = f.read()
+        print(campaign_sender.create(args.subject, html_body, text_body, args.name))
+    elif args.command == "resume":
+        for campaign_id in campaign_sender.resumable():
+            try:
+                status = campaign_sender.run(campaign_id)
+            except CampaignError:
+                # Taken by another sender in the meantime
+                continue
+            print(json.dumps(status, indent=2, default=str))
+    else:
+        campaign_id = ObjectId(args.campaign_id)
+        if args.command == "run":
+            campaign_sender.run(campaign_id)
+        elif args.command == "cancel":
+            print("Cancelled" if campaign_sender.cancel(campaign_id) else "Nothing to cancel")
+        print(json.dumps(campaign_sender.status(campaign_id), indent=2, default=str))
@@ -9,5 +9,13 @@ export const API_ENDPOINTS = {
   FIGHTER_NOMINATION: `${API_BASE_URL}/api/fighter-nomination`,
 }
 
+// Sent with form submissions so retries and double clicks are only processed once
+export function newIdempotencyKey() {
+  if (typeof crypto !== "undefined" && typeof crypto.randomUUID === "function") {
+    return crypto.randomUUID()
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`
+}
+
 export default API_BASE_URL
 
@@ -18,11 +18,13 @@ import { Label } from "@/components/ui/label"
 import { Textarea } from "@/components/ui/textarea"
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select"
 import { useToast } from "@/hooks/use-toast"
-import { API_ENDPOINTS } from "./api-config"
+import { API_ENDPOINTS, newIdempotencyKey } from "./api-config"
 
 export default function FightApplicationButton() {
   const [isSubmitting, setIsSubmitting] = useState(false)
   const [open, setOpen] = useState(false)
+  // One key per filled-in form; replaced after a successful submission
+  const [idempotencyKey, setIdempotencyKey] = useState(newIdempotencyKey)
   const { toast } = useToast()
 
   // Form state
@@ -166,6 +168,7 @@ export default function FightApplicationButton() {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          "Idempotency-Key": idempotencyKey,
         },
         body: JSON.stringify(formData),
       })
@@ -192,6 +195,7 @@ export default function FightApplicationButton() {
         setExperience("0")
         setWhy("")
         setCharity("")
+        setIdempotencyKey(newIdempotencyKey())
         setOpen(false)
       } else {
         toast({
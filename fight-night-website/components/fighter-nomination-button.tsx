@@ -17,11 +17,13 @@ import { Input } from "@/components/ui/input"
 import { Label } from "@/components/ui/label"
 import { Textarea } from "@/components/ui/textarea"
 import { useToast } from "@/hooks/use-toast"
-import { API_ENDPOINTS } from "./api-config"
+import { API_ENDPOINTS, newIdempotencyKey } from "./api-config"
 
 export default function FighterNominationButton() {
   const [isSubmitting, setIsSubmitting] = useState(false)
   const [open, setOpen] = useState(false)
+  // One key per filled-in form; replaced after a successful submission
+  const [idempotencyKey, setIdempotencyKey] = useState(newIdempotencyKey)
   const { toast } = useToast()
 
   // Form state
@@ -138,6 +140,7 @@ export default function FighterNominationButton() {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          "Idempotency-Key": idempotencyKey,
         },
         body: JSON.stringify(formData),
       })
@@ -159,6 +162,7 @@ export default function FighterNominationButton() {
         setNomineeEmail("")
         setNomineePhone("")
         setReason("")
+        setIdempotencyKey(newIdempotencyKey())
         setOpen(false)
       } else {
         toast({
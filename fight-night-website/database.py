@@ -0,0 +1,156 @@
+"""
+Lazily created MongoDB connection
+
+pymongo is imported and the client is built on the first database access, not
+at import time, so routes that never touch MongoDB (health checks, the root
+endpoint) start fast. The client is then kept for the life of the process,
+which on serverless platforms means it is reused across warm invocations.
+
+on_connect hooks (index creation and backfills) run in a background thread
+once a client is created, so the request that created it does not wait for
+them. Hooks that fail are retried every MONGO_STARTUP_RETRY_SECONDS until they
+succeed. `python db_indexes.py` runs the same work at deploy time.
+"""
+
+import os
+import threading
+
+DB_NAME = os.getenv("MONGO_DB_NAME", "white_collar_fight_night")
+MONGO_STARTUP_RETRY_SECONDS = float(os.getenv("MONGO_STARTUP_RETRY_SECONDS", "30"))
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+_on_connect = []
+_listener_factories = []
+# Hooks still to run (or retry) for the current client
+_pending_hooks = []
+_hooks_lock = threading.Lock()
+_hooks_wakeup = threading.Event()
+
+
+def on_connect(callback):
+    """Register callback(db) to run once each time a client is created
+
+    Callbacks run in a background thread and must raise if they did not
+    finish; they are then retried, so they must be safe to run again.
+    """
+    _on_connect.append(callback)
+    return callback
+
+
+def add_listener(factory):
+    """Register factory() -> pymongo event listener for every new client
+
+    Factories run when a client is built, so pymongo.monitoring is only
+    imported once the database is actually used.
+    """
+    _listener_factories.append(factory)
+    return factory
+
+
+def get_client():
+    """Return the process-wide MongoClient, creating it on first use"""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _lock:
+        if _client is None or _client_pid != pid:
+            from pymongo import MongoClient
+
+            # A client inherited across fork() must not be reused by the child
+            listeners = [factory() for factory in _listener_factories]
+            _client = MongoClient(os.getenv("MONGO_URI"), event_listeners=listeners)
+            _client_pid = pid
+            _pending_hooks[:] = _on_connect
+            if _pending_hooks:
+                threading.Thread(target=_run_hooks_until_done, args=(_client,),
+                                 name="mongo-startup", daemon=True).start()
+    return _client
+
+
+def run_startup_hooks():
+    """Run the hooks that have not succeeded yet for this client; True when none are left
+
+    Runs in the calling thread. Called by the startup thread, and by anything
+    that has just seen MongoDB become reachable (see journal.py).
+    """
+    if not is_connected():
+        return False
+    client = _client
+    with _hooks_lock:
+        for callback in list(_pending_hooks):
+            if client is not _client:
+                return False
+            try:
+                callback(client[DB_NAME])
+            except Exception as e:
+                print(f"Error running MongoDB startup hook {callback.__name__}: {e}")
+            else:
+                _pending_hooks.remove(callback)
+        return not _pending_hooks
+
+
+def startup_complete():
+    """True once every on_connect hook has succeeded for this process's client"""
+    return is_connected() and not _pending_hooks
+
+
+def retry_startup_hooks():
+    """Wake the startup thread so that failed hooks are retried now"""
+    _hooks_wakeup.set()
+
+
+def _run_hooks_until_done(client):
+    while client is _client:
+        if run_startup_hooks():
+            return
+        _hooks_wakeup.wait(MONGO_STARTUP_RETRY_SECONDS)
+        _hooks_wakeup.clear()
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+def is_connected():
+    """True once a client exists in this process (no connection is attempted)"""
+    return _client is not None and _client_pid == os.getpid()
+
+
+def close_client():
+    """Close the client; the next access creates a new one"""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def reset_after_fork():
+    """Forget a client inherited from the parent process, without closing it
+
+    Closing would end sessions on sockets the parent may still be using.
+    The lock is replaced too, in case another thread held it at fork time.
+    """
+    global _client, _client_pid, _lock, _hooks_lock, _pending_hooks
+    _lock = threading.Lock()
+    _hooks_lock = threading.Lock()
+    _client = None
+    _client_pid = None
+    _pending_hooks = []
+
+
+class LazyCollection:
+    """Stand-in for a pymongo Collection that connects on first use"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self.name!r})"
@@ -0,0 +1,189 @@
+"""
+MongoDB index bootstrap for White Collar Fight Night
+
+Run once per process at startup, in the background (see database.py), or
+at deploy time with `python db_indexes.py`. create_index is a no-op for
+indexes that already exist, so this is safe to call on every boot.
+"""
+
+from schemas import backfill_shapes
+from search import SEARCH_FIELDS, backfill_search_terms, search_indexes
+
+# Same values as pymongo.ASCENDING / DESCENDING, without importing pymongo
+ASCENDING = 1
+DESCENDING = -1
+
+# Matches the (created_at, _id) keyset order used by the admin list endpoints
+NEWEST_FIRST = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+INDEXES = {
+    "fighter_applications": [
+        (NEWEST_FIRST, {"name": "created_at_desc"}),
+        ([("email", ASCENDING)], {"name": "email"}),
+        # Numeric range queries; weight and height are stored as numbers (see schemas.py)
+        ([("weight", ASCENDING), ("height", ASCENDING)], {"name": "weight_height"}),
+    ] + search_indexes("fighter_applications"),
+    "fighter_nominations": [
+        (NEWEST_FIRST, {"name": "created_at_desc"}),
+        ([("yourEmail", ASCENDING)], {"name": "your_email"}),
+        ([("nomineeEmail", ASCENDING)], {"name": "nominee_email"}),
+    ] + search_indexes("fighter_nominations"),
+    "email_list": [
+        (NEWEST_FIRST, {"name": "created_at_desc"}),
+        ([("email_normalized", ASCENDING)], {
+            "name": "email_normalized_unique",
+            "unique": True,
+            # Older documents are backfilled below; anything still lacking the
+            # field must not collide on a missing value
+            "partialFilterExpression": {"email_normalized": {"$type": "string"}},
+        }),
+    ],
+    "campaign_deliveries": [
+        # One delivery per address per campaign; inserting it claims the send
+        ([("campaign_id", ASCENDING), ("email_normalized", ASCENDING)], {
+            "name": "campaign_email_unique",
+            "unique": True,
+        }),
+        ([("campaign_id", ASCENDING)] + NEWEST_FIRST, {"name": "campaign_created_at_desc"}),
+        ([("campaign_id", ASCENDING), ("status", ASCENDING)] + NEWEST_FIRST,
+         {"name": "campaign_status_created_at_desc"}),
+    ],
+    "stats_counters": [
+        ([("collection", ASCENDING), ("day", ASCENDING)], {"name": "collection_day"}),
+    ],
+    "idempotency_keys": [
+        # MongoDB deletes each record once its expires_at has passed
+        ([("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+    ],
+}
+
+
+# "collection.index" names created (or found) by this process
+_ready = set()
+
+
+def index_ready(collection_name, index_name):
+    """True once this process has confirmed the index exists"""
+    return f"{collection_name}.{index_name}" in _ready
+
+
+def mark_ready(collection_name, index_name):
+    _ready.add(f"{collection_name}.{index_name}")
+
+
+def backfill_normalized_emails(collection):
+    """Populate email_normalized on signups stored before it existed"""
+    result = collection.update_many(
+        {"email_normalized": {"$exists": False}, "email": {"$type": "string"}},
+        [{"$set": {"email_normalized": {"$toLower": {"$trim": {"input": "$email"}}}}}],
+    )
+    return result.modified_count
+
+
+def resolve_email_duplicates(collection):
+    """Take all but the earliest signup per address out of the unique index
+
+    The unique index cannot be built while duplicates exist (signups raced
+    before it did). Later copies keep their data but move email_normalized to
+    duplicate_email_normalized, outside the index's partial filter, and point
+    at the kept signup with duplicate_of. Returns how many were moved.
+    """
+    from pymongo import UpdateOne
+
+    pipeline = [
+        {"$match": {"email_normalized": {"$type": "string"}}},
+        {"$sort": {"created_at": ASCENDING, "_id": ASCENDING}},
+        {"$group": {"_id": "$email_normalized", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    updates = []
+    for group in collection.aggregate(pipeline, allowDiskUse=True):
+        kept = group["ids"][0]
+        for doc_id in group["ids"][1:]:
+            updates.append(UpdateOne({"_id": doc_id}, {
+                "$set": {"duplicate_of": kept, "duplicate_email_normalized": group["_id"]},
+                "$unset": {"email_normalized": ""},
+            }))
+    if updates:
+        collection.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+class IndexBootstrapError(RuntimeError):
+    """Raised by bootstrap() when some indexes could not be created"""
+
+
+def ensure_indexes(db):
+    """Create every index the API relies on; returns the indexes and backfills that failed"""
+    from pymongo.errors import PyMongoError
+
+    failed = []
+
+    try:
+        existing = db["email_list"].index_information()
+        if "email_normalized_unique" not in existing:
+            backfilled = backfill_normalized_emails(db["email_list"])
+            if backfilled:
+                print(f"Backfilled email_normalized on {backfilled} signup(s)")
+            duplicates = resolve_email_duplicates(db["email_list"])
+            if duplicates:
+                print(f"Moved {duplicates} duplicate signup(s) out of email_normalized_unique; "
+                      f"find them with {{duplicate_of: {{$exists: true}}}}")
+    except PyMongoError as e:
+        print(f"Error backfilling normalized emails: {e}")
+        failed.append("email_list backfill")
+
+    try:
+        # Documents stored before schemas.py kept weight, height and phones as raw strings;
+        # the weight_height index is created alongside the conversion
+        if "weight_height" not in db["fighter_applications"].index_information():
+            for collection_name in ("fighter_applications", "fighter_nominations"):
+                converted = backfill_shapes(db[collection_name])
+                if converted:
+                    print(f"Converted numbers and phones on {converted} {collection_name} document(s)")
+    except PyMongoError as e:
+        print(f"Error converting stored numbers and phones: {e}")
+        failed.append("fighter_applications backfill")
+
+    for collection_name in SEARCH_FIELDS:
+        try:
+            if "search_terms" not in db[collection_name].index_information():
+                backfilled = backfill_search_terms(db[collection_name])
+                if backfilled:
+                    print(f"Backfilled search terms on {backfilled} {collection_name} document(s)")
+        except PyMongoError as e:
+            print(f"Error backfilling search terms on {collection_name}: {e}")
+            failed.append(f"{collection_name} search backfill")
+
+    for collection_name, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                db[collection_name].create_index(keys, **options)
+                mark_ready(collection_name, options["name"])
+            except PyMongoError as e:
+                print(f"Error creating index {collection_name}.{options['name']}: {e}")
+                failed.append(f"{collection_name}.{options['name']}")
+
+    return failed
+
+
+def bootstrap(db):
+    """on_connect hook: ensure_indexes, raising so that failures are retried"""
+    failed = ensure_indexes(db)
+    if failed:
+        raise IndexBootstrapError(f"Failed to create {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    import os
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    # Imported after load_dotenv so that MONGO_DB_NAME from .env is honoured
+    from database import DB_NAME
+
+    client = MongoClient(os.getenv("MONGO_URI"))
+    failures = ensure_indexes(client[DB_NAME])
+    print("Indexes are up to date" if not failures else f"Failed: {', '.join(failures)}")
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,253 @@
+"""
+Durable email outbox for White Collar Fight Night
+
+Routes enqueue confirmation emails into a MongoDB collection and return
+immediately. A small pool of background worker threads drains the outbox,
+retrying failed sends with exponential backoff.
+"""
+
+import datetime
+import os
+import random
+import threading
+import time
+import uuid
+
+# Same value as pymongo.ASCENDING; pymongo itself is only imported on first use
+ASCENDING = 1
+
+# Outbox configuration
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "5"))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "900"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+
+OUTBOX_INDEX = [("status", ASCENDING), ("next_attempt_at", ASCENDING)]
+
+# Job states
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+def utcnow():
+    return datetime.datetime.utcnow()
+
+
+def backoff_delay(attempts, base=OUTBOX_BACKOFF_SECONDS, cap=OUTBOX_MAX_BACKOFF_SECONDS):
+    """Exponential backoff with jitter for the given number of failed attempts"""
+    delay = min(cap, base * (2 ** max(attempts - 1, 0)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+# Query and update documents shared by the threaded and asyncio outboxes
+CLAIM_SORT = [("next_attempt_at", ASCENDING)]
+
+
+def new_job(to_email, subject, html_content, text_content=None, send_at=None):
+    now = utcnow()
+    return {
+        "to": to_email,
+        "subject": subject,
+        "html": html_content,
+        "text": text_content,
+        "status": PENDING,
+        "attempts": 0,
+        "last_error": None,
+        "created_at": now,
+        "next_attempt_at": send_at or now,
+    }
+
+
+def claim_query(now):
+    """Due jobs, plus jobs whose worker died before finishing (expired lease)"""
+    return {"$or": [
+        {"status": PENDING, "next_attempt_at": {"$lte": now}},
+        {"status": SENDING, "lease_expires_at": {"$lte": now}},
+    ]}
+
+
+def claim_update(now, lease_seconds):
+    # A fresh token per claim, so a worker whose lease expired cannot overwrite the new claim
+    return {"$set": {
+        "status": SENDING,
+        "lease_id": uuid.uuid4().hex,
+        "lease_expires_at": now + datetime.timedelta(seconds=lease_seconds),
+    }}
+
+
+def lease_filter(job):
+    """Matches the job only while it is still leased by the claim that returned it"""
+    return {"_id": job["_id"], "status": SENDING, "lease_id": job["lease_id"]}
+
+
+def success_update():
+    return {"$set": {"status": SENT, "sent_at": utcnow(), "last_error": None},
+            "$inc": {"attempts": 1},
+            "$unset": {"lease_expires_at": "", "lease_id": ""}}
+
+
+def failure_update(job, error, max_attempts):
+    """Reschedule with backoff, or mark failed once attempts are exhausted"""
+    attempts = job.get("attempts", 0) + 1
+    update = {"attempts": attempts, "last_error": str(error)[:500]}
+    if attempts >= max_attempts:
+        update["status"] = FAILED
+        print(f"Giving up on email to {job['to']} after {attempts} attempts: {error}")
+    else:
+        update["status"] = PENDING
+        update["next_attempt_at"] = utcnow() + datetime.timedelta(seconds=backoff_delay(attempts))
+    return {"$set": update, "$unset": {"lease_expires_at": "", "lease_id": ""}}
+
+
+class EmailOutbox:
+    """MongoDB-backed queue of outgoing emails drained by worker threads"""
+
+    def __init__(self, collection, deliver, workers=OUTBOX_WORKERS,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS, poll_seconds=OUTBOX_POLL_SECONDS,
+                 lease_seconds=OUTBOX_LEASE_SECONDS):
+        # deliver(to_email, subject, html_content, text_content) must raise on failure
+        self.collection = collection
+        self.deliver = deliver
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._indexes_ready = False
+
+    def ensure_indexes(self):
+        """Create the index used by workers to claim due jobs"""
+        if self._indexes_ready:
+            return
+        self.collection.create_index(OUTBOX_INDEX, name="status_next_attempt")
+        self._indexes_ready = True
+
+    def enqueue(self, to_email, subject, html_content, text_content=None, send_at=None):
+        """Store an email for background delivery and return its outbox id"""
+        return self.enqueue_job(new_job(to_email, subject, html_content, text_content, send_at)).inserted_id
+
+    def enqueue_job(self, job):
+        """Store a job built with new_job() and wake the workers; returns the InsertOneResult"""
+        result = self.collection.insert_one(job)
+        self.start()
+        self._wakeup.set()
+        return result
+
+    def enqueue_many(self, messages):
+        """Store (to, subject, html, text, send_at) tuples in one write, without starting workers"""
+        jobs = [new_job(*message) for message in messages]
+        if not jobs:
+            return []
+        result = self.collection.insert_many(jobs, ordered=False)
+        self._wakeup.set()
+        return result.inserted_ids
+
+    def start(self):
+        """Start the worker threads once per process (safe to call repeatedly)"""
+        if self.workers <= 0:
+            return
+        pid = os.getpid()
+        if self._pid == pid and self._threads:
+            return
+        with self._lock:
+            if self._pid == pid and self._threads:
+                return
+            # Threads never survive a fork, so a new pid means a fresh pool
+            self._pid = pid
+            self._stopping.clear()
+            self._threads = []
+            try:
+                self.ensure_indexes()
+            except Exception as e:
+                print(f"Error creating email outbox indexes: {e}")
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f"email-outbox-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=10.0):
+        """Ask workers to finish their current job and exit; timeout bounds the total wait"""
+        self._stopping.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        self._threads = []
+
+    def drain(self, limit=None):
+        """Deliver due emails in the calling thread; returns the number processed"""
+        processed = 0
+        while limit is None or processed < limit:
+            job = self._claim()
+            if job is None:
+                break
+            self._process(job)
+            processed += 1
+        return processed
+
+    def pending_count(self):
+        return self.collection.count_documents({"status": {"$in": [PENDING, SENDING]}})
+
+    def _claim(self):
+        """Atomically lease the next due job, including jobs with expired leases"""
+        from pymongo import ReturnDocument
+
+        now = utcnow()
+        return self.collection.find_one_and_update(
+            claim_query(now),
+            claim_update(now, self.lease_seconds),
+            sort=CLAIM_SORT,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _process(self, job):
+        try:
+            self.deliver(job["to"], job["subject"], job["html"], job.get("text"))
+        except Exception as e:
+            self._record(job, failure_update(job, e, self.max_attempts))
+            return False
+
+        self._record(job, success_update())
+        return True
+
+    def _record(self, job, update):
+        """Store the outcome unless the lease expired and the job was claimed again"""
+        result = self.collection.update_one(lease_filter(job), update)
+        if result.matched_count == 0:
+            print(f"Email outbox job {job['_id']} outlived its {self.lease_seconds:g}s lease; "
+                  f"outcome left to the worker that re-claimed it")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"Error polling email outbox: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+                continue
+            try:
+                self._process(job)
+            except Exception as e:
+                # The lease expires and another worker will pick the job up
+                print(f"Error processing email outbox job {job.get('_id')}: {e}")
+
+
+if __name__ == "__main__":
+    # Deliver everything that is due, e.g. from a cron job in serverless deployments
+    from app import outbox
+
+    count = outbox.drain()
+    print(f"Processed {count} queued email(s)")
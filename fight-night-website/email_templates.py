@@ -0,0 +1,257 @@
+"""
+Email template registry for White Collar Fight Night
+
+Templates are compiled once at import into their static fragments and the
+field names between them. Rendering escapes each distinct field value once and
+joins the pieces, and every template has a plain-text alternative part.
+"""
+
+import html
+import re
+
+PLACEHOLDER = re.compile(r'\{(\w+)\}')
+HTML_SPECIAL = re.compile(r'[&<>"\']')
+
+
+def compile_template(source):
+    """Split a template into (static fragments, field name for each gap, distinct fields)"""
+    fragments = []
+    slots = []
+    position = 0
+    for match in PLACEHOLDER.finditer(source):
+        fragments.append(source[position:match.start()])
+        slots.append(match.group(1))
+        position = match.end()
+    fragments.append(source[position:])
+    return tuple(fragments), tuple(slots), tuple(dict.fromkeys(slots))
+
+
+def render_compiled(compiled, values, escape):
+    fragments, slots, fields = compiled
+    if not slots:
+        return fragments[0]
+    # Each distinct field is converted and escaped once, however often it appears
+    prepared = {}
+    for field in fields:
+        value = values.get(field)
+        value = "" if value is None else str(value)
+        prepared[field] = escape(value) if escape else value
+    parts = [fragments[0]]
+    for field, fragment in zip(slots, fragments[1:]):
+        parts.append(prepared[field])
+        parts.append(fragment)
+    return "".join(parts)
+
+
+def escape_html(value):
+    # Most form values contain nothing to escape; skip the five replace passes
+    if HTML_SPECIAL.search(value) is None:
+        return value
+    return html.escape(value, quote=True)
+
+
+def plain_text(value):
+    # Keep header-injection characters out of subjects
+    return value.replace("\r", " ").replace("\n", " ")
+
+
+class EmailTemplate:
+    """A precompiled subject, HTML body and plain-text body"""
+
+    def __init__(self, name, subject, html_body, text_body):
+        self.name = name
+        self.fields = set(PLACEHOLDER.findall(subject + html_body + text_body))
+        self._subject = compile_template(subject)
+        self._html = compile_template(html_body)
+        self._text = compile_template(text_body)
+
+    def render(self, values):
+        """Return (subject, html, text) for the given field values"""
+        return (
+            render_compiled(self._subject, values, plain_text),
+            render_compiled(self._html, values, escape_html),
+            render_compiled(self._text, values, None),
+        )
+
+
+TEMPLATES = {}
+
+
+def register(name, subject, html_body, text_body):
+    TEMPLATES[name] = EmailTemplate(name, subject, html_body, text_body)
+    return TEMPLATES[name]
+
+
+def render(name, values):
+    """Render a registered template; returns (subject, html, text)"""
+    return TEMPLATES[name].render(values)
+
+
+register(
+    "fighter_application",
+    "Your White Collar Fight Night Application",
+    """
+    <html>
+    <body>
+        <h2>Thank You for Your Fighter Application!</h2>
+        <p>Dear {firstName} {lastName},</p>
+        <p>We've received your application to participate in the White Collar Fight Night.
+        Our team will review your information and get back to you soon with next steps.</p>
+
+        <h3>Your Application Details:</h3>
+        <ul>
+            <li><strong>Name:</strong> {firstName} {lastName}</li>
+            <li><strong>Email:</strong> {email}</li>
+            <li><strong>Phone:</strong> {phone}</li>
+            <li><strong>Job/Company:</strong> {jobCompany}</li>
+            <li><strong>Weight:</strong> {weight} lbs</li>
+            <li><strong>Height:</strong> {height} inches</li>
+        </ul>
+
+        <p>If you have any questions, please don't hesitate to contact us at info@texasfightcollective.com.</p>
+
+        <p>Best regards,<br>
+        The Texas Fight Collective Team</p>
+    </body>
+    </html>
+    """,
+    """Thank You for Your Fighter Application!
+
+Dear {firstName} {lastName},
+
+We've received your application to participate in the White Collar Fight Night.
+Our team will review your information and get back to you soon with next steps.
+
+Your Application Details:
+- Name: {firstName} {lastName}
+- Email: {email}
+- Phone: {phone}
+- Job/Company: {jobCompany}
+- Weight: {weight} lbs
+- Height: {height} inches
+
+If you have any questions, please don't hesitate to contact us at info@texasfightcollective.com.
+
+Best regards,
+The Texas Fight Collective Team
+""",
+)
+
+register(
+    "nomination_nominator",
+    "Your White Collar Fight Night Nomination",
+    """
+    <html>
+    <body>
+        <h2>Thank You for Your Fighter Nomination!</h2>
+        <p>Dear {yourName},</p>
+        <p>We've received your nomination of {nomineeName} for the White Collar Fight Night.
+        Our team will review the nomination and reach out to them soon.</p>
+
+        <p>Thank you for helping us find great participants for our event!</p>
+
+        <p>Best regards,<br>
+        The Texas Fight Collective Team</p>
+    </body>
+    </html>
+    """,
+    """Thank You for Your Fighter Nomination!
+
+Dear {yourName},
+
+We've received your nomination of {nomineeName} for the White Collar Fight Night.
+Our team will review the nomination and reach out to them soon.
+
+Thank you for helping us find great participants for our event!
+
+Best regards,
+The Texas Fight Collective Team
+""",
+)
+
+register(
+    "nomination_nominee",
+    "You've Been Nominated for White Collar Fight Night",
+    """
+    <html>
+    <body>
+        <h2>You've Been Nominated for White Collar Fight Night!</h2>
+        <p>Dear {nomineeName},</p>
+        <p>Good news! {yourName} has nominated you to participate in Austin's White Collar Fight Night boxing event.</p>
+
+        <p>White Collar Fight Night brings together professionals from various industries to step into the ring
+        for charity. Our events showcase the determination and courage of everyday people who train for months
+        to compete in a safe, regulated boxing environment.</p>
+
+        <p>If you're interested in participating, please visit our website at texasfightcollective.com to learn more and submit an application.</p>
+
+        <p>Best regards,<br>
+        The Texas Fight Collective Team</p>
+    </body>
+    </html>
+    """,
+    """You've Been Nominated for White Collar Fight Night!
+
+Dear {nomineeName},
+
+Good news! {yourName} has nominated you to participate in Austin's White Collar Fight Night boxing event.
+
+White Collar Fight Night brings together professionals from various industries to step into the ring
+for charity. Our events showcase the determination and courage of everyday people who train for months
+to compete in a safe, regulated boxing environment.
+
+If you're interested in participating, please visit our website at texasfightcollective.com to learn more and submit an application.
+
+Best regards,
+The Texas Fight Collective Team
+""",
+)
+
+register(
+    "email_signup_welcome",
+    "Welcome to the White Collar Fight Night Mailing List",
+    """
+    <html>
+    <body>
+        <h2>Welcome to the White Collar Fight Night Mailing List!</h2>
+        <p>Thank you for signing up to receive updates about White Collar Fight Night events in Austin, Texas.</p>
+
+        <p>We'll keep you informed about:</p>
+        <ul>
+            <li>Upcoming event dates and venues</li>
+            <li>Ticket availability</li>
+            <li>Fighter announcements</li>
+            <li>Special promotions</li>
+        </ul>
+
+        <p>Stay tuned for exciting news coming your way soon!</p>
+
+        <p>Best regards,<br>
+        The Texas Fight Collective Team</p>
+
+        <p style="font-size: 12px; color: #666;">
+            If you didn't sign up for this mailing list, please disregard this email.<br>
+            To unsubscribe, please reply with "UNSUBSCRIBE" in the subject line.
+        </p>
+    </body>
+    </html>
+    """,
+    """Welcome to the White Collar Fight Night Mailing List!
+
+Thank you for signing up to receive updates about White Collar Fight Night events in Austin, Texas.
+
+We'll keep you informed about:
+- Upcoming event dates and venues
+- Ticket availability
+- Fighter announcements
+- Special promotions
+
+Stay tuned for exciting news coming your way soon!
+
+Best regards,
+The Texas Fight Collective Team
+
+If you didn't sign up for this mailing list, please disregard this email.
+To unsubscribe, please reply with "UNSUBSCRIBE" in the subject line.
+""",
+)
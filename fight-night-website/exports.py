@@ -0,0 +1,125 @@
+"""
+Streaming exports of the admin collections
+
+Rows are generated straight off a MongoDB cursor and written to the response
+in small chunks, so memory use stays flat regardless of collection size.
+"""
+
+import csv
+import datetime
+import io
+import json
+import os
+
+from bson.objectid import ObjectId
+
+from pagination import HIDDEN_FIELDS
+
+# Same value as pymongo.ASCENDING, without importing pymongo
+ASCENDING = 1
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Rows buffered before a chunk is handed to the WSGI server
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "200"))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Default CSV columns per collection; extra document fields are left out
+EXPORT_COLUMNS = {
+    "fighter_applications": ["_id", "created_at", "firstName", "lastName", "email", "phone",
+                             "jobCompany", "weight", "height", "experience", "why", "charity"],
+    "fighter_nominations": ["_id", "created_at", "yourName", "yourEmail", "nomineeName",
+                            "nomineeEmail", "nomineePhone", "reason"],
+    "email_list": ["_id", "created_at", "email"],
+}
+
+
+class ExportError(ValueError):
+    """Raised for an unsupported format or malformed since value"""
+
+
+def bson_default(value):
+    """JSON fallback for BSON types"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def parse_since(value):
+    """Parse an ISO-8601 since parameter into a naive UTC datetime"""
+    if not value:
+        return None
+    try:
+        since = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ExportError("since must be an ISO-8601 timestamp")
+    if since.tzinfo is not None:
+        since = since.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def export_cursor(collection, since=None, projection=None):
+    """Oldest-first cursor over a collection, optionally from a point in time"""
+    query = {"created_at": {"$gte": since}} if since else {}
+    return (collection.find(query, projection)
+            .sort([("created_at", ASCENDING), ("_id", ASCENDING)])
+            .batch_size(EXPORT_BATCH_SIZE))
+
+
+def ndjson_rows(cursor):
+    """Yield newline-delimited JSON in chunks of EXPORT_CHUNK_ROWS documents"""
+    chunk = []
+    for doc in cursor:
+        chunk.append(json.dumps(doc, default=bson_default, separators=(",", ":")))
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (ObjectId, datetime.datetime)):
+        return bson_default(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=bson_default)
+    return value
+
+
+def csv_rows(cursor, columns):
+    """Yield CSV text (header first) in chunks of EXPORT_CHUNK_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    rows = 0
+    for doc in cursor:
+        writer.writerow([csv_value(doc.get(column)) for column in columns])
+        rows += 1
+        if rows >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_rows(collection, export_format, since=None, fields=None):
+    """Return (generator, mimetype) for an export of the given collection"""
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    if export_format == "csv":
+        columns = fields or EXPORT_COLUMNS.get(collection.name, ["_id", "created_at"])
+        projection = dict.fromkeys(columns, 1)
+        return csv_rows(export_cursor(collection, since, projection), columns), EXPORT_FORMATS["csv"]
+
+    projection = dict.fromkeys(fields, 1) if fields else HIDDEN_FIELDS
+    return ndjson_rows(export_cursor(collection, since, projection)), EXPORT_FORMATS["ndjson"]
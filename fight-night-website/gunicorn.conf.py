@@ -0,0 +1,69 @@
+"""
+Gunicorn configuration for production
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master (preload_app) and forked into workers.
+app.py opens no MongoDB or SMTP connections at import time; post_fork still
+drops anything a worker inherited so each worker builds its own MongoClient
+and SMTP pool. Workers are recycled after GUNICORN_MAX_REQUESTS requests, and
+on exit they let in-flight emails finish sending before shutting down. A
+campaign stopped that way is resumed by the next worker to connect to MongoDB.
+
+Environment:
+    PORT                      Listen port (default 5000)
+    GUNICORN_WORKER_CLASS     sync, gthread or gevent (default gthread)
+    GUNICORN_WORKERS          Worker processes (default: CPU cores, or 2 x cores + 1 for sync)
+    GUNICORN_THREADS          Threads per gthread worker (default 4)
+    GUNICORN_WORKER_CONNECTIONS  Concurrent greenlets per gevent worker (default 100)
+    GUNICORN_MAX_REQUESTS     Requests before a worker is recycled, 0 to disable (default 1000)
+    GUNICORN_MAX_REQUESTS_JITTER  Random spread so workers don't recycle together (default 100)
+    GUNICORN_TIMEOUT          Seconds before a silent worker is killed (default 30)
+    GUNICORN_GRACEFUL_TIMEOUT Seconds workers get to finish on shutdown (default 30)
+"""
+
+import multiprocessing
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+if worker_class == "gevent":
+    # The app is preloaded in the master, so patch before it is imported
+    from gevent import monkey
+    monkey.patch_all()
+
+cores = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("GUNICORN_WORKERS", str(cores * 2 + 1 if worker_class == "sync" else cores)))
+threads = int(os.getenv("GUNICORN_THREADS", "4")) if worker_class == "gthread" else 1
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+
+preload_app = True
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    import app
+
+    app.reset_after_fork()
+    # Campaigns stopped when another worker was recycled continue in this one
+    app.on_connect(app.resume_campaigns)
+    if worker_class != "gevent":
+        # Each SSE client holds a request thread; leave some for everything else
+        app.live_feed.limit_to_threads(threads)
+
+
+def worker_exit(server, worker):
+    import app
+
+    # Leave a little of the graceful timeout for the rest of interpreter shutdown
+    app.shutdown(timeout=max(graceful_timeout - 5, 1))
+    worker.log.info("Worker %s drained", worker.pid)
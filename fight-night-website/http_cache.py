@@ -0,0 +1,181 @@
+"""
+Conditional GET and compression for the admin routes
+
+Validators are derived without scanning: the newest created_at comes from one
+lookup on the created_at_desc index and the document count from collection
+metadata (estimated_document_count). Together with the request path and query
+they form a weak ETag, and the newest created_at is the Last-Modified time.
+Requests whose If-None-Match / If-Modified-Since still match get a 304 before
+the view runs. An edit to an existing document that changes neither value is
+not detected; the admin collections are insert-only through the API.
+
+Given a ResponseCache, the two values are remembered per collection version
+(see response_cache.py), so repeat requests are answered without any MongoDB
+round trip until this process writes to the collection or the TTL passes.
+
+Large admin responses are compressed with brotli (when the optional brotli
+package is installed) or gzip, according to Accept-Encoding. Streamed exports
+are compressed chunk by chunk.
+"""
+
+import datetime
+import functools
+import gzip
+import hashlib
+import os
+import zlib
+
+from flask import current_app, make_response, request
+from werkzeug.http import is_resource_modified, parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Same value as pymongo.DESCENDING, without importing pymongo
+DESCENDING = -1
+
+
+def collection_validators(collection):
+    """(document count, newest created_at) without scanning the collection"""
+    newest = collection.find_one(
+        {"created_at": {"$type": "date"}}, {"created_at": 1, "_id": 0},
+        sort=[("created_at", DESCENDING)],
+    )
+    return collection.estimated_document_count(), newest["created_at"] if newest else None
+
+
+def cached_validators(collection, cache=None):
+    """collection_validators, remembered in cache until the collection version changes"""
+    if cache is None or not cache.enabled:
+        return collection_validators(collection)
+    key = ("validators", collection.name, cache.version(collection.name))
+    values = cache.get(key)
+    if values is None:
+        values = collection_validators(collection)
+        cache.set(key, values)
+    return values
+
+
+def validators(collections, daily=False, cache=None):
+    """Weak ETag value and Last-Modified for the current request over the given collections"""
+    parts = [request.full_path]
+    last_modified = None
+    for collection in collections:
+        count, newest = cached_validators(collection, cache)
+        parts.append(f"{collection.name}:{count}:{newest.isoformat() if newest else '-'}")
+        if newest is not None and (last_modified is None or newest > last_modified):
+            last_modified = newest
+    if daily:
+        # Responses covering "the last N days" change at midnight UTC
+        parts.append(datetime.datetime.utcnow().date().isoformat())
+    etag = hashlib.sha1("|".join(parts).encode()).hexdigest()
+    if last_modified is not None:
+        last_modified = last_modified.replace(tzinfo=datetime.timezone.utc, microsecond=0)
+    return etag, last_modified
+
+
+def conditional(*collections, daily=False, collections_for=None, cache=None):
+    """Decorator for GET views whose output only changes when the collections gain documents
+
+    collections_for(**view_kwargs) picks the collections per request instead,
+    returning None to skip validation (e.g. for an unknown collection name).
+    cache is an optional ResponseCache that remembers the validators.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            targets = collections_for(**kwargs) if collections_for else collections
+            if targets is None:
+                return view(*args, **kwargs)
+            try:
+                etag, last_modified = validators(targets, daily, cache)
+            except Exception as e:
+                print(f"Error computing validators for {request.path}: {e}")
+                return view(*args, **kwargs)
+
+            if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            else:
+                response = current_app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = "no-cache"
+            response.vary.add("Accept-Encoding")
+            return response
+        return wrapper
+    return decorator
+
+
+def choose_encoding(accept_encoding):
+    """Best supported content coding for an Accept-Encoding header, or None"""
+    accepted = parse_accept_header(accept_encoding)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = None
+    for encoding in candidates:
+        quality = accepted[encoding]
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+def compress_bytes(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of chunks, flushing after each so the stream keeps flowing"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield data + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield data + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def compress_response(response):
+    """Compress a response in place when the client accepts it and it is worth it"""
+    if (response.status_code != 200 or response.direct_passthrough
+            or "Content-Encoding" in response.headers or response.mimetype == "text/event-stream"):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app, prefix="/api/admin/"):
+    """Compress responses from routes under prefix"""
+
+    @app.after_request
+    def compress_admin_responses(response):
+        if request.path.startswith(prefix):
+            return compress_response(response)
+        return response
@@ -0,0 +1,257 @@
+"""
+Idempotency keys for the form submission routes
+
+A repeated POST (double click, mobile retry) with the same Idempotency-Key
+header, or the same payload when no header is sent, replays the first
+response instead of inserting and emailing again. Results live in a
+TTL-indexed MongoDB collection (see db_indexes.py) with a small in-process
+LRU in front of it.
+
+When the store is given a WriteJournal (see journal.py) and MongoDB is
+unreachable, requests go through without replay protection so that the
+submission can still be journaled.
+"""
+
+import collections
+import datetime
+import functools
+import hashlib
+import json
+import os
+import threading
+
+from flask import jsonify, request
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# Keys derived from the payload hash collapse accidental repeats only
+IDEMPOTENCY_DERIVED_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_DERIVED_TTL_SECONDS", "600"))
+IDEMPOTENCY_LRU_SIZE = int(os.getenv("IDEMPOTENCY_LRU_SIZE", "1024"))
+# An in-progress reservation older than this is assumed abandoned (crashed worker);
+# keep it above the longest request, e.g. the gunicorn timeout
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+HEADER = "Idempotency-Key"
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+
+def payload_hash(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+# Documents and decisions shared by IdempotencyStore and the asyncio store in async_app.py
+
+def derive_key(scope, header, payload):
+    """Return (key, fingerprint, derived) for a request's Idempotency-Key header and JSON body"""
+    fingerprint = payload_hash(payload)
+    header = (header or "").strip()
+    if header:
+        return f"{scope}:key:{header[:IDEMPOTENCY_KEY_MAX_LENGTH]}", fingerprint, False
+    return f"{scope}:payload:{fingerprint}", fingerprint, True
+
+
+def new_reservation(key, fingerprint, ttl_seconds, lease_seconds, now):
+    return {
+        "_id": key,
+        "status": IN_PROGRESS,
+        "fingerprint": fingerprint,
+        "created_at": now,
+        "lease_expires_at": now + datetime.timedelta(seconds=lease_seconds),
+        "expires_at": now + datetime.timedelta(seconds=ttl_seconds),
+    }
+
+
+def lease_expired(record, now, lease_seconds):
+    lease_expires_at = record.get("lease_expires_at")
+    if lease_expires_at is None:
+        lease_expires_at = record["created_at"] + datetime.timedelta(seconds=lease_seconds)
+    return lease_expires_at <= now
+
+
+def takeover_query(record):
+    # Records stored before leases existed have no lease_expires_at; None matches them
+    return {"_id": record["_id"], "status": IN_PROGRESS, "lease_expires_at": record.get("lease_expires_at")}
+
+
+def lease_update(now, lease_seconds):
+    return {"$set": {"lease_expires_at": now + datetime.timedelta(seconds=lease_seconds)}}
+
+
+def complete_update(status_code, body):
+    return {"$set": {"status": COMPLETED, "status_code": status_code, "body": body}}
+
+
+def conflict(existing, fingerprint):
+    """(message, status code) when an existing record must not be replayed, otherwise None"""
+    if existing.get("fingerprint") != fingerprint:
+        return "Idempotency-Key was already used with a different request", 422
+    if existing["status"] != COMPLETED:
+        return "An identical request is already in progress", 409
+    return None
+
+
+class StoreUnavailable(RuntimeError):
+    """Raised while MongoDB is unreachable and writes are being journaled"""
+
+
+class IdempotencyStore:
+    """Remembers completed responses per key until they expire"""
+
+    def __init__(self, collection, ttl_seconds=IDEMPOTENCY_TTL_SECONDS,
+                 derived_ttl_seconds=IDEMPOTENCY_DERIVED_TTL_SECONDS, lru_size=IDEMPOTENCY_LRU_SIZE,
+                 journal=None, lease_seconds=IDEMPOTENCY_LEASE_SECONDS):
+        self.collection = collection
+        self.journal = journal
+        self.ttl_seconds = ttl_seconds
+        self.derived_ttl_seconds = derived_ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.lru_size = lru_size
+        self._lru = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, record):
+        with self._lock:
+            self._lru[key] = record
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def _cached(self, key):
+        with self._lock:
+            record = self._lru.get(key)
+            if record is None:
+                return None
+            if record["expires_at"] <= datetime.datetime.utcnow():
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return record
+
+    def call(self, method, *args):
+        """Run a store method, within the journal's deadline when there is one
+
+        Raises StoreUnavailable instead of waiting while MongoDB is down.
+        """
+        if self.journal is None:
+            return method(*args)
+        if not self.journal.available():
+            raise StoreUnavailable("MongoDB is unreachable")
+        from journal import is_unavailable
+
+        try:
+            with self.journal.deadline():
+                return method(*args)
+        except Exception as e:
+            if not is_unavailable(e):
+                raise
+            self.journal.mark_unavailable(e)
+            raise StoreUnavailable(str(e))
+
+    def begin(self, key, fingerprint, derived):
+        """Reserve a key; returns None if reserved, otherwise the existing record
+
+        A reservation whose lease has run out was left by a request that never
+        finished, and is taken over by a retry with the same payload.
+        """
+        from pymongo.errors import DuplicateKeyError
+
+        record = self._cached(key)
+        if record is not None:
+            return record
+
+        now = datetime.datetime.utcnow()
+        ttl = self.derived_ttl_seconds if derived else self.ttl_seconds
+        try:
+            self.collection.insert_one(new_reservation(key, fingerprint, ttl, self.lease_seconds, now))
+            return None
+        except DuplicateKeyError:
+            record = self.collection.find_one({"_id": key})
+            if record is None:
+                # Expired between the insert and the lookup; try once more
+                return self.begin(key, fingerprint, derived)
+            if record.get("expires_at") and record["expires_at"] <= now:
+                self.collection.delete_one({"_id": key, "expires_at": record["expires_at"]})
+                return self.begin(key, fingerprint, derived)
+            if record["status"] == COMPLETED:
+                self._remember(key, record)
+            elif record.get("fingerprint") == fingerprint and lease_expired(record, now, self.lease_seconds):
+                taken = self.collection.update_one(takeover_query(record), lease_update(now, self.lease_seconds))
+                if taken.modified_count == 1:
+                    return None
+                # Completed or taken over by another retry in the meantime
+                return self.begin(key, fingerprint, derived)
+            return record
+
+    def complete(self, key, status_code, body):
+        from pymongo import ReturnDocument
+
+        record = self.collection.find_one_and_update(
+            {"_id": key},
+            complete_update(status_code, body),
+            return_document=ReturnDocument.AFTER,
+        )
+        if record is not None:
+            self._remember(key, record)
+
+    def release(self, key):
+        """Forget an in-progress reservation so the client can retry"""
+        self.collection.delete_one({"_id": key, "status": IN_PROGRESS})
+
+
+def request_key(scope):
+    """Return (key, fingerprint, derived) for the current request"""
+    return derive_key(scope, request.headers.get(HEADER), request.get_json(silent=True))
+
+
+def replay(record):
+    response = jsonify(record.get("body"))
+    response.status_code = record.get("status_code", 200)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def settle(store, method, *args):
+    """Complete or release a key; the response stands even if MongoDB went away"""
+    try:
+        store.call(method, *args)
+    except StoreUnavailable as e:
+        print(f"Could not record idempotency key {args[0]}: {e}")
+
+
+def idempotent(store):
+    """Decorator for JSON POST views: replay successful responses for repeated keys"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key, fingerprint, derived = request_key(request.endpoint)
+            try:
+                existing = store.call(store.begin, key, fingerprint, derived)
+            except StoreUnavailable:
+                return view(*args, **kwargs)
+            if existing is not None:
+                refused = conflict(existing, fingerprint)
+                if refused is not None:
+                    message, status_code = refused
+                    return jsonify({"success": False, "message": message}), status_code
+                return replay(existing)
+
+            try:
+                response = view(*args, **kwargs)
+            except Exception:
+                settle(store, store.release, key)
+                raise
+
+            # Views return a Response or a (Response, status) tuple
+            body, status_code = (response if isinstance(response, tuple) else (response, None))
+            status_code = status_code or body.status_code
+            if 200 <= status_code < 300 and body.is_json:
+                settle(store, store.complete, key, status_code, body.get_json())
+            else:
+                # Failed attempts are not remembered, so a corrected retry goes through
+                settle(store, store.release, key)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,412 @@
+"""
+Local write journal for when MongoDB is unreachable
+
+insert_one() writes to MongoDB with a short deadline
+(JOURNAL_WRITE_TIMEOUT_SECONDS). When the database cannot be reached in time,
+the document is appended to a local JSONL file and fsync'd before returning,
+so the submission survives a crash or restart. Until MongoDB answers a ping
+again, later writes go straight to the journal instead of waiting.
+
+A background thread replays the journal every JOURNAL_REPLAY_INTERVAL_SECONDS
+once MongoDB is back, with unordered insert_many batches. Documents keep the
+_id they were given before the first attempt, so a write that did reach the
+server, or a replay that is interrupted and run again, ends in a duplicate
+key error on _id and is skipped. A journaled entry can require another
+document: if that one is rejected on replay (a signup whose email was
+registered in the meantime), the entry is dropped with it, so no confirmation
+email is sent for a submission that was never stored.
+
+Every gunicorn worker appends to the same file (JOURNAL_DIR/pending.jsonl)
+under an exclusive flock. The replayer renames it aside before reading, so
+appends never wait for a replay, and a replay cut short leaves the renamed file
+to be picked up on the next pass.
+"""
+
+import datetime
+import fcntl
+import glob
+import os
+import threading
+import time
+
+from write_buffer import DUPLICATE_KEY_CODES
+
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "journal")
+JOURNAL_WRITE_TIMEOUT_SECONDS = float(os.getenv("JOURNAL_WRITE_TIMEOUT_SECONDS", "2"))
+JOURNAL_REPLAY_INTERVAL_SECONDS = float(os.getenv("JOURNAL_REPLAY_INTERVAL_SECONDS", "5"))
+JOURNAL_REPLAY_BATCH = int(os.getenv("JOURNAL_REPLAY_BATCH", "100"))
+JOURNAL_FSYNC = os.getenv("JOURNAL_FSYNC", "true").lower() == "true"
+
+PENDING_FILE = "pending.jsonl"
+CLAIMED_PATTERN = "replay-*.jsonl"
+
+
+def utcnow():
+    return datetime.datetime.utcnow()
+
+
+def is_unavailable(error):
+    """True for errors meaning MongoDB could not be reached in time"""
+    from pymongo.errors import ConnectionFailure, PyMongoError
+
+    if isinstance(error, (ConnectionFailure, TimeoutError)):
+        return True
+    # Deadlines set with pymongo.timeout() raise errors flagged as timeouts
+    return isinstance(error, PyMongoError) and getattr(error, "timeout", False)
+
+
+def encode(entry):
+    from bson import json_util
+
+    # Extended JSON keeps ObjectId and datetime values exact
+    return (json_util.dumps(entry, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n").encode()
+
+
+def decode(line):
+    from bson import json_util
+
+    return json_util.loads(line)
+
+
+def duplicate_index(error):
+    """Key pattern of the unique index a write error hit, or None if not reported"""
+    key_pattern = error.get("keyPattern")
+    if key_pattern is not None:
+        return list(key_pattern)
+    if "index: _id_ " in error.get("errmsg", ""):
+        return ["_id"]
+    return None
+
+
+def read_entries(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    lines = data.split(b"\n")
+    entries = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            entries.append(decode(line))
+        except ValueError:
+            if number == len(lines):
+                # The process died halfway through an append; that request got an error
+                print(f"Ignoring incomplete last line of {path}")
+            else:
+                print(f"Skipping unreadable line {number} of {path}: {line[:200]!r}")
+    return entries
+
+
+class WriteJournal:
+    """Falls back to an fsync'd local file when MongoDB inserts cannot be made"""
+
+    def __init__(self, get_db, directory=JOURNAL_DIR, write_timeout=JOURNAL_WRITE_TIMEOUT_SECONDS,
+                 replay_interval=JOURNAL_REPLAY_INTERVAL_SECONDS, batch_size=JOURNAL_REPLAY_BATCH,
+                 fsync=JOURNAL_FSYNC, on_replayed=None, prepare=None):
+        # on_replayed(collection_name, doc) runs for each document a replay inserted;
+        # prepare() runs once MongoDB answers and must return True before anything is replayed
+        self.get_db = get_db
+        self.directory = directory
+        self.write_timeout = write_timeout
+        self.replay_interval = replay_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.on_replayed = on_replayed
+        self.prepare = prepare
+        self._waiting_for_prepare = False
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._down_since = None
+        self._last_error = None
+        # _ids dropped on replay in this process, for entries that require them
+        self._rejected = set()
+        self.stats = {"journaled": 0, "replayed": 0, "duplicates": 0, "rejected": 0}
+
+    @property
+    def pending_path(self):
+        return os.path.join(self.directory, PENDING_FILE)
+
+    def available(self):
+        """False from the first unreachable write until MongoDB answers a ping"""
+        return self._down_since is None
+
+    def deadline(self):
+        """Context manager bounding the MongoDB calls made inside it"""
+        import pymongo
+
+        return pymongo.timeout(self.write_timeout)
+
+    def mark_unavailable(self, error):
+        with self._lock:
+            if self._down_since is None:
+                self._down_since = utcnow()
+                print(f"MongoDB unreachable, journaling writes to {self.directory}: {error}")
+            self._last_error = str(error)[:500]
+        self.start()
+
+    def insert_one(self, collection, doc, insert=None, requires=None):
+        """Insert doc, or journal it if MongoDB is unreachable
+
+        insert defaults to collection.insert_one. Returns its InsertOneResult,
+        or an unacknowledged one when the document was journaled. Other errors,
+        such as DuplicateKeyError, are raised as usual.
+        """
+        from bson import ObjectId
+        from pymongo.results import InsertOneResult
+
+        # Assigned up front so that a replay of this document is idempotent
+        doc.setdefault("_id", ObjectId())
+        self.start()
+        if self.available():
+            try:
+                with self.deadline():
+                    return (insert or collection.insert_one)(doc)
+            except Exception as e:
+                if not is_unavailable(e):
+                    raise
+                self.mark_unavailable(e)
+        self.append(collection.name, doc, requires)
+        return InsertOneResult(doc["_id"], False)
+
+    def append(self, collection_name, doc, requires=None):
+        """Durably append one document to the pending file"""
+        entry = {"collection": collection_name, "document": doc, "journaled_at": utcnow()}
+        if requires is not None:
+            entry["requires"] = requires
+        line = encode(entry)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.pending_path
+        while True:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                # The replayer may have renamed the file while we waited for the lock
+                try:
+                    current = os.fstat(fd).st_ino == os.stat(path).st_ino
+                except FileNotFoundError:
+                    current = False
+                if not current:
+                    continue
+                created = os.fstat(fd).st_size == 0
+                written = 0
+                while written < len(line):
+                    written += os.write(fd, line[written:])
+                if self.fsync:
+                    os.fsync(fd)
+                    if created:
+                        self._fsync_directory()
+                break
+            finally:
+                # Closing the descriptor releases the lock
+                os.close(fd)
+        with self._lock:
+            self.stats["journaled"] += 1
+
+    def _fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def pending_files(self):
+        """Journal files waiting for replay, oldest first"""
+        files = sorted(glob.glob(os.path.join(self.directory, CLAIMED_PATTERN)))
+        if os.path.exists(self.pending_path):
+            files.append(self.pending_path)
+        return files
+
+    def ping(self):
+        try:
+            with self.deadline():
+                self.get_db().client.admin.command("ping")
+            return True
+        except Exception as e:
+            if not is_unavailable(e):
+                raise
+            with self._lock:
+                self._last_error = str(e)[:500]
+            return False
+
+    def replay(self):
+        """Insert every journaled document; returns the number of files finished
+
+        Connection errors propagate and leave the remaining files in place.
+        """
+        finished = 0
+        for path in self.pending_files():
+            if path == self.pending_path:
+                path = self._claim()
+                if path is None:
+                    continue
+            if self._replay_file(path):
+                finished += 1
+        return finished
+
+    def _claim(self):
+        """Rename the pending file aside so that new appends start a new one"""
+        path = self.pending_path
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_ino != os.stat(path).st_ino:
+                    return None
+            except FileNotFoundError:
+                # Claimed by another worker
+                return None
+            claimed = os.path.join(self.directory, f"replay-{time.time_ns()}-{os.getpid()}.jsonl")
+            os.rename(path, claimed)
+            return claimed
+        finally:
+            os.close(fd)
+
+    def _replay_file(self, path):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another worker is replaying it
+                return False
+            if not os.path.exists(path):
+                return False
+            self._replay_entries(read_entries(path))
+            os.unlink(path)
+            return True
+        finally:
+            os.close(fd)
+
+    def _replay_entries(self, entries):
+        db = self.get_db()
+        batch = []
+        for entry in entries:
+            if batch and (entry["collection"] != batch[0]["collection"] or len(batch) >= self.batch_size):
+                self._insert_batch(db, batch)
+                batch = []
+            # Checked after the batch holding the required document was written
+            if entry.get("requires") in self._rejected:
+                with self._lock:
+                    self.stats["rejected"] += 1
+                print(f"Dropping journaled {entry['collection']} document {entry['document']['_id']}: "
+                      f"requires rejected document {entry['requires']}")
+                continue
+            batch.append(entry)
+        if batch:
+            self._insert_batch(db, batch)
+
+    def _insert_batch(self, db, batch):
+        from pymongo.errors import BulkWriteError
+
+        name = batch[0]["collection"]
+        docs = [entry["document"] for entry in batch]
+        failed = {}
+        try:
+            db[name].insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error for error in e.details.get("writeErrors", [])}
+        for index, doc in enumerate(docs):
+            error = failed.get(index)
+            if error is None:
+                with self._lock:
+                    self.stats["replayed"] += 1
+                if self.on_replayed is not None:
+                    try:
+                        self.on_replayed(name, doc)
+                    except Exception as e:
+                        print(f"Error after replaying {name} document {doc['_id']}: {e}")
+            elif self._already_stored(db[name], doc, error):
+                # Written by the original attempt or by an interrupted replay
+                with self._lock:
+                    self.stats["duplicates"] += 1
+            else:
+                self._rejected.add(doc["_id"])
+                with self._lock:
+                    self.stats["rejected"] += 1
+                print(f"Dropping journaled {name} document {doc['_id']}: {error.get('errmsg')}")
+
+    def _already_stored(self, collection, doc, error):
+        if error.get("code") not in DUPLICATE_KEY_CODES:
+            return False
+        key_pattern = duplicate_index(error)
+        if key_pattern is not None:
+            return key_pattern == ["_id"]
+        return collection.count_documents({"_id": doc["_id"]}, limit=1) > 0
+
+    def start(self):
+        """Start the replayer thread once per process (safe to call repeatedly)"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            # Threads never survive a fork, so a new pid means a new replayer
+            self._pid = pid
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="write-journal", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self._tick()
+            except Exception as e:
+                if not is_unavailable(e):
+                    print(f"Error replaying write journal: {e}")
+                with self._lock:
+                    self._last_error = str(e)[:500]
+            self._stopping.wait(self.replay_interval)
+
+    def _tick(self):
+        if self.available() and not self.pending_files():
+            return
+        if not self.ping():
+            return
+        with self._lock:
+            if self._down_since is not None:
+                print(f"MongoDB reachable again after {utcnow() - self._down_since}")
+            self._down_since = None
+        # Replayed signups rely on the unique index, which may not have been built
+        # if this worker started during the outage
+        if self.prepare is not None and not self.prepare():
+            if not self._waiting_for_prepare:
+                print("Write journal replay is waiting for the MongoDB startup hooks to succeed")
+            self._waiting_for_prepare = True
+            return
+        self._waiting_for_prepare = False
+        self.replay()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        thread = self._thread if self._pid == os.getpid() else None
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def status(self):
+        files = self.pending_files()
+        size = 0
+        for path in files:
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            return {
+                "available": self._down_since is None,
+                "down_since": self._down_since,
+                "last_error": self._last_error,
+                "pending_files": len(files),
+                "pending_bytes": size,
+                "waiting_for_startup": self._waiting_for_prepare,
+                "stats": dict(self.stats),
+            }
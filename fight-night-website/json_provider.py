@@ -0,0 +1,107 @@
+"""
+Fast JSON provider for the Flask app
+
+Serializes responses with orjson in one pass, including BSON values:
+ObjectId becomes its hex string and Decimal128 its decimal string, so routes
+can jsonify documents straight from MongoDB. Datetimes keep Flask's HTTP-date
+format by default; JSON_DATETIME_FORMAT=iso switches to orjson's native
+RFC 3339 output, which is faster. Without orjson installed, Flask's built-in
+provider is used with the same BSON handling.
+"""
+
+import datetime
+import decimal
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_DATETIME_FORMAT = os.getenv("JSON_DATETIME_FORMAT", "http")
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def http_date(value):
+    """Same output as werkzeug.http.http_date (naive values are UTC), without the email.utils detour"""
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+    else:
+        value = datetime.datetime(value.year, value.month, value.day)
+    return (f"{WEEKDAYS[value.weekday()]}, {value.day:02d} {MONTHS[value.month - 1]} {value.year:04d} "
+            f"{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT")
+
+
+def bson_default(value):
+    """Encode types the JSON library does not know; raises TypeError like json.dumps"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return http_date(value)
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    # bson is only loaded once MongoDB is in use, so anything from it is already imported
+    from bson import Decimal128, ObjectId
+
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class BSONJSONProvider(DefaultJSONProvider):
+    """Flask's json-module provider, extended with BSON types"""
+
+    default = staticmethod(bson_default)
+
+
+class OrjsonProvider(BSONJSONProvider):
+    """orjson-backed provider; loads and dumps(**kwargs) fall back to the json module"""
+
+    sort_keys = True
+    datetime_format = JSON_DATETIME_FORMAT
+
+    def _options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self.datetime_format == "iso":
+            # Stored datetimes are naive UTC
+            options |= orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+        else:
+            options |= orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, indent=False, newline=False):
+        options = self._options(indent)
+        if newline:
+            options |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, default=self.default, option=options)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent, newline=True), mimetype=self.mimetype)
+
+
+def init_app(app):
+    app.json = OrjsonProvider(app) if orjson is not None else BSONJSONProvider(app)
+    return app.json
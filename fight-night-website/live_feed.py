@@ -0,0 +1,484 @@
+"""
+Live feed of new submissions over Server-Sent Events
+
+One background thread per process watches fighter_applications,
+fighter_nominations and email_list and hands each new document to every
+connected admin client, so any number of open dashboards share one MongoDB
+cursor.
+
+When the deployment supports change streams (replica sets, Atlas), the thread
+follows a change stream filtered to inserts into those collections. Each
+event's id is its resume token. On a standalone server it instead polls the
+created_at_desc indexes for documents newer than the last one seen, and ids
+are (created_at, _id) positions. A polled document is only sent once it is
+FEED_SETTLE_SECONDS old, so inserts that commit out of order are not skipped.
+
+A reconnecting EventSource sends Last-Event-ID:
+- If that event is still in the in-memory buffer, the client is replayed
+  from the buffer.
+- Otherwise the client catches up from MongoDB: resume_after for change
+  streams, a range query when polling.
+- If neither can cover the gap, the client gets a "reset" event and should
+  reload its lists.
+
+While idle, the current position is sent with each heartbeat, so a client
+that reconnects after a quiet period still resumes where it left off.
+"""
+
+import collections
+import datetime
+import os
+import queue
+import threading
+import time
+
+from bson.objectid import ObjectId
+
+from pagination import HIDDEN_FIELDS
+
+FEED_COLLECTIONS = ("fighter_applications", "fighter_nominations", "email_list")
+
+# auto tries a change stream and falls back to polling; change_stream or poll force one
+FEED_MODE = os.getenv("FEED_MODE", "auto")
+FEED_POLL_SECONDS = float(os.getenv("FEED_POLL_SECONDS", "1"))
+FEED_SETTLE_SECONDS = float(os.getenv("FEED_SETTLE_SECONDS", "2"))
+FEED_HEARTBEAT_SECONDS = float(os.getenv("FEED_HEARTBEAT_SECONDS", "15"))
+FEED_MAX_CLIENTS = int(os.getenv("FEED_MAX_CLIENTS", "20"))
+# Request threads per threaded worker that streams may never take (see limit_to_threads)
+FEED_FREE_THREADS = int(os.getenv("FEED_FREE_THREADS", "2"))
+# Streams end after this long; EventSource reconnects with Last-Event-ID
+FEED_MAX_SECONDS = float(os.getenv("FEED_MAX_SECONDS", "600"))
+FEED_BUFFER_SIZE = int(os.getenv("FEED_BUFFER_SIZE", "1000"))
+FEED_CATCHUP_LIMIT = int(os.getenv("FEED_CATCHUP_LIMIT", "1000"))
+# The watcher thread exits after this long without subscribers
+FEED_IDLE_SECONDS = float(os.getenv("FEED_IDLE_SECONDS", "60"))
+
+CHANGE_STREAM = "change_stream"
+POLL = "poll"
+
+# Event id prefixes
+CHANGE_PREFIX = "c."
+POLL_PREFIX = "p."
+
+# Sorts after every real ObjectId with the same created_at
+MAX_OBJECT_ID = ObjectId("f" * 24)
+
+RETRY_MILLISECONDS = 3000
+
+
+class FeedFull(Exception):
+    """Raised when the process already serves FEED_MAX_CLIENTS streams"""
+
+
+class ResumeError(Exception):
+    """Raised when a Last-Event-ID can no longer be resumed from"""
+
+
+class FeedStream:
+    """Response body for one client; close() frees its slot even if it was never iterated
+
+    The WSGI server closes every response body, including the empty one sent
+    for a HEAD request, whereas the generator's finally only runs once it has started.
+    """
+
+    def __init__(self, feed, subscriber, events):
+        self._feed = feed
+        self._subscriber = subscriber
+        self._events = events
+
+    def __iter__(self):
+        return self._events
+
+    def close(self):
+        self._events.close()
+        self._feed.unsubscribe(self._subscriber)
+
+
+def utcnow():
+    return datetime.datetime.utcnow()
+
+
+def change_stream_pipeline(collection_names):
+    return [
+        {"$match": {"operationType": "insert", "ns.coll": {"$in": list(collection_names)}}},
+        {"$project": {f"fullDocument.{field}": 0 for field in HIDDEN_FIELDS}},
+    ]
+
+
+def change_event_id(token):
+    return CHANGE_PREFIX + token["_data"]
+
+
+def poll_event_id(created_at, doc_id):
+    return f"{POLL_PREFIX}{created_at.isoformat()}_{doc_id}"
+
+
+def parse_poll_event_id(event_id):
+    try:
+        created_at, doc_id = event_id[len(POLL_PREFIX):].rsplit("_", 1)
+        return datetime.datetime.fromisoformat(created_at), ObjectId(doc_id)
+    except Exception:
+        raise ResumeError(f"Invalid event id: {event_id}")
+
+
+def after_position_query(position, until):
+    """Documents sorting after position by (created_at, _id), created no later than until"""
+    created_at, last_id = position
+    return {"$and": [
+        {"$or": [{"created_at": {"$gt": created_at}},
+                 {"created_at": created_at, "_id": {"$gt": last_id}}]},
+        {"created_at": {"$lte": until}},
+    ]}
+
+
+def format_event(event_id=None, event=None, data=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    if data is not None:
+        lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscriber:
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+
+class LiveFeed:
+    """Fans newly inserted documents out to Server-Sent Events clients"""
+
+    def __init__(self, get_db, collection_names=FEED_COLLECTIONS, mode=FEED_MODE,
+                 poll_seconds=FEED_POLL_SECONDS, settle_seconds=FEED_SETTLE_SECONDS,
+                 heartbeat_seconds=FEED_HEARTBEAT_SECONDS, max_clients=FEED_MAX_CLIENTS,
+                 max_seconds=FEED_MAX_SECONDS, buffer_size=FEED_BUFFER_SIZE,
+                 catchup_limit=FEED_CATCHUP_LIMIT, idle_seconds=FEED_IDLE_SECONDS):
+        self.get_db = get_db
+        self.collection_names = tuple(collection_names)
+        self.mode = mode
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_clients = max_clients
+        self.max_seconds = max_seconds
+        self.catchup_limit = catchup_limit
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._subscribers = set()
+        self._buffer = collections.deque(maxlen=buffer_size)
+        self._thread = None
+        self._pid = None
+        self._active_mode = None
+        self._position = None
+        self._idle_since = None
+        self._ready = threading.Event()
+        # Set once auto mode finds change streams unsupported, so restarts skip the attempt
+        self._change_streams_unavailable = False
+
+    # Watcher thread
+
+    def _publish(self, events, position_id):
+        """Hand events to every subscriber, then advance the feed position"""
+        with self._lock:
+            self._buffer.extend(events)
+            self._position = position_id
+            subscribers = list(self._subscribers)
+        items = [("event", event) for event in events] + [("position", position_id)]
+        for subscriber in subscribers:
+            if subscriber.overflowed:
+                continue
+            try:
+                for item in items:
+                    subscriber.queue.put_nowait(item)
+            except queue.Full:
+                # A client this far behind reconnects and catches up instead
+                subscriber.overflowed = True
+
+    def _reset_subscribers(self):
+        with self._lock:
+            self._buffer.clear()
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.overflowed = True
+
+    def _open_change_stream(self, token=None):
+        return self.get_db().watch(change_stream_pipeline(self.collection_names),
+                                   resume_after=token, max_await_time_ms=int(self.poll_seconds * 1000))
+
+    def _watch(self, stream):
+        """Follow a change stream until stopped or idle; returns False if the stream failed"""
+        from pymongo.errors import PyMongoError
+
+        last_token = stream.resume_token
+        while not self._should_exit():
+            try:
+                change = stream.try_next()
+            except PyMongoError as e:
+                print(f"Error reading live feed change stream: {e}")
+                return False
+            events = []
+            while change is not None:
+                events.append((change_event_id(change["_id"]), change["ns"]["coll"],
+                               change["fullDocument"]))
+                if len(events) >= 100:
+                    break
+                try:
+                    change = stream.try_next()
+                except PyMongoError as e:
+                    print(f"Error reading live feed change stream: {e}")
+                    self._publish(events, change_event_id(stream.resume_token))
+                    return False
+            token = stream.resume_token
+            if events or (token is not None and token != last_token):
+                self._publish(events, change_event_id(token))
+                last_token = token
+        return True
+
+    def _run_change_stream(self, stream):
+        token = stream.resume_token
+        while not self._should_exit():
+            try:
+                finished = self._watch(stream)
+                token = stream.resume_token or token
+            finally:
+                stream.close()
+            if finished:
+                return
+            time.sleep(self.poll_seconds)
+            try:
+                stream = self._open_change_stream(token)
+            except Exception as e:
+                # The token fell off the oplog; clients cannot be caught up from it
+                print(f"Live feed change stream could not resume, starting over: {e}")
+                self._reset_subscribers()
+                try:
+                    stream = self._open_change_stream()
+                except Exception as e:
+                    print(f"Error reopening live feed change stream: {e}")
+                    self._stopping.wait(self.poll_seconds)
+                    return
+
+    def _poll_once(self, position):
+        """Settled documents after position across the collections, oldest first"""
+        db = self.get_db()
+        until = utcnow() - datetime.timedelta(seconds=self.settle_seconds)
+        found = []
+        full = []
+        for name in self.collection_names:
+            docs = list(db[name].find(after_position_query(position, until), HIDDEN_FIELDS)
+                        .sort([("created_at", 1), ("_id", 1)]).limit(self.catchup_limit))
+            if len(docs) == self.catchup_limit:
+                full.append((docs[-1]["created_at"], docs[-1]["_id"]))
+            found.extend((doc["created_at"], doc["_id"], name, doc) for doc in docs)
+        found.sort(key=lambda item: (item[0], item[1]))
+        # A collection that hit the limit may have more before the others' later documents
+        limit_key = min(full) if full else (until, MAX_OBJECT_ID)
+        found = [item for item in found if (item[0], item[1]) <= limit_key]
+        events = [(poll_event_id(created_at, doc_id), name, doc) for created_at, doc_id, name, doc in found]
+        return events, limit_key
+
+    def _run_poll(self):
+        position = (utcnow() - datetime.timedelta(seconds=self.settle_seconds), MAX_OBJECT_ID)
+        with self._lock:
+            self._position = poll_event_id(*position)
+        self._ready.set()
+        while not self._should_exit():
+            try:
+                events, position = self._poll_once(position)
+                self._publish(events, poll_event_id(*position))
+            except Exception as e:
+                print(f"Error polling live feed: {e}")
+            self._stopping.wait(self.poll_seconds)
+
+    def _should_exit(self):
+        if self._stopping.is_set():
+            return True
+        with self._lock:
+            if self._subscribers:
+                self._idle_since = None
+                return False
+            if self._idle_since is None:
+                self._idle_since = time.monotonic()
+            return time.monotonic() - self._idle_since > self.idle_seconds
+
+    def _run(self):
+        try:
+            stream = None
+            if self.mode == CHANGE_STREAM or (self.mode == "auto" and not self._change_streams_unavailable):
+                try:
+                    stream = self._open_change_stream()
+                except Exception as e:
+                    if self.mode == CHANGE_STREAM:
+                        print(f"Error opening live feed change stream: {e}")
+                        return
+                    print(f"Change streams unavailable, live feed polls instead: {e}")
+                    self._change_streams_unavailable = True
+            if stream is not None:
+                with self._lock:
+                    self._active_mode = CHANGE_STREAM
+                    self._position = change_event_id(stream.resume_token) if stream.resume_token else None
+                self._ready.set()
+                self._run_change_stream(stream)
+            else:
+                with self._lock:
+                    self._active_mode = POLL
+                self._run_poll()
+        finally:
+            with self._lock:
+                self._thread = None
+                self._active_mode = None
+                self._position = None
+                self._buffer.clear()
+                # Anyone still connected lost their source of events
+                for subscriber in self._subscribers:
+                    subscriber.overflowed = True
+            self._ready.set()
+
+    def start(self):
+        """Start the watcher thread once per process (safe to call repeatedly)"""
+        pid = os.getpid()
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            # Threads never survive a fork, so a new pid needs a new watcher
+            self._pid = pid
+            self._stopping.clear()
+            self._ready.clear()
+            self._idle_since = None
+            self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def limit_to_threads(self, threads, free_threads=FEED_FREE_THREADS):
+        """Cap streams for a worker serving requests on this many threads
+
+        Each stream holds a request thread, so free_threads are kept for
+        form submissions and other requests. Too few threads disables the feed.
+        """
+        self.max_clients = max(min(self.max_clients, threads - free_threads), 0)
+
+    # Clients
+
+    def subscribe(self):
+        with self._lock:
+            if self.max_clients <= 0:
+                raise FeedFull("The live feed is disabled on this worker; it needs GUNICORN_THREADS above "
+                               f"{FEED_FREE_THREADS} or GUNICORN_WORKER_CLASS=gevent")
+            if len(self._subscribers) >= self.max_clients:
+                raise FeedFull(f"The live feed is limited to {self.max_clients} clients per process")
+            subscriber = Subscriber(self.catchup_limit + 100)
+            self._subscribers.add(subscriber)
+        self.start()
+        self._ready.wait(10)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {"mode": self._active_mode, "clients": len(self._subscribers),
+                    "buffered_events": len(self._buffer), "position": self._position}
+
+    def _replay_from_buffer(self, last_event_id):
+        with self._lock:
+            buffered = list(self._buffer)
+        for index, event in enumerate(buffered):
+            if event[0] == last_event_id:
+                return buffered[index + 1:]
+        return None
+
+    def _catch_up(self, last_event_id):
+        """Events after last_event_id read from MongoDB; raises ResumeError if that is impossible"""
+        if last_event_id.startswith(POLL_PREFIX):
+            position = parse_poll_event_id(last_event_id)
+            events, _ = self._poll_once(position)
+            if len(events) >= self.catchup_limit:
+                raise ResumeError("Too many events to catch up on")
+            return events
+        if last_event_id.startswith(CHANGE_PREFIX):
+            events = []
+            try:
+                with self._open_change_stream({"_data": last_event_id[len(CHANGE_PREFIX):]}) as stream:
+                    change = stream.try_next()
+                    while change is not None:
+                        events.append((change_event_id(change["_id"]), change["ns"]["coll"],
+                                       change["fullDocument"]))
+                        if len(events) >= self.catchup_limit:
+                            raise ResumeError("Too many events to catch up on")
+                        change = stream.try_next()
+            except ResumeError:
+                raise
+            except Exception as e:
+                raise ResumeError(f"Cannot resume change stream: {e}")
+            return events
+        raise ResumeError(f"Invalid event id: {last_event_id}")
+
+    def stream(self, dumps, last_event_id=None, collection_names=None):
+        """Generator of Server-Sent Events text for one client
+
+        dumps(obj) -> str serializes documents (the app's JSON provider).
+        Raises FeedFull before anything is generated when the process is at capacity.
+        """
+        subscriber = self.subscribe()
+        wanted = set(collection_names or self.collection_names)
+        return FeedStream(self, subscriber, self._events(subscriber, dumps, last_event_id, wanted))
+
+    def _events(self, subscriber, dumps, last_event_id, wanted):
+        deadline = time.monotonic() + self.max_seconds
+        with self._lock:
+            position = self._position
+
+        def message(event):
+            event_id, name, doc = event
+            if name not in wanted:
+                # Still advance the client's position past it
+                return format_event(event_id)
+            return format_event(event_id, "insert", dumps({"collection": name, "document": doc}))
+
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n"
+            seen = set()
+            if last_event_id:
+                replay = self._replay_from_buffer(last_event_id)
+                if replay is None:
+                    try:
+                        replay = self._catch_up(last_event_id)
+                    except ResumeError as e:
+                        replay = []
+                        yield format_event(position, "reset", dumps({"reason": str(e)}))
+                    else:
+                        position = last_event_id
+                for event in replay:
+                    seen.add(event[0])
+                    position = event[0]
+                    yield message(event)
+            elif position is not None:
+                yield format_event(position)
+
+            while time.monotonic() < deadline:
+                if subscriber.overflowed:
+                    # Ending the stream makes the client reconnect with its Last-Event-ID
+                    return
+                try:
+                    kind, value = subscriber.queue.get(timeout=self.heartbeat_seconds)
+                except queue.Empty:
+                    yield format_event(position) if position else ": keepalive\n\n"
+                    continue
+                if kind == "position":
+                    position = value
+                elif value[0] not in seen:
+                    position = value[0]
+                    yield message(value)
+        finally:
+            self.unsubscribe(subscriber)
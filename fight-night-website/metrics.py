@@ -0,0 +1,241 @@
+"""
+Prometheus metrics
+
+A small in-process registry (counters, gauges and histograms with labels)
+rendered in the Prometheus text format at /metrics. Requests are timed by
+Flask hooks, route stages by timing.stage(), MongoDB commands by a pymongo
+command listener and SMTP sessions by an SMTPPool listener. Values are per
+process; with several workers, scrape each one or aggregate in Prometheus.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+from flask import Response, g, request
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((labels, (list(counts), total, count))
+                           for labels, (counts, total, count) in self._values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels(self.label_names, labels, [("le", format_value(bound))])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            series_labels = format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{series_labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{series_labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.add(Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")))
+http_request_duration = registry.add(Histogram(
+    "http_request_duration_seconds", "Time to build the HTTP response", ("method", "route", "status")))
+http_requests_in_flight = registry.add(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ("route",)))
+request_stage_duration = registry.add(Histogram(
+    "request_stage_duration_seconds", "Time spent in each stage of a request", ("stage",), FAST_BUCKETS))
+mongodb_command_duration = registry.add(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trips", ("collection", "command"), FAST_BUCKETS))
+mongodb_command_failures = registry.add(Counter(
+    "mongodb_command_failures_total", "MongoDB commands that failed", ("collection", "command")))
+smtp_operation_duration = registry.add(Histogram(
+    "smtp_operation_duration_seconds", "SMTP connect, starttls, login and send times", ("operation",)))
+smtp_operation_failures = registry.add(Counter(
+    "smtp_operation_failures_total", "SMTP operations that raised", ("operation",)))
+
+
+def record_stage(name, seconds):
+    request_stage_duration.observe(name, value=seconds)
+
+
+def record_smtp(operation, seconds, error):
+    smtp_operation_duration.observe(operation, value=seconds)
+    if error is not None:
+        smtp_operation_failures.inc(operation)
+
+
+def mongo_command_listener():
+    """Build a pymongo CommandListener recording per-collection command latency"""
+    from pymongo import monitoring
+
+    class MetricsCommandListener(monitoring.CommandListener):
+        def __init__(self):
+            self._collections = {}
+            self._lock = threading.Lock()
+
+        def started(self, event):
+            # Only the started event carries the command document (and so the collection)
+            collection = event.command.get(event.command_name)
+            if not isinstance(collection, str):
+                collection = ""
+            with self._lock:
+                self._collections[(event.connection_id, event.request_id)] = collection
+
+        def _finish(self, event):
+            with self._lock:
+                return self._collections.pop((event.connection_id, event.request_id), "")
+
+        def succeeded(self, event):
+            collection = self._finish(event)
+            mongodb_command_duration.observe(collection, event.command_name,
+                                             value=event.duration_micros / 1e6)
+
+        def failed(self, event):
+            collection = self._finish(event)
+            mongodb_command_duration.observe(collection, event.command_name,
+                                             value=event.duration_micros / 1e6)
+            mongodb_command_failures.inc(collection, event.command_name)
+
+    return MetricsCommandListener()
+
+
+def route_label():
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+
+def init_app(app, enabled=METRICS_ENABLED):
+    """Instrument the app and serve /metrics"""
+    if not enabled:
+        return
+
+    import database
+    import timing
+
+    # SMTP timings come from the pool, which the app builds with record_smtp
+    # as a listener so smtplib stays unimported until the first email
+    timing.stage_listeners.append(record_stage)
+    database.add_listener(mongo_command_listener)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_route = route_label()
+        g.metrics_started = time.perf_counter()
+        http_requests_in_flight.inc(g.metrics_route)
+
+    @app.after_request
+    def record_request(response):
+        started = g.get("metrics_started")
+        if started is not None:
+            labels = (request.method, g.metrics_route, str(response.status_code))
+            http_requests_total.inc(*labels)
+            http_request_duration.observe(*labels, value=time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def end_request(exc):
+        route = g.pop("metrics_route", None)
+        if route is not None:
+            http_requests_in_flight.dec(route)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,131 @@
+"""
+Keyset pagination for the admin list endpoints
+
+Pages are ordered newest first by (created_at, _id) and addressed by an opaque
+cursor holding the sort key of the last document returned, so every page is a
+bounded index range scan no matter how deep the client pages.
+"""
+
+import base64
+import datetime
+import json
+import re
+
+from bson.objectid import ObjectId
+# Same value as pymongo.DESCENDING, without importing pymongo
+DESCENDING = -1
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+SORT_ORDER = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+FIELD_NAME = re.compile(r'^[A-Za-z0-9_]+$')
+
+# Derived fields kept only for indexing (see search.py), never returned
+HIDDEN_FIELDS = {"search_terms": 0}
+
+
+class PaginationError(ValueError):
+    """Raised for malformed limit, cursor or field parameters"""
+
+
+def encode_cursor(doc):
+    """Build an opaque cursor pointing just past the given document"""
+    created_at = doc.get("created_at")
+    payload = {
+        "t": created_at.isoformat() if isinstance(created_at, datetime.datetime) else None,
+        "id": str(doc["_id"]),
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (created_at, _id) from a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = payload["t"]
+        if created_at is not None:
+            created_at = datetime.datetime.fromisoformat(created_at)
+        return created_at, ObjectId(payload["id"])
+    except Exception:
+        raise PaginationError("Invalid cursor")
+
+
+def parse_page_args(args):
+    """Read limit, after and fields from the request query string"""
+    limit = args.get("limit", DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise PaginationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    after = args.get("after") or None
+    if after is not None:
+        after = decode_cursor(after)
+
+    return limit, after, parse_fields(args.get("fields"))
+
+
+def parse_fields(value):
+    """Split a comma-separated fields parameter into validated field names"""
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    for field in fields:
+        if not FIELD_NAME.match(field):
+            raise PaginationError(f"Invalid field name: {field}")
+    return fields or None
+
+
+def after_filter(after):
+    """Query matching documents that sort strictly after the cursor position"""
+    created_at, last_id = after
+    if created_at is None:
+        # Documents without created_at sort last; only _id orders them
+        return {"created_at": None, "_id": {"$lt": last_id}}
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": last_id}},
+        {"created_at": None},
+    ]}
+
+
+def page_query(after=None, query=None):
+    """Filter for one page: the caller's query combined with the cursor position"""
+    conditions = [query] if query else []
+    if after is not None:
+        conditions.append(after_filter(after))
+    if not conditions:
+        return {}
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+def page_projection(fields):
+    if not fields:
+        return HIDDEN_FIELDS
+    # The sort key is always needed to build the next cursor
+    projection = dict.fromkeys(fields, 1)
+    projection["created_at"] = 1
+    return projection
+
+
+def finish_page(docs, limit):
+    """Trim the look-ahead document and build next_cursor from the last one kept"""
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1])
+    return docs, None
+
+
+def fetch_page(collection, limit=DEFAULT_PAGE_SIZE, after=None, fields=None, query=None):
+    """Fetch one page of documents and the cursor for the next one"""
+    cursor = collection.find(page_query(after, query), page_projection(fields))
+    docs = list(cursor.sort(SORT_ORDER).limit(limit + 1))
+    return finish_page(docs, limit)
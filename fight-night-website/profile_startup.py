@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Cold-start report for the API
+
+Imports app.py in a fresh interpreter with -X importtime, lists the slowest
+imports, then times the first /api/health request and confirms it did not
+create a MongoDB client or load the email modules.
+
+Usage: python profile_startup.py [--top N]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Runs inside the child interpreter so module state starts clean
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/api/health')
+first_request = time.perf_counter()
+import database
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_health_ms": (first_request - imported) * 1000,
+    "health_status": response.status_code,
+    "mongo_client_created": database.is_connected(),
+    "pymongo_loaded": "pymongo" in sys.modules,
+    "smtplib_loaded": "smtplib" in sys.modules,
+    "email_mime_loaded": "email.mime.multipart" in sys.modules,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Return (cumulative_us, self_us, module, depth) rows from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        module = parts[2].rstrip()
+        depth = (len(module) - len(module.lstrip())) // 2
+        rows.append((int(parts[1]), int(parts[0]), module.strip(), depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top", type=int, default=15, help="Number of slow imports to list")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=here, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    rows = parse_importtime(result.stderr)
+
+    print("Slowest top-level imports (cumulative):")
+    top_level = sorted((row for row in rows if row[3] <= 1), reverse=True)[:args.top]
+    for cumulative_us, self_us, module, _ in top_level:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    print()
+    print(f"import app:             {report['import_ms']:.1f} ms")
+    print(f"first /api/health:      {report['first_health_ms']:.1f} ms (status {report['health_status']})")
+    print(f"MongoDB client created: {report['mongo_client_created']}")
+    print(f"pymongo imported:       {report['pymongo_loaded']}")
+    print(f"smtplib imported:       {report['smtplib_loaded']}")
+    print(f"email.mime imported:    {report['email_mime_loaded']}")
+
+    if report["mongo_client_created"] or report["pymongo_loaded"]:
+        print("\nWARNING: the health check path touched MongoDB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
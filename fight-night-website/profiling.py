@@ -0,0 +1,398 @@
+"""
+Opt-in per-request profiling
+
+With PROFILING_ENABLED=true every request is profiled and the PROFILING_KEEP
+slowest are kept. Otherwise, when PROFILING_SECRET is set, a single request can
+ask to be profiled with a signed header:
+
+    X-Profile: <expiry unix time>.<hex HMAC-SHA256 of the expiry>
+
+`python profiling.py token` prints a header value valid for 15 minutes.
+Requested profiles are always kept (the last PROFILING_KEEP of them), and the
+response carries X-Profile-Id.
+
+Two profilers are available (PROFILING_MODE):
+    cprofile  deterministic; exact call counts, higher overhead
+    sampling  a background thread records the request thread's stack every
+              PROFILING_SAMPLE_INTERVAL_MS; low overhead, real stacks
+
+Profiles are listed at /api/admin/profiles. Each one can be fetched as a
+pstats-style text report or as collapsed stacks for flamegraph.pl or
+speedscope (?format=collapsed). Stage timings (see timing.py) are included, so
+time spent in validation, MongoDB and email is visible at a glance.
+"""
+
+import collections
+import cProfile
+import datetime
+import heapq
+import hmac
+import hashlib
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+
+from flask import Response, g, jsonify, request
+
+import timing
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_SECRET = os.getenv("PROFILING_SECRET", "")
+PROFILING_MODE = os.getenv("PROFILING_MODE", "cprofile")
+PROFILING_KEEP = int(os.getenv("PROFILING_KEEP", "20"))
+# With PROFILING_ENABLED, faster requests are not kept
+PROFILING_MIN_MS = float(os.getenv("PROFILING_MIN_MS", "0"))
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "5"))
+
+HEADER = "X-Profile"
+ID_HEADER = "X-Profile-Id"
+# Signed header values may not be valid for longer than this
+MAX_TOKEN_SECONDS = 24 * 3600
+MAX_STACK_DEPTH = 64
+PROFILE_MODES = ("cprofile", "sampling")
+SORT_KEYS = ("cumulative", "tottime", "calls")
+
+
+class ProfilingError(ValueError):
+    """Raised for invalid profile query parameters"""
+
+
+def sign(expires, secret=PROFILING_SECRET):
+    return hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+
+
+def make_token(seconds=900, secret=PROFILING_SECRET):
+    expires = int(time.time() + seconds)
+    return f"{expires}.{sign(expires, secret)}"
+
+
+def valid_token(value, secret=PROFILING_SECRET, now=None):
+    if not secret or not value:
+        return False
+    expires, _, signature = value.partition(".")
+    if not expires.isdigit():
+        return False
+    now = time.time() if now is None else now
+    remaining = int(expires) - now
+    if remaining <= 0 or remaining > MAX_TOKEN_SECONDS:
+        return False
+    return hmac.compare_digest(signature, sign(int(expires), secret))
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def pstats_label(func):
+    filename, line, name = func
+    if filename == "~":
+        # Built-ins such as <method 'find' of 're.Pattern' objects>
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class Sampler:
+    """One thread that samples the stacks of every thread being profiled"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._targets = {}
+        self._thread = None
+        self._pid = None
+
+    def add(self, thread_id, counter):
+        with self._lock:
+            self._targets[thread_id] = counter
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, thread_id):
+        with self._lock:
+            self._targets.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                targets = dict(self._targets)
+            frames = sys._current_frames()
+            for thread_id, counter in targets.items():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    counter[tuple(reversed(stack))] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+class RequestProfile:
+    """A finished profile of one request"""
+
+    def __init__(self, profile_id, mode, summary, profiler=None, samples=None, interval=None):
+        self.id = profile_id
+        self.mode = mode
+        self.summary = summary
+        self.duration_ms = summary["duration_ms"]
+        self._profiler = profiler
+        self._samples = samples
+        self._interval = interval
+
+    def text(self, sort="cumulative", limit=40):
+        header = (f"{self.summary['method']} {self.summary['path']} -> {self.summary['status']} "
+                  f"in {self.duration_ms:.1f} ms ({self.mode})\n")
+        stages = self.summary.get("stages")
+        if stages:
+            header += "stages: " + ", ".join(f"{name}={ms:.1f}ms" for name, ms in stages) + "\n"
+        if self.mode == "cprofile":
+            out = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=out)
+            stats.sort_stats(sort).print_stats(limit)
+            return header + out.getvalue()
+        return header + "\n" + self._sampling_text(limit)
+
+    def _sampling_text(self, limit):
+        total = sum(self._samples.values())
+        inclusive = collections.Counter()
+        own = collections.Counter()
+        for stack, count in self._samples.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                inclusive[label] += count
+        lines = [f"{total} samples every {self._interval * 1000:g} ms",
+                 f"{'inclusive':>10} {'self':>10}  function"]
+        for label, count in inclusive.most_common(limit):
+            lines.append(f"{count / total:>10.1%} {own[label] / total:>10.1%}  {label}")
+        return "\n".join(lines) + "\n"
+
+    def collapsed(self):
+        """Collapsed stacks ("a;b;c count" per line) in microseconds or samples"""
+        if self.mode == "sampling":
+            rows = [(";".join(stack), count) for stack, count in self._samples.items()]
+        else:
+            rows = collapse_pstats(pstats.Stats(self._profiler).stats)
+        return "".join(f"{stack} {value}\n" for stack, value in sorted(rows) if value > 0)
+
+
+def collapse_pstats(stats):
+    """Approximate stacks from cProfile's caller graph
+
+    cProfile records caller -> callee edges, not whole stacks, so a function
+    called from several places has its children split in proportion to each
+    edge's share of its cumulative time.
+    """
+    children = collections.defaultdict(list)
+    for func, (_, _, own, cumulative, callers) in stats.items():
+        for caller, edge in callers.items():
+            children[caller].append((func, edge[3]))
+    roots = [func for func, row in stats.items() if not row[4]]
+    rows = collections.Counter()
+
+    def walk(func, path, scale, depth):
+        _, _, own, cumulative, _ = stats[func]
+        path = path + (pstats_label(func),)
+        rows[";".join(path)] += int(own * scale * 1e6)
+        if depth >= MAX_STACK_DEPTH or cumulative <= 0:
+            return
+        for child, edge_cumulative in children.get(func, ()):
+            if pstats_label(child) in path:
+                continue
+            child_cumulative = stats[child][3]
+            if child_cumulative > 0:
+                walk(child, path, scale * min(edge_cumulative / child_cumulative, 1.0), depth + 1)
+
+    for root in roots:
+        walk(root, (), 1.0, 0)
+    return list(rows.items())
+
+
+class ProfileStore:
+    """The slowest sampled profiles plus the most recent requested ones"""
+
+    def __init__(self, keep=PROFILING_KEEP):
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._slowest = []
+        self._requested = collections.deque(maxlen=keep)
+        self._order = itertools.count()
+
+    def add(self, profile, requested=False):
+        with self._lock:
+            if requested:
+                self._requested.append(profile)
+                return
+            # Min-heap on duration: the fastest kept profile is evicted first
+            entry = (profile.duration_ms, next(self._order), profile)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            elif entry[0] > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def all(self):
+        with self._lock:
+            profiles = [entry[2] for entry in self._slowest] + list(self._requested)
+        return sorted(profiles, key=lambda profile: profile.duration_ms, reverse=True)
+
+    def get(self, profile_id):
+        for profile in self.all():
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._slowest = []
+            self._requested.clear()
+
+
+store = ProfileStore()
+_sampler = Sampler(PROFILING_SAMPLE_INTERVAL_MS / 1000.0)
+_ids = itertools.count(1)
+
+
+def start_profile(mode):
+    if mode == "sampling":
+        samples = collections.Counter()
+        _sampler.add(threading.get_ident(), samples)
+        return samples
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active on this thread
+        return None
+    return profiler
+
+
+def stop_profile(mode, handle):
+    if mode == "sampling":
+        _sampler.remove(threading.get_ident())
+    else:
+        handle.disable()
+
+
+def init_app(app, enabled=PROFILING_ENABLED, secret=PROFILING_SECRET, mode=PROFILING_MODE,
+             min_ms=PROFILING_MIN_MS):
+    """Profile requests when enabled or signed-for, and serve /api/admin/profiles"""
+    if not enabled and not secret:
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"PROFILING_MODE must be one of: {', '.join(PROFILE_MODES)}")
+
+    @app.before_request
+    def start_request_profile():
+        requested = valid_token(request.headers.get(HEADER), secret)
+        if not (enabled or requested) or request.path.startswith("/api/admin/profiles"):
+            return
+        handle = start_profile(mode)
+        if handle is not None:
+            g.profile = (handle, requested, time.perf_counter(), datetime.datetime.utcnow())
+
+    # Registered before the other hooks, so this after_request runs last
+    # and the profile includes their work (e.g. response compression)
+    @app.after_request
+    def finish_request_profile(response):
+        state = g.pop("profile", None)
+        if state is None:
+            return response
+        handle, requested, started, started_at = state
+        stop_profile(mode, handle)
+        duration_ms = (time.perf_counter() - started) * 1000
+        if not requested and duration_ms < min_ms:
+            return response
+
+        profile_id = f"{os.getpid()}-{next(_ids)}"
+        summary = {
+            "id": profile_id,
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "duration_ms": round(duration_ms, 3),
+            "started_at": started_at,
+            "requested": requested,
+            "mode": mode,
+            "stages": [(name, round(seconds * 1000, 3)) for name, seconds in timing.request_stages()],
+        }
+        if mode == "sampling":
+            profile = RequestProfile(profile_id, mode, summary, samples=handle,
+                                     interval=_sampler.interval)
+        else:
+            profile = RequestProfile(profile_id, mode, summary, profiler=handle)
+        store.add(profile, requested)
+        if requested:
+            response.headers[ID_HEADER] = profile_id
+        return response
+
+    @app.teardown_request
+    def abandon_request_profile(exc):
+        # after_request does not run when the view raises
+        state = g.pop("profile", None)
+        if state is not None:
+            stop_profile(mode, state[0])
+
+    @app.route('/api/admin/profiles', methods=['GET', 'DELETE'])
+    def list_profiles():
+        # In production, add authentication here
+        if request.method == "DELETE":
+            store.clear()
+            return jsonify({"success": True})
+        return jsonify({"profiles": [profile.summary for profile in store.all()]})
+
+    @app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+    def get_profile(profile_id):
+        # In production, add authentication here
+        profile = store.get(profile_id)
+        if profile is None:
+            return jsonify({"success": False, "message": f"Unknown profile: {profile_id}"}), 404
+        try:
+            output_format, sort, limit = parse_profile_args(request.args)
+        except ProfilingError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        if output_format == "collapsed":
+            return Response(profile.collapsed(), mimetype="text/plain")
+        return Response(profile.text(sort, limit), mimetype="text/plain")
+
+
+def parse_profile_args(args):
+    output_format = args.get("format", "text")
+    if output_format not in ("text", "collapsed"):
+        raise ProfilingError("format must be text or collapsed")
+    sort = args.get("sort", "cumulative")
+    if sort not in SORT_KEYS:
+        raise ProfilingError(f"sort must be one of: {', '.join(SORT_KEYS)}")
+    try:
+        limit = int(args.get("limit", 40))
+    except ValueError:
+        raise ProfilingError("limit must be an integer")
+    if limit < 1 or limit > 500:
+        raise ProfilingError("limit must be between 1 and 500")
+    return output_format, sort, limit
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Per-request profiling helpers")
+    parser.add_argument("command", choices=["token"])
+    parser.add_argument("--minutes", type=float, default=15)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    secret = os.getenv("PROFILING_SECRET", "")
+    if not secret:
+        parser.error("PROFILING_SECRET is not set")
+    print(f"{HEADER}: {make_token(int(args.minutes * 60), secret)}")
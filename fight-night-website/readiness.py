@@ -0,0 +1,262 @@
+"""
+Readiness probe with cached dependency checks
+
+A background thread pings MongoDB every READY_PROBE_INTERVAL_SECONDS and
+checks out an SMTP session every READY_SMTP_PROBE_INTERVAL_SECONDS. /api/ready
+only reads the last results, so load balancer polling never reaches the
+database or the mail server. Connection-pool usage comes from a pymongo pool
+listener, and successful real sends count as SMTP checks too.
+"""
+
+import datetime
+import os
+import threading
+import time
+
+READY_PROBE_INTERVAL_SECONDS = float(os.getenv("READY_PROBE_INTERVAL_SECONDS", "10"))
+READY_SMTP_PROBE_INTERVAL_SECONDS = float(os.getenv("READY_SMTP_PROBE_INTERVAL_SECONDS", "300"))
+READY_REQUIRE_SMTP = os.getenv("READY_REQUIRE_SMTP", "true").lower() == "true"
+# The SMTP check waits this long for a free session; a fully checked-out pool is reported as busy
+READY_SMTP_ACQUIRE_SECONDS = float(os.getenv("READY_SMTP_ACQUIRE_SECONDS", "1"))
+# Results older than this many probe intervals mean the prober itself is stuck
+READY_STALE_INTERVALS = 3
+
+
+def utcnow():
+    return datetime.datetime.utcnow()
+
+
+def isoformat(moment):
+    return moment.isoformat() if moment is not None else None
+
+
+def is_disconnect(error):
+    """True for send errors caused by the connection rather than the message"""
+    import smtplib
+
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException subclasses OSError, so SMTP replies are excluded first
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class ReadinessProbe:
+    """Periodically checks MongoDB and SMTP and keeps the latest results"""
+
+    def __init__(self, get_client, get_smtp_pool, interval=READY_PROBE_INTERVAL_SECONDS,
+                 smtp_interval=READY_SMTP_PROBE_INTERVAL_SECONDS, require_smtp=READY_REQUIRE_SMTP,
+                 smtp_acquire_seconds=READY_SMTP_ACQUIRE_SECONDS):
+        self.get_client = get_client
+        self.get_smtp_pool = get_smtp_pool
+        self.interval = interval
+        self.smtp_interval = smtp_interval
+        self.require_smtp = require_smtp
+        self.smtp_acquire_seconds = smtp_acquire_seconds
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._mongo = None
+        self._checked_at = None
+        self._last_smtp_probe = None
+        self._smtp = {"last_success": None, "last_failure": None, "last_error": None, "last_busy": None}
+        self._connections = {"checked_out": 0, "open": 0}
+
+    # pymongo pool events (see connection_pool_listener) and SMTP pool events
+
+    def record_smtp(self, operation, seconds, error):
+        """SMTPPool listener: any successful send or login proves SMTP works
+
+        Only failures to reach or log in to the server count against it; a
+        rejected recipient or message is not a reason to leave the rotation.
+        """
+        if error is None and operation not in ("login", "send"):
+            return
+        if error is not None and operation == "send" and not is_disconnect(error):
+            return
+        with self._lock:
+            if error is None:
+                self._smtp["last_success"] = utcnow()
+            else:
+                self._smtp["last_failure"] = utcnow()
+                self._smtp["last_error"] = f"{operation}: {error}"
+
+    def _count_connection(self, key, delta):
+        with self._lock:
+            self._connections[key] = max(0, self._connections[key] + delta)
+
+    def connection_pool_listener(self):
+        """Build a pymongo ConnectionPoolListener tracking open and checked-out connections"""
+        from pymongo import monitoring
+
+        probe = self
+        with self._lock:
+            self._connections = {"checked_out": 0, "open": 0}
+
+        class ReadinessPoolListener(monitoring.ConnectionPoolListener):
+            def pool_created(self, event):
+                pass
+
+            def pool_ready(self, event):
+                pass
+
+            def pool_cleared(self, event):
+                pass
+
+            def pool_closed(self, event):
+                pass
+
+            def connection_created(self, event):
+                probe._count_connection("open", 1)
+
+            def connection_ready(self, event):
+                pass
+
+            def connection_closed(self, event):
+                probe._count_connection("open", -1)
+
+            def connection_check_out_started(self, event):
+                pass
+
+            def connection_check_out_failed(self, event):
+                pass
+
+            def connection_checked_out(self, event):
+                probe._count_connection("checked_out", 1)
+
+            def connection_checked_in(self, event):
+                probe._count_connection("checked_out", -1)
+
+        return ReadinessPoolListener()
+
+    # Probing
+
+    def probe_mongo(self):
+        started = time.perf_counter()
+        try:
+            client = self.get_client()
+            client.admin.command("ping")
+            result = {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                      "error": None}
+        except Exception as e:
+            return {"ok": False, "latency_ms": None, "error": str(e), "pool": None}
+        pool_options = getattr(getattr(client, "options", None), "pool_options", None)
+        max_size = getattr(pool_options, "max_pool_size", None)
+        if not isinstance(max_size, int):
+            max_size = None
+        with self._lock:
+            connections = dict(self._connections)
+        connections["max_size"] = max_size
+        connections["utilisation"] = round(connections["checked_out"] / max_size, 4) if max_size else None
+        result["pool"] = connections
+        return result
+
+    def probe_smtp(self):
+        """Borrow a pooled session, which logs in or NOOP-checks it; results arrive via record_smtp
+
+        Every session being checked out by senders is reported as busy, not as
+        a failure, rather than holding up the MongoDB checks behind it.
+        """
+        from smtp_pool import SMTPPoolTimeout
+
+        try:
+            pool = self.get_smtp_pool()
+            server = pool.acquire(timeout=self.smtp_acquire_seconds)
+        except SMTPPoolTimeout:
+            with self._lock:
+                self._smtp["last_busy"] = utcnow()
+            return
+        except Exception as e:
+            with self._lock:
+                self._smtp["last_failure"] = utcnow()
+                self._smtp["last_error"] = str(e)
+            return
+        pool.release(server)
+        with self._lock:
+            self._smtp["last_success"] = utcnow()
+
+    def refresh(self):
+        """Run the checks that are due; called from the probe thread"""
+        mongo = self.probe_mongo()
+        now = time.monotonic()
+        if self._last_smtp_probe is None or now - self._last_smtp_probe >= self.smtp_interval:
+            self._last_smtp_probe = now
+            self.probe_smtp()
+        with self._lock:
+            self._mongo = mongo
+            self._checked_at = utcnow()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error running readiness probe: {e}")
+            self._stopping.wait(self.interval)
+
+    def start(self):
+        """Start the probe thread once per process (safe to call repeatedly)"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            # Threads never survive a fork, so a new pid needs a new prober
+            self._pid = pid
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="readiness-probe", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def snapshot(self):
+        """Latest results as (ready, report); never blocks on a dependency"""
+        self.start()
+        with self._lock:
+            mongo = self._mongo
+            checked_at = self._checked_at
+            smtp = dict(self._smtp)
+
+        if checked_at is None:
+            return False, {"status": "starting", "checked_at": None, "checks": {}}
+
+        age = (utcnow() - checked_at).total_seconds()
+        stale = age > self.interval * READY_STALE_INTERVALS
+        # A busy pool has sessions in use, so it counts like a success unless a failure came later
+        latest_ok = max((moment for moment in (smtp["last_success"], smtp["last_busy"]) if moment is not None),
+                        default=None)
+        smtp_ok = latest_ok is not None and (smtp["last_failure"] is None or latest_ok >= smtp["last_failure"])
+        busy = smtp["last_busy"] is not None and smtp["last_busy"] == latest_ok and smtp_ok
+        ready = mongo["ok"] and not stale and (smtp_ok or not self.require_smtp)
+
+        smtp_pool = None
+        try:
+            stats = self.get_smtp_pool().stats()
+            smtp_pool = {key: stats[key] for key in ("in_use", "idle", "max_size")}
+        except Exception:
+            pass
+
+        return ready, {
+            "status": "ready" if ready else "not_ready",
+            "checked_at": isoformat(checked_at),
+            "age_seconds": round(age, 3),
+            "stale": stale,
+            "checks": {
+                "mongodb": mongo,
+                "smtp": {
+                    "ok": smtp_ok,
+                    "busy": busy,
+                    "required": self.require_smtp,
+                    "last_success": isoformat(smtp["last_success"]),
+                    "last_failure": isoformat(smtp["last_failure"]),
+                    "last_busy": isoformat(smtp["last_busy"]),
+                    "last_error": smtp["last_error"],
+                    "pool": smtp_pool,
+                },
+            },
+        }
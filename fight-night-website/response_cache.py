@@ -0,0 +1,113 @@
+"""
+Read-through cache for the admin list endpoints
+
+Responses are cached per route and query string, bounded by entry count (LRU)
+and age (TTL). Each collection has a version number that is bumped whenever
+this process writes to it. The version is part of the cache key, so a write
+makes every cached page of that collection unreachable at once. Other
+processes do not see the bump; the TTL bounds how stale they can get.
+"""
+
+import collections
+import functools
+import os
+import threading
+import time
+
+from flask import Response, request
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "15"))
+
+
+class ResponseCache:
+    """Bounded TTL + LRU cache of serialized responses"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+                 enabled=RESPONSE_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries = collections.OrderedDict()
+        self._versions = collections.defaultdict(int)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    def version(self, collection_name):
+        return self._versions[collection_name]
+
+    def invalidate(self, collection_name):
+        """Bump the collection version so cached pages of it are never served again"""
+        with self._lock:
+            self._versions[collection_name] += 1
+            self._stats["invalidations"] += 1
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["enabled"] = self.enabled
+        return stats
+
+
+def cached_response(cache, collection_name):
+    """Decorator for GET views whose output depends only on one collection and the query string"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not cache.enabled:
+                return view(*args, **kwargs)
+
+            key = (
+                request.path,
+                cache.version(collection_name),
+                tuple(sorted(request.args.items(multi=True))),
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                body, mimetype = cached
+                response = Response(body, mimetype=mimetype)
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            response = view(*args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200 and not response.is_streamed:
+                cache.set(key, (response.get_data(), response.mimetype))
+                response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
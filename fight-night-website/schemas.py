@@ -0,0 +1,165 @@
+"""
+Declared document shapes for the submission collections
+
+Each schema lists the fields a form may send, with a type and a length or
+range cap. shape_document() builds the stored document from those fields only:
+strings are trimmed, weight and height become numbers, and phone numbers are
+stored as their 10 digits. Anything else the client sent is dropped, which
+keeps documents small and lets weight and height be range-queried on an index.
+
+Request bodies for the form routes are capped at SUBMISSION_MAX_BYTES before
+any JSON is parsed (see LimitedRequest in app.py).
+"""
+
+import os
+
+from validation import NON_DIGITS, validate_phone
+
+SUBMISSION_MAX_BYTES = int(os.getenv("SUBMISSION_MAX_BYTES", "32768"))
+
+SHORT_TEXT = 100
+MEDIUM_TEXT = 200
+LONG_TEXT = 2000
+EMAIL_LENGTH = 254
+
+
+class SchemaError(ValueError):
+    """Raised when a submitted value cannot be stored as its declared type"""
+
+
+class Field:
+    """One allowed field: kind is "string", "email", "phone" or "number" """
+
+    def __init__(self, name, kind="string", max_length=SHORT_TEXT, minimum=None, maximum=None):
+        self.name = name
+        self.kind = kind
+        self.max_length = max_length
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def coerce(self, value):
+        if self.kind == "number":
+            return self._number(value)
+        if not isinstance(value, str):
+            raise SchemaError(f"{self.name} must be a string")
+        value = value.strip()
+        if self.kind == "phone":
+            if not validate_phone(value):
+                raise SchemaError(f"{self.name} must be 10 digits")
+            return NON_DIGITS.sub("", value)
+        if len(value) > self.max_length:
+            raise SchemaError(f"{self.name} must be at most {self.max_length} characters")
+        return value
+
+    def _number(self, value):
+        # bool is an int subclass; a checkbox value is never a weight
+        if isinstance(value, bool):
+            raise SchemaError(f"{self.name} must be a number")
+        if isinstance(value, str):
+            try:
+                value = float(value.strip())
+            except ValueError:
+                raise SchemaError(f"{self.name} must be a number")
+        if not isinstance(value, (int, float)) or value != value:
+            raise SchemaError(f"{self.name} must be a number")
+        if ((self.minimum is not None and value < self.minimum)
+                or (self.maximum is not None and value > self.maximum)):
+            raise SchemaError(f"{self.name} must be between {self.minimum} and {self.maximum}")
+        return int(value) if float(value).is_integer() else float(value)
+
+
+SCHEMAS = {
+    "fighter_applications": [
+        Field("firstName"),
+        Field("lastName"),
+        Field("email", "email", EMAIL_LENGTH),
+        Field("phone", "phone"),
+        Field("jobCompany", max_length=MEDIUM_TEXT),
+        # lbs and inches
+        Field("weight", "number", minimum=50, maximum=500),
+        Field("height", "number", minimum=36, maximum=108),
+        Field("experience", max_length=LONG_TEXT),
+        Field("why", max_length=LONG_TEXT),
+        Field("charity", max_length=MEDIUM_TEXT),
+    ],
+    "fighter_nominations": [
+        Field("yourName"),
+        Field("yourEmail", "email", EMAIL_LENGTH),
+        Field("nomineeName"),
+        Field("nomineeEmail", "email", EMAIL_LENGTH),
+        Field("nomineePhone", "phone"),
+        Field("reason", max_length=LONG_TEXT),
+    ],
+    "email_list": [
+        Field("email", "email", EMAIL_LENGTH),
+    ],
+}
+
+
+def shape_document(collection_name, data):
+    """New document holding only the schema's fields, converted; raises SchemaError
+
+    Required fields are checked by the validators in validation.py first
+    (see shape_submission); empty optional values are left out.
+    """
+    doc = {}
+    for field in SCHEMAS[collection_name]:
+        value = data.get(field.name)
+        if value is None or value == "":
+            continue
+        doc[field.name] = field.coerce(value)
+    return doc
+
+
+def shape_submission(collection_name, data, validate):
+    """Validate a form body, then shape it; returns (doc, error message)
+
+    validate() sees the body with its strings trimmed, so the client gets the
+    validators' messages, in their order, before any SchemaError.
+    """
+    if not isinstance(data, dict):
+        return None, "Request body must be a JSON object"
+    error = validate({key: value.strip() if isinstance(value, str) else value
+                      for key, value in data.items()})
+    if error:
+        return None, error
+    try:
+        return shape_document(collection_name, data), None
+    except SchemaError as e:
+        return None, str(e)
+
+
+def backfill_shapes(collection, batch_size=500):
+    """Convert number and phone fields stored as raw strings before schemas existed
+
+    Values that do not convert are left untouched. Returns the number of
+    documents updated.
+    """
+    from pymongo import UpdateOne
+
+    fields = [field for field in SCHEMAS[collection.name] if field.kind in ("number", "phone")]
+    if not fields:
+        return 0
+    query = {"$or": [{field.name: {"$type": "string"}} for field in fields]}
+    updated = 0
+    batch = []
+    for doc in collection.find(query, dict.fromkeys([field.name for field in fields], 1)):
+        changes = {}
+        for field in fields:
+            value = doc.get(field.name)
+            if not isinstance(value, str):
+                continue
+            try:
+                coerced = field.coerce(value)
+            except SchemaError:
+                continue
+            if coerced != value:
+                changes[field.name] = coerced
+        if changes:
+            batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+        if len(batch) >= batch_size:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += collection.bulk_write(batch, ordered=False).modified_count
+    return updated
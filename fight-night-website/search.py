@@ -0,0 +1,208 @@
+"""
+Staff search over fighter applications and nominations
+
+Every searchable document carries search_terms: the lowercased words of its
+name, company and email fields plus each full email address. A multikey index
+on search_terms makes anchored prefix queries ("jo smi" finds John Smith)
+index range scans. Matches are ranked by which fields the query words hit,
+weighted by SEARCH_FIELDS, with whole-word hits counting double.
+
+mode=text uses the MongoDB text index instead: whole-word matching ranked
+by textScore, with the same field weights.
+
+Results are paged newest-first within equal scores using an opaque cursor over
+(score, created_at, _id).
+"""
+
+import base64
+import datetime
+import json
+import re
+
+from bson.objectid import ObjectId
+
+from pagination import PaginationError
+
+# Searchable fields and their ranking weights
+SEARCH_FIELDS = {
+    "fighter_applications": {"firstName": 4, "lastName": 4, "jobCompany": 2, "email": 3},
+    "fighter_nominations": {"nomineeName": 4, "yourName": 2, "nomineeEmail": 3, "yourEmail": 1},
+}
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_TERMS = 6
+SEARCH_MODES = ("prefix", "text")
+
+# Derived field; left out of API responses
+SEARCH_TERMS_FIELD = "search_terms"
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+class SearchError(ValueError):
+    """Raised for invalid search parameters"""
+
+
+def tokenize(value):
+    """Lowercased alphanumeric words of a string"""
+    if not isinstance(value, str):
+        return []
+    return WORD.findall(value.lower())
+
+
+def search_terms(collection_name, doc):
+    """Sorted distinct terms for a document: field words plus whole email addresses"""
+    terms = set()
+    for field in SEARCH_FIELDS.get(collection_name, ()):
+        value = doc.get(field)
+        terms.update(tokenize(value))
+        if isinstance(value, str) and "@" in value:
+            terms.add(value.strip().lower())
+    return sorted(terms)
+
+
+def add_search_terms(collection_name, doc):
+    """Set search_terms on a document about to be inserted into a searchable collection"""
+    if collection_name in SEARCH_FIELDS:
+        doc[SEARCH_TERMS_FIELD] = search_terms(collection_name, doc)
+    return doc
+
+
+def backfill_search_terms(collection, batch_size=500):
+    """Populate search_terms on documents stored before search existed; returns the number updated"""
+    from pymongo import UpdateOne
+
+    fields = dict.fromkeys(SEARCH_FIELDS[collection.name], 1)
+    updated = 0
+    batch = []
+    for doc in collection.find({SEARCH_TERMS_FIELD: {"$exists": False}}, fields):
+        batch.append(UpdateOne({"_id": doc["_id"]},
+                               {"$set": {SEARCH_TERMS_FIELD: search_terms(collection.name, doc)}}))
+        if len(batch) >= batch_size:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+def search_indexes(collection_name):
+    """(keys, options) pairs for db_indexes.INDEXES"""
+    weights = SEARCH_FIELDS[collection_name]
+    return [
+        ([(SEARCH_TERMS_FIELD, 1)], {"name": "search_terms"}),
+        ([(field, "text") for field in weights], {
+            "name": "search_text",
+            "weights": weights,
+            "default_language": "none",
+        }),
+    ]
+
+
+def encode_cursor(doc):
+    created_at = doc.get("created_at")
+    payload = {
+        "s": doc["_score"],
+        "t": created_at.isoformat() if isinstance(created_at, datetime.datetime) else None,
+        "id": str(doc["_id"]),
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = payload["t"]
+        if created_at is not None:
+            created_at = datetime.datetime.fromisoformat(created_at)
+        return float(payload["s"]), created_at, ObjectId(payload["id"])
+    except Exception:
+        raise PaginationError("Invalid cursor")
+
+
+def parse_search_args(args):
+    """Read q, mode, limit and after from the query string"""
+    query = (args.get("q") or "").strip()
+    terms = tokenize(query)
+    if not terms:
+        raise SearchError("q must contain at least one letter or digit")
+
+    mode = args.get("mode", "prefix")
+    if mode not in SEARCH_MODES:
+        raise SearchError(f"mode must be one of: {', '.join(SEARCH_MODES)}")
+
+    limit = args.get("limit", DEFAULT_SEARCH_LIMIT)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    if limit < 1 or limit > MAX_SEARCH_LIMIT:
+        raise PaginationError(f"limit must be between 1 and {MAX_SEARCH_LIMIT}")
+
+    after = args.get("after") or None
+    if after is not None:
+        after = decode_cursor(after)
+
+    return query, terms[:MAX_QUERY_TERMS], mode, limit, after
+
+
+def prefix_score(collection_name, terms, query):
+    """Aggregation expression: per query word, the weight of each field it prefixes (x2 for a whole word)"""
+    parts = []
+    for field, weight in SEARCH_FIELDS[collection_name].items():
+        words = {"$toLower": {"$ifNull": [f"${field}", ""]}}
+        for term in terms:
+            parts.append({"$cond": [
+                {"$regexMatch": {"input": words, "regex": f"(^|[^a-z0-9]){term}([^a-z0-9]|$)"}},
+                weight * 2,
+                {"$cond": [{"$regexMatch": {"input": words, "regex": f"(^|[^a-z0-9]){term}"}}, weight, 0]},
+            ]})
+    # An exact email address outranks everything else
+    if "@" in query:
+        parts.append({"$cond": [{"$in": [query.lower(), f"${SEARCH_TERMS_FIELD}"]}, 100, 0]})
+    return {"$add": parts}
+
+
+def after_match(after):
+    score, created_at, last_id = after
+    if created_at is None:
+        # Documents without created_at sort last; only _id orders them
+        same_score = [{"_score": score, "created_at": None, "_id": {"$lt": last_id}}]
+    else:
+        same_score = [{"_score": score, "created_at": {"$lt": created_at}},
+                      {"_score": score, "created_at": created_at, "_id": {"$lt": last_id}},
+                      {"_score": score, "created_at": None}]
+    return {"$or": [{"_score": {"$lt": score}}] + same_score}
+
+
+def search_pipeline(collection_name, query, terms, mode, limit, after=None):
+    if mode == "text":
+        match = {"$text": {"$search": query}}
+        score = {"$meta": "textScore"}
+    else:
+        # Every word must prefix one of the terms; the index serves the first
+        match = {"$and": [{SEARCH_TERMS_FIELD: re.compile("^" + re.escape(term))} for term in terms]}
+        score = prefix_score(collection_name, terms, query)
+
+    pipeline = [{"$match": match}, {"$addFields": {"_score": score}}]
+    if after is not None:
+        pipeline.append({"$match": after_match(after)})
+    pipeline += [
+        {"$sort": {"_score": -1, "created_at": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {SEARCH_TERMS_FIELD: 0}},
+    ]
+    return pipeline
+
+
+def search_collection(collection, query, terms, mode="prefix", limit=DEFAULT_SEARCH_LIMIT, after=None):
+    """One ranked page of matches and the cursor for the next page"""
+    docs = list(collection.aggregate(search_pipeline(collection.name, query, terms, mode, limit, after)))
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1])
+    return docs, next_cursor
@@ -0,0 +1,218 @@
+"""
+Thread-safe pool of authenticated SMTP sessions
+
+Keeps logged-in connections alive between messages instead of paying for a
+TCP connect, STARTTLS handshake and login on every send.
+"""
+
+import collections
+import contextlib
+import os
+import smtplib
+import threading
+import time
+
+# Pool configuration
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "3"))
+SMTP_POOL_TIMEOUT = float(os.getenv("SMTP_POOL_TIMEOUT", "30"))
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "30"))
+SMTP_MAX_IDLE_SECONDS = float(os.getenv("SMTP_MAX_IDLE_SECONDS", "240"))
+
+
+class SMTPPoolTimeout(Exception):
+    """Raised when no SMTP session becomes available in time"""
+
+
+class SMTPPool:
+    """Caps concurrent SMTP sessions and reuses idle authenticated ones"""
+
+    def __init__(self, host, port, user, password, max_size=SMTP_POOL_SIZE,
+                 timeout=SMTP_POOL_TIMEOUT, idle_check_seconds=SMTP_IDLE_CHECK_SECONDS,
+                 max_idle_seconds=SMTP_MAX_IDLE_SECONDS, use_tls=True, listeners=()):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_check_seconds = idle_check_seconds
+        self.max_idle_seconds = max_idle_seconds
+        self.use_tls = use_tls
+        # Callables taking (operation, seconds, error) for connect, starttls,
+        # login and send; error is None on success
+        self.listeners = list(listeners)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = collections.deque()
+        self._pid = os.getpid()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "reconnects": 0,
+            "health_checks": 0,
+            "failures": 0,
+            "sent": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "in_use": 0,
+        }
+
+    @contextlib.contextmanager
+    def _observed(self, operation):
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            for listener in self.listeners:
+                listener(operation, elapsed, error)
+
+    def _connect(self):
+        with self._observed("connect"):
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                with self._observed("starttls"):
+                    server.starttls()
+            if self.user:
+                with self._observed("login"):
+                    server.login(self.user, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _is_alive(server):
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _check_fork(self):
+        # Sockets inherited from a parent process must not be shared
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle.clear()
+                    self._slots = threading.BoundedSemaphore(self.max_size)
+                    self._stats["in_use"] = 0
+                    self._pid = os.getpid()
+
+    def acquire(self, timeout=None):
+        """Borrow a healthy, logged-in session, waiting up to timeout (default self.timeout) for a free slot"""
+        self._check_fork()
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            raise SMTPPoolTimeout(f"No SMTP session available after {timeout}s")
+        waited = time.monotonic() - started
+
+        with self._lock:
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+            self._stats["in_use"] += 1
+
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    break
+                server, last_used = entry
+                idle_for = time.monotonic() - last_used
+                if idle_for > self.max_idle_seconds:
+                    self._close(server)
+                    continue
+                if idle_for > self.idle_check_seconds:
+                    with self._lock:
+                        self._stats["health_checks"] += 1
+                    if not self._is_alive(server):
+                        self._close(server)
+                        with self._lock:
+                            self._stats["reconnects"] += 1
+                        continue
+                with self._lock:
+                    self._stats["hits"] += 1
+                return server
+
+            with self._lock:
+                self._stats["misses"] += 1
+            return self._connect()
+        except Exception:
+            self._give_back_slot()
+            raise
+
+    def release(self, server, broken=False):
+        """Return a session to the pool, or discard it if it is broken"""
+        if broken or self._pid != os.getpid():
+            self._close(server)
+        else:
+            with self._lock:
+                self._idle.append((server, time.monotonic()))
+        self._give_back_slot()
+
+    def _give_back_slot(self):
+        with self._lock:
+            self._stats["in_use"] -= 1
+        try:
+            self._slots.release()
+        except ValueError:
+            # Slot belonged to a semaphore replaced after a fork
+            pass
+
+    def send_message(self, msg):
+        """Send a message on a pooled session, reconnecting once if it was dropped"""
+        server = self.acquire()
+        try:
+            try:
+                with self._observed("send"):
+                    server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self._close(server)
+                with self._lock:
+                    self._stats["reconnects"] += 1
+                server = self._connect()
+                with self._observed("send"):
+                    server.send_message(msg)
+        except Exception:
+            with self._lock:
+                self._stats["failures"] += 1
+            self.release(server, broken=True)
+            raise
+        with self._lock:
+            self._stats["sent"] += 1
+        self.release(server)
+
+    def close_all(self):
+        """Close every idle session (in-use sessions close when released)"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for server, _ in idle:
+            self._close(server)
+
+    def stats(self):
+        """Snapshot of pool counters for tuning"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+        stats["max_size"] = self.max_size
+        borrows = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / borrows, 4) if borrows else 0.0
+        stats["wait_time_avg"] = round(stats["wait_time_total"] / borrows, 6) if borrows else 0.0
+        return stats
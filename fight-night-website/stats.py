@@ -0,0 +1,227 @@
+"""
+Pre-aggregated submission counters for dashboards
+
+Each insert through either API server, a bulk import or a journal replay
+bumps two counter documents in stats_counters with $inc: one for the
+submission's UTC day and one running total for the collection. Fighter
+applications are also counted by weight class. Dashboards read a handful of
+small documents instead of scanning the collections.
+
+The counters can drift, e.g. if a process dies between the insert and the
+$inc, or when documents are deleted by hand. rebuild() recomputes them from
+the source collections with an aggregation pipeline:
+
+    python stats.py rebuild
+"""
+
+import datetime
+
+# Collections with counters, and whether they are split by weight class
+COUNTED_COLLECTIONS = {
+    "fighter_applications": True,
+    "fighter_nominations": False,
+    "email_list": False,
+}
+
+# Upper bound in lbs (inclusive) for each class; heavier is heavyweight
+WEIGHT_CLASSES = [
+    (125, "flyweight"),
+    (135, "bantamweight"),
+    (145, "featherweight"),
+    (155, "lightweight"),
+    (170, "welterweight"),
+    (185, "middleweight"),
+    (205, "light_heavyweight"),
+]
+HEAVIEST_CLASS = "heavyweight"
+UNKNOWN_CLASS = "unknown"
+
+TOTAL_DAY = "all"
+DEFAULT_STATS_DAYS = 30
+MAX_STATS_DAYS = 366
+
+
+class StatsError(ValueError):
+    """Raised for invalid stats query parameters"""
+
+
+def weight_class(weight):
+    """Class name for a weight in lbs (number or numeric string)"""
+    try:
+        pounds = float(str(weight).strip())
+    except (TypeError, ValueError):
+        return UNKNOWN_CLASS
+    if pounds <= 0:
+        return UNKNOWN_CLASS
+    for limit, name in WEIGHT_CLASSES:
+        if pounds <= limit:
+            return name
+    return HEAVIEST_CLASS
+
+
+def day_of(moment):
+    return moment.strftime("%Y-%m-%d")
+
+
+def counter_id(collection_name, day):
+    return f"{collection_name}:{day}"
+
+
+def counter_updates(collection_name, day, weight_class_name=None, count=1):
+    """UpdateOne operations adding count to the collection's day and running-total counters"""
+    from pymongo import UpdateOne
+
+    inc = {"count": count}
+    if weight_class_name is not None:
+        inc[f"by_weight_class.{weight_class_name}"] = count
+    return [
+        UpdateOne({"_id": counter_id(collection_name, bucket)},
+                  {"$inc": inc, "$setOnInsert": {"collection": collection_name, "day": bucket}},
+                  upsert=True)
+        for bucket in (day, TOTAL_DAY)
+    ]
+
+
+def insert_updates(collection_name, doc, count=1):
+    """Counter updates for inserted document(s) like doc; [] for collections without counters"""
+    if collection_name not in COUNTED_COLLECTIONS:
+        return []
+    by_weight = COUNTED_COLLECTIONS[collection_name]
+    created_at = doc.get("created_at") or datetime.datetime.utcnow()
+    return counter_updates(collection_name, day_of(created_at),
+                           weight_class(doc.get("weight")) if by_weight else None, count)
+
+
+def record_insert(counters, collection_name, doc, count=1):
+    """Count inserted document(s) like doc; errors are logged, never raised into the request"""
+    try:
+        updates = insert_updates(collection_name, doc, count)
+        if updates:
+            counters.bulk_write(updates, ordered=False)
+    except Exception as e:
+        print(f"Error updating stats counters for {collection_name}: {e}")
+
+
+async def record_insert_async(counters, collection_name, doc, count=1):
+    """record_insert for a Motor collection (async_app.py)"""
+    try:
+        updates = insert_updates(collection_name, doc, count)
+        if updates:
+            await counters.bulk_write(updates, ordered=False)
+    except Exception as e:
+        print(f"Error updating stats counters for {collection_name}: {e}")
+
+
+def parse_days(value):
+    if value is None or value == "":
+        return DEFAULT_STATS_DAYS
+    try:
+        days = int(value)
+    except ValueError:
+        raise StatsError("days must be an integer")
+    if days < 1 or days > MAX_STATS_DAYS:
+        raise StatsError(f"days must be between 1 and {MAX_STATS_DAYS}")
+    return days
+
+
+def read_stats(counters, days=DEFAULT_STATS_DAYS, today=None):
+    """Totals plus the last `days` daily counters for every counted collection"""
+    today = today or datetime.datetime.utcnow().date()
+    first_day = (today - datetime.timedelta(days=days - 1)).isoformat()
+
+    report = {
+        name: {"total": 0, "by_weight_class": {} if by_weight else None, "per_day": []}
+        for name, by_weight in COUNTED_COLLECTIONS.items()
+    }
+    cursor = counters.find(
+        {"$or": [{"day": TOTAL_DAY}, {"day": {"$gte": first_day, "$lte": today.isoformat()}}]},
+        {"_id": 0},
+    ).sort([("collection", 1), ("day", 1)])
+    for doc in cursor:
+        entry = report.get(doc.get("collection"))
+        if entry is None:
+            continue
+        if doc["day"] == TOTAL_DAY:
+            entry["total"] = doc.get("count", 0)
+            if entry["by_weight_class"] is not None:
+                entry["by_weight_class"] = doc.get("by_weight_class", {})
+        else:
+            day = {"day": doc["day"], "count": doc.get("count", 0)}
+            if entry["by_weight_class"] is not None:
+                day["by_weight_class"] = doc.get("by_weight_class", {})
+            entry["per_day"].append(day)
+
+    return {"days": days, "from": first_day, "to": today.isoformat(), "collections": report}
+
+
+def weight_class_expression():
+    """Aggregation equivalent of weight_class() on the weight field"""
+    pounds = {"$convert": {
+        "input": {"$trim": {"input": {"$toString": "$weight"}}},
+        "to": "double", "onError": None, "onNull": None,
+    }}
+    branches = [{"case": {"$lte": ["$$pounds", limit]}, "then": name} for limit, name in WEIGHT_CLASSES]
+    return {"$let": {
+        "vars": {"pounds": pounds},
+        "in": {"$cond": [
+            {"$or": [{"$eq": ["$$pounds", None]}, {"$lte": ["$$pounds", 0]}]},
+            UNKNOWN_CLASS,
+            {"$switch": {"branches": branches, "default": HEAVIEST_CLASS}},
+        ]},
+    }}
+
+
+def rebuild_pipeline(by_weight):
+    group_id = {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}}
+    if by_weight:
+        group_id["weight_class"] = weight_class_expression()
+    return [
+        {"$match": {"created_at": {"$type": "date"}}},
+        {"$group": {"_id": group_id, "count": {"$sum": 1}}},
+    ]
+
+
+def rebuild(db):
+    """Recompute every counter from the source collections; returns docs written per collection"""
+    from pymongo import ReplaceOne
+
+    counters = db["stats_counters"]
+    written = {}
+    for collection_name, by_weight in COUNTED_COLLECTIONS.items():
+        days = {}
+        for row in db[collection_name].aggregate(rebuild_pipeline(by_weight), allowDiskUse=True):
+            for day in (row["_id"]["day"], TOTAL_DAY):
+                entry = days.setdefault(day, {"count": 0, "by_weight_class": {}})
+                entry["count"] += row["count"]
+                if by_weight:
+                    name = row["_id"]["weight_class"]
+                    entry["by_weight_class"][name] = entry["by_weight_class"].get(name, 0) + row["count"]
+        days.setdefault(TOTAL_DAY, {"count": 0, "by_weight_class": {}})
+
+        requests = []
+        for day, entry in days.items():
+            doc = {"collection": collection_name, "day": day, "count": entry["count"]}
+            if by_weight:
+                doc["by_weight_class"] = entry["by_weight_class"]
+            requests.append(ReplaceOne({"_id": counter_id(collection_name, day)}, doc, upsert=True))
+        counters.bulk_write(requests, ordered=False)
+        # Days that no longer have any documents
+        counters.delete_many({"collection": collection_name, "day": {"$nin": list(days)}})
+        written[collection_name] = len(requests)
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Maintain the dashboard stats counters")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = MongoClient(os.getenv("MONGO_URI"))[os.getenv("MONGO_DB_NAME", "white_collar_fight_night")]
+    for name, count in rebuild(db).items():
+        print(f"{name}: {count} counter document(s)")
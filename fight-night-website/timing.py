@@ -0,0 +1,54 @@
+"""
+Per-request stage timing
+
+Route handlers wrap their phases (validation, database write, email) in
+stage(). Durations are kept on flask.g for the current request, optionally
+reported in a Server-Timing response header, and passed to any registered
+listeners.
+"""
+
+import contextlib
+import os
+import time
+
+from flask import g, has_request_context
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+# Callables taking (stage_name, seconds), e.g. a metrics recorder
+stage_listeners = []
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time the enclosed block as one stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if has_request_context():
+            g.setdefault("stages", []).append((name, elapsed))
+        for listener in stage_listeners:
+            listener(name, elapsed)
+
+
+def request_stages():
+    """(name, seconds) pairs recorded so far for the current request"""
+    return g.get("stages", []) if has_request_context() else []
+
+
+def server_timing_header(stages):
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in stages)
+
+
+def init_app(app, enabled=SERVER_TIMING_ENABLED):
+    if not enabled:
+        return
+
+    @app.after_request
+    def add_server_timing(response):
+        stages = request_stages()
+        if stages:
+            response.headers["Server-Timing"] = server_timing_header(stages)
+        return response
@@ -0,0 +1,73 @@
+"""
+Validation helpers shared by the API entry points
+"""
+
+import re
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+NON_DIGITS = re.compile(r'\D')
+
+
+def validate_email(email):
+    """Validate email format"""
+    return isinstance(email, str) and EMAIL_PATTERN.match(email) is not None
+
+
+def normalize_email(email):
+    """Canonical form of an email address used for duplicate detection"""
+    return email.strip().lower()
+
+
+def validate_phone(phone):
+    """Validate phone number (10 digits)"""
+    if not isinstance(phone, str):
+        return False
+    # Remove any non-digit characters
+    digits_only = NON_DIGITS.sub('', phone)
+    return len(digits_only) == 10
+
+
+# Form validators: each returns an error message, or None when the data is valid
+APPLICATION_REQUIRED_FIELDS = ['firstName', 'lastName', 'email', 'phone', 'jobCompany',
+                               'weight', 'height', 'experience', 'why']
+NOMINATION_REQUIRED_FIELDS = ['yourName', 'yourEmail', 'nomineeName', 'nomineeEmail', 'reason']
+
+
+def missing_field(data, required_fields):
+    for field in required_fields:
+        if field not in data or not data[field]:
+            return f"Missing required field: {field}"
+    return None
+
+
+def validate_fighter_application(data):
+    """Validate a fighter application form"""
+    error = missing_field(data, APPLICATION_REQUIRED_FIELDS)
+    if error:
+        return error
+    if not validate_email(data['email']):
+        return "Invalid email format"
+    if not validate_phone(data['phone']):
+        return "Phone number must be 10 digits"
+    return None
+
+
+def validate_fighter_nomination(data):
+    """Validate a fighter nomination form"""
+    error = missing_field(data, NOMINATION_REQUIRED_FIELDS)
+    if error:
+        return error
+    if not validate_email(data['yourEmail']):
+        return "Invalid nominator email format"
+    if not validate_email(data['nomineeEmail']):
+        return "Invalid nominee email format"
+    return None
+
+
+def validate_email_signup(data):
+    """Validate an email list signup"""
+    if 'email' not in data or not data['email']:
+        return "Email is required"
+    if not validate_email(data['email']):
+        return "Invalid email format"
+    return None
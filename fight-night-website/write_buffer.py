@@ -0,0 +1,136 @@
+"""
+Group-commit write buffer
+
+Coalesces concurrent insert_one calls on a collection into a single
+insert_many(ordered=False) round trip. Each caller blocks until the batch
+containing its document has been written and then receives its own result,
+or its own DuplicateKeyError when the batch partially failed.
+"""
+
+import os
+import threading
+from concurrent.futures import Future
+
+WRITE_BUFFER_MAX_BATCH = int(os.getenv("WRITE_BUFFER_MAX_BATCH", "100"))
+WRITE_BUFFER_LINGER_MS = float(os.getenv("WRITE_BUFFER_LINGER_MS", "5"))
+WRITE_BUFFER_TIMEOUT = float(os.getenv("WRITE_BUFFER_TIMEOUT", "30"))
+
+DUPLICATE_KEY_CODES = (11000, 11001)
+
+
+class WriteBufferClosed(RuntimeError):
+    """Raised when inserting into a buffer that has been shut down"""
+
+
+class WriteBuffer:
+    """Batches inserts for one collection behind a single flusher thread"""
+
+    def __init__(self, collection, max_batch=WRITE_BUFFER_MAX_BATCH,
+                 linger_ms=WRITE_BUFFER_LINGER_MS, timeout=WRITE_BUFFER_TIMEOUT):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.linger = linger_ms / 1000.0
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._pending = []
+        self._closed = False
+        self._thread = None
+        self._pid = None
+        self.stats = {"batches": 0, "documents": 0, "duplicates": 0, "errors": 0}
+
+    def insert_one(self, doc):
+        """Queue a document and wait for the batch it lands in to be written"""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise WriteBufferClosed("Write buffer is closed")
+            self._ensure_thread()
+            self._pending.append((doc, future))
+            self._cond.notify()
+        return future.result(timeout=self.timeout)
+
+    def _ensure_thread(self):
+        # Called with the condition held; a forked child needs its own flusher
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        if self._pid != pid:
+            self._pending = []
+        self._pid = pid
+        self._thread = threading.Thread(
+            target=self._run, name=f"write-buffer-{self.collection.name}", daemon=True
+        )
+        self._thread.start()
+
+    def _next_batch(self):
+        """Wait for work, linger briefly to let a batch form, then take it"""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            if len(self._pending) < self.max_batch and not self._closed:
+                self._cond.wait_for(
+                    lambda: len(self._pending) >= self.max_batch or self._closed,
+                    timeout=self.linger,
+                )
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _flush(self, batch):
+        from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+        from pymongo.results import InsertOneResult
+
+        docs = [doc for doc, _ in batch]
+        self.stats["batches"] += 1
+        try:
+            # insert_many assigns _id on each dict in place
+            self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {}
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = error
+            for index, (doc, future) in enumerate(batch):
+                error = failed.get(index)
+                if error is None:
+                    self.stats["documents"] += 1
+                    future.set_result(InsertOneResult(doc["_id"], True))
+                elif error.get("code") in DUPLICATE_KEY_CODES:
+                    self.stats["duplicates"] += 1
+                    future.set_exception(DuplicateKeyError(error.get("errmsg"), error.get("code"), error))
+                else:
+                    self.stats["errors"] += 1
+                    future.set_exception(OperationFailure(error.get("errmsg"), error.get("code"), error))
+            return
+        except Exception as e:
+            self.stats["errors"] += len(batch)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.stats["documents"] += len(batch)
+        for doc, future in batch:
+            future.set_result(InsertOneResult(doc["_id"], True))
+
+    def close(self, timeout=10.0):
+        """Flush everything still queued and stop the flusher thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread if self._pid == os.getpid() else None
+        if thread is not None:
+            thread.join(timeout)
+        # Anything left (no flusher in this process) is written synchronously
+        with self._cond:
+            leftover, self._pending = self._pending, []
+        while leftover:
+            self._flush(leftover[:self.max_batch])
+            leftover = leftover[self.max_batch:]